@@ -1,7 +1,7 @@
 """
 IFControll v2.0 - Sistema completo de gestao de frota via API Fulltrack2
 """
-import requests, json, re, math, threading, csv, os
+import json, re, threading, os
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 from datetime import datetime, timedelta
@@ -13,10 +13,25 @@ from auto_refresh_export import fmt_now_default, fmt_hours_ago, fmt_days_ago
 from auto_refresh_export import (
         now_str, ts, parse_dt, now_br,
         auto_refresh_register, auto_refresh_loop, auto_refresh_run_all,
-        auto_refresh_set_enabled, mk_refresh_controls,
+        auto_refresh_set_enabled, auto_refresh_set_rate, mk_refresh_controls, mk_tasks_panel,
         export_universal, mk_export_btn, bind_global_copy,
+        export_source, ask_export_scope, write_csv, run_export,
     )
+from api_client import (configure_pool, close_pool, host_limiter,
+                        CircuitBreaker, CircuitOpen, resilient_request)
+from fleet_cache import SnapshotCache, VehicleResolver, IntervalCache
+from event_store import EventStore
+from records import parse_events, event_ts
+from kpi_engine import fleet_kpis
+from segments import SegmentCache
+import geo
+from workers import CancelToken, Cancelled, FanOut, checkpoint, task_manager
+from ui_dispatch import install as install_ui, post, ui, fill_tree, run_bg, Rows
+from tree_sync import KeyedRows, reconcile, sync_tree, forget
+from lazy_tabs import LazyNotebook, on_first_show
+from charts import BarChart, HourBars, HeatMap, PieChart
 from tab_cronologia import TabCronologia
+from columnar_export import export_events, export_partitioned
 from credencials import API_KEY, SECRET_KEY, BASE_URL, AUTH
 
 def safe_int(v, default=0):
@@ -34,21 +49,19 @@ def safe_str(v, default="—"):
     return default if s in ("","None","null") else s
 
 def haversine(lat1,lon1,lat2,lon2):
-    try:
-        R=6371.0; la1,lo1,la2,lo2=(math.radians(safe_float(x)) for x in [lat1,lon1,lat2,lon2])
-        dlat,dlon=la2-la1,lo2-lo1
-        a=math.sin(dlat/2)**2+math.cos(la1)*math.cos(la2)*math.sin(dlon/2)**2
-        return R*2*math.asin(math.sqrt(max(0,min(1,a))))
+    try: return geo.haversine(*(safe_float(x) for x in (lat1,lon1,lat2,lon2)))
     except: return 0.0
 
 def hms(s):
     s=max(0,int(s)); return f"{s//3600:02d}h {(s%3600)//60:02d}m"
 
 def export_tree(tree, title="Exportar CSV"):
-    """Exporta os dados de um Treeview para CSV."""
-    cols = [tree.heading(c)["text"] for c in tree["columns"]]
-    rows = [tree.item(r)["values"] for r in tree.get_children()]
-    if not rows:
+    """Exporta os dados de um Treeview (ou FilterableTree) para CSV, lendo do
+    modelo em Python e gravando linha a linha em segundo plano."""
+    scope = ask_export_scope(tree)
+    if scope is None: return
+    src = export_source(tree, scope)
+    if not len(src):
         messagebox.showinfo("Exportar", "Nenhum dado para exportar.")
         return
     path = filedialog.asksaveasfilename(
@@ -57,14 +70,7 @@ def export_tree(tree, title="Exportar CSV"):
         initialfile=f"ifcontroll_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
     )
     if not path: return
-    try:
-        with open(path, "w", newline="", encoding="utf-8-sig") as f:
-            w = csv.writer(f, delimiter=";")
-            w.writerow(cols)
-            w.writerows(rows)
-        messagebox.showinfo("Exportar", f"Arquivo salvo:\n{path}")
-    except Exception as e:
-        messagebox.showerror("Erro", f"Falha ao salvar:\n{e}")
+    run_export(getattr(tree, "tree", tree), path, write_csv, src, title=title)
 
 def export_text(text_widget, title="Exportar TXT"):
     """Exporta conteúdo de um Text widget para arquivo."""
@@ -78,24 +84,94 @@ def export_text(text_widget, title="Exportar TXT"):
         initialfile=f"ifcontroll_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
     )
     if not path: return
-    try:
-        with open(path, "w", encoding="utf-8") as f:
-            f.write(content)
-        messagebox.showinfo("Exportar", f"Arquivo salvo:\n{path}")
-    except Exception as e:
-        messagebox.showerror("Erro", f"Falha ao salvar:\n{e}")
+    def write(p, _):
+        with open(p, "w", encoding="utf-8") as f: f.write(content)
+    run_export(text_widget, path, write, title=title)
+
+def _columnar_done(n, path):
+    if n: messagebox.showinfo("Exportar", f"✔ {n} eventos salvos:\n{path}")
+    else: messagebox.showinfo("Exportar", "Nenhum evento para exportar.")
+
+def export_columnar(get_events, name, title="Exportar Parquet / Arrow"):
+    """Salva eventos tipados (records.Event) em Parquet ou Arrow IPC, com
+    colunas numéricas/datas de verdade. get_events() roda em segundo plano."""
+    path = filedialog.asksaveasfilename(
+        title=title, defaultextension=".parquet",
+        filetypes=[("Parquet","*.parquet"),("Arrow IPC","*.arrow"),("Todos","*.*")],
+        initialfile=f"ifcontroll_{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.parquet"
+    )
+    if not path: return
+    def task():
+        try:
+            evs = get_events() or []
+            n = export_events(path, evs) if evs else 0
+        except Cancelled:
+            post(messagebox.showinfo, "Exportar", "Exportação cancelada."); return
+        except ImportError as e:
+            post(messagebox.showerror, "Dependência faltando", str(e)); return
+        except Exception as e:
+            post(messagebox.showerror, "Erro", f"Falha ao salvar:\n{e}"); return
+        post(_columnar_done, n, path)
+    run_bg(task, name=f"Parquet {name}", lane="long")
+
+def export_columnar_fleet(ini, fim, status=None):
+    """Histórico /events/interval de todos os veículos do snapshot na janela,
+    um arquivo Parquet por veículo numa pasta escolhida."""
+    folder = filedialog.askdirectory(title="Pasta para os arquivos Parquet")
+    if not folder: return
+    folder = os.path.join(folder, f"ifcontroll_hist_{ini.strftime('%Y%m%d%H%M')}_{fim.strftime('%Y%m%d%H%M')}")
+    def progress(i, total, n):
+        if status is not None: ui(status).config(text=f"⏳ Parquet {i}/{total} veículos  |  {n} eventos")
+    def task():
+        try:
+            vids = sorted({ev.vid for ev in get_all_events() if ev.vid})
+            files, n = export_partitioned(folder, vids,
+                                          lambda vid: get_interval_events(vid, ini, fim),
+                                          on_progress=progress)
+        except Cancelled:
+            if status is not None: ui(status).config(text="⏹ Exportação cancelada.")
+            return
+        except ImportError as e:
+            post(messagebox.showerror, "Dependência faltando", str(e)); return
+        except Exception as e:
+            post(messagebox.showerror, "Erro", f"Falha ao salvar:\n{e}"); return
+        if status is not None: ui(status).config(text=f"✔ {files} arquivos  |  {n} eventos  |  {now_str()}")
+        post(_columnar_done, n, folder)
+    run_bg(task, key="export/parquet-frota", name="Parquet frota", lane="long")
 
 # ─── API LAYER ───────────────────────────────────────────────────────────────
-def _req(method, path, params=None, body=None, timeout=30):
+API_POOL_SIZE  = 16   # conexões keep-alive simultâneas com a Fulltrack2
+API_RATE_LIMIT = 10   # requisições/s por host nas análises frota-inteira
+UPTIME_WORKERS = 8    # veículos consultados em paralelo no Uptime
+configure_pool(size=API_POOL_SIZE)
+
+API_RETRIES    = 2    # retentativas (só GET) em timeout, erro de rede ou HTTP 5xx
+API_TIMEOUTS   = {    # (conexão, leitura) em segundos por endpoint
+    "/events/all":      (5, 20),
+    "/events/interval": (5, 45),
+    "/alerts/period":   (5, 45),
+}
+API_TIMEOUT_DEFAULT = (5, 15)
+_breaker = CircuitBreaker(threshold=5, reset_after=30)
+
+def _timeout_for(path):
+    for pre,t in API_TIMEOUTS.items():
+        if path.startswith(pre): return t
+    return API_TIMEOUT_DEFAULT
+
+def _req(method, path, params=None, body=None, timeout=None):
     url = f"{BASE_URL}{path}/run"
     p   = {**AUTH, **(params or {})}
+    to  = timeout or _timeout_for(path)
     try:
-        if method=="GET":    r=requests.get(url,params=p,timeout=timeout)
-        elif method=="POST": r=requests.post(url,json={**(body or {}),**AUTH},params=AUTH,timeout=timeout)
-        elif method=="PUT":  r=requests.put(url,json={**(body or {}),**AUTH},params=AUTH,timeout=timeout)
-        elif method=="DEL":  r=requests.delete(url,params=p,timeout=timeout)
+        if method=="GET":    kw=dict(params=p)
+        elif method=="POST": kw=dict(json={**(body or {}),**AUTH},params=AUTH)
+        elif method=="PUT":  kw=dict(json={**(body or {}),**AUTH},params=AUTH)
+        elif method=="DEL":  kw=dict(params=p); method="DELETE"
         else: return {},0
+        r=resilient_request(method,url,breaker=_breaker,retries=API_RETRIES,timeout=to,**kw)
         return r.json(), r.status_code
+    except CircuitOpen as e: return {"status":False,"error":str(e)},0
     except Exception as e: return {"status":False,"error":str(e)},0
 
 def api_get(path,params=None):  d,_=_req("GET",path,params=params); return d
@@ -116,7 +192,42 @@ def extract_list(d):
             if isinstance(v,list) and v: return v
     return []
 
-def get_all_events():     return extract_list(api_get("/events/all").get("data",[]))
+# Snapshot da frota compartilhado por todas as abas (TTL + single-flight)
+SNAPSHOT_TTL = 15   # segundos
+_snapshot = SnapshotCache(lambda: parse_events(extract_list(api_get("/events/all").get("data",[]))), ttl=SNAPSHOT_TTL)
+
+def get_all_events(force=False): return _snapshot.get(force=force)
+def snapshot_stats():            return _snapshot.stats()
+
+# Histórico por veículo: só baixa os trechos de /events/interval ainda não vistos
+def _fetch_interval(vid, b, e):
+    d=api_get(f"/events/interval/id/{vid}/begin/{b}/end/{e}")
+    if d.get("status") is False and "error" in d: return None   # falha de rede: não cachear
+    return extract_list(d.get("data",[]))
+
+def _as_records(fetch):
+    """Converte cada trecho baixado em Event uma única vez, antes de entrar no cache."""
+    def _f(vid, b, e):
+        evs=fetch(vid,b,e)
+        return None if evs is None else parse_events(evs)
+    return _f
+
+# Histórico persistente em disco (SQLite) por baixo do cache em memória
+try:
+    _event_store = EventStore()
+    _intervals = IntervalCache(_as_records(_event_store.backed_fetch(_fetch_interval, event_ts, IntervalCache.event_key)),
+                               event_ts)
+    threading.Thread(target=_event_store.apply_retention, daemon=True, name="event-store-retention").start()
+except Exception:
+    _event_store = None
+    _intervals = IntervalCache(_as_records(_fetch_interval), event_ts)
+
+def get_interval_events(vid, ini, fim): return _intervals.get(vid, ts(ini), ts(fim))
+
+# Segmentação (viagens, paradas, ociosidade, silêncios, km) por veículo+janela
+_segments = SegmentCache(get_interval_events)
+def get_segments(vid, ini, fim): return _segments.get(vid, ini, fim)
+
 def get_vehicles_all():   return extract_list(api_get("/vehicles/all").get("data",[]))
 def get_alerts_all():     return extract_list(api_get("/alerts/all").get("data",[]))
 def get_clients_all():    return extract_list(api_get("/clients/all").get("data",[]))
@@ -128,12 +239,10 @@ def get_fences_all():
     if isinstance(msg,list) and msg and isinstance(msg[0],list): return msg[0]
     return extract_list(resp)
 
-def find_vehicle(q):
-    nq=re.sub(r"[^A-Z0-9]","",q.upper())
-    for ev in get_all_events():
-        if re.sub(r"[^A-Z0-9]","",str(ev.get("ras_vei_placa","")).upper())==nq: return ev
-        if nq in re.sub(r"[^A-Z0-9]","",str(ev.get("ras_vei_veiculo","")).upper()): return ev
-    return None      
+# Resolver placa/nome → veículo, indexado uma vez por snapshot
+_resolver = VehicleResolver(_snapshot)
+
+def find_vehicle(q): return _resolver.find(q)
 
 # ─── WIDGET HELPERS ──────────────────────────────────────────────────────────
 def apply_tree_style(name, hcol=None):
@@ -190,10 +299,12 @@ def txtbox(p,h=6):
     sb.pack(side="right",fill="y"); t.pack(fill="both",expand=True)
     return fr,t
 
-def write(t,text,col=None):
+def _write(t,text,col):
     t.config(state="normal"); t.delete("1.0","end")
     t.config(fg=col or C["text"]); t.insert("end",text); t.config(state="disabled")
 
+def write(t,text,col=None): post(_write,t,text,col)   # seguro a partir das tasks
+
 def sec(p,title,col=None):
     f=tk.Frame(p,bg=C["bg"]); f.pack(fill="x",pady=(10,4))
     tk.Label(f,text=title,bg=C["bg"],fg=col or C["accent"],font=("Helvetica Neue",9,"bold")).pack(side="left")
@@ -226,7 +337,7 @@ def mk_export_btn(parent, tree_or_text, is_text=False):
 class TabDashboard(tk.Frame):
     def __init__(self,master):
         super().__init__(master,bg=C["bg"]); self._build()
-        auto_refresh_register("dashboard", self.refresh)
+        auto_refresh_register("dashboard", self.refresh, self, every_s=60)
 
     def _build(self):
         sf=tk.Frame(self,bg=C["surface"]); sf.pack(fill="x")
@@ -242,6 +353,7 @@ class TabDashboard(tk.Frame):
         btn(ctrl,"⟳  ATUALIZAR",self.refresh,C["accent"]).pack(side="left")
         self.auto=tk.BooleanVar(value=False)
         tk.Checkbutton(ctrl,text="Auto 30s",variable=self.auto,bg=C["bg"],fg=C["text_mid"],
+                       command=lambda:auto_refresh_set_rate("dashboard",30 if self.auto.get() else 60),
                        activebackground=C["bg"],selectcolor=C["surface3"],
                        font=("Helvetica Neue",9)).pack(side="left",padx=8)
         self.se=ent(ctrl,w=24); self.se.pack(side="left",padx=(20,4),ipady=4)
@@ -265,8 +377,10 @@ class TabDashboard(tk.Frame):
             if isinstance(w,tk.Label) and "EXPORTAR" in w.cget("text"):
                 w.destroy()
         mk_export_btn(ctrl,self.tree).pack(side="right",padx=4)
+        btn(ctrl,"📦 PARQUET",lambda:export_columnar(lambda:self._data or get_all_events(),"frota"),
+            C["surface3"],C["accent"],px=10,py=5).pack(side="right",padx=4)
 
-        self._data=[]; self.after(300,self.refresh); self.after(30000,self._loop)
+        self._data=[]; on_first_show(self,self.refresh)
 
     def _stat(self,p,label,val,col):
         f=tk.Frame(p,bg=C["surface"]); f.pack(side="left",padx=18,pady=8)
@@ -279,50 +393,38 @@ class TabDashboard(tk.Frame):
 
     def _filter(self):
         q=re.sub(r"[^A-Z0-9]","",self.se.get().upper())
-        for r in self.tree.get_children(): self.tree.delete(r)
-        for ev in self._data:
-            if not q or q in re.sub(r"[^A-Z0-9]","",str(ev.get("ras_vei_placa","")).upper()) \
-                     or q in re.sub(r"[^A-Z0-9]","",str(ev.get("ras_mot_nome","")).upper()):
-                self._row(ev)
+        if q==re.sub(r"[^A-Z0-9]","","Filtrar placa / motorista...".upper()): q=""
+        reconcile(self.tree,[self._row(ev) for ev in self._data
+            if not q or q in re.sub(r"[^A-Z0-9]","",str(ev.get("ras_vei_placa","")).upper())
+                     or q in re.sub(r"[^A-Z0-9]","",str(ev.get("ras_mot_nome","")).upper())])
 
     def _clear_f(self):
         self.se.delete(0,"end"); self.se.insert(0,"Filtrar placa / motorista...")
         self._render(self._data)
 
     def _row(self,ev):
-        ign=safe_int(ev.get("ras_eve_ignicao",0)); gps=safe_int(ev.get("ras_eve_gps_status",0))
-        self.tree.insert("","end",values=(
+        ign=ev.ign; gps=ev.gps
+        return (ev.vid,(
             safe_str(ev.get("ras_vei_placa")),safe_str(ev.get("ras_vei_veiculo")),
             safe_str(ev.get("ras_mot_nome")),safe_str(ev.get("ras_cli_desc")),
-            "🟢 ON" if ign else "⚫ OFF",safe_int(ev.get("ras_eve_velocidade",0)),
-            "✓ OK" if gps else "✗ FALHA",safe_int(ev.get("ras_eve_satelites",0)),
-            f"{safe_int(ev.get('ras_eve_porc_bat_backup',100))}%",
-            f"{safe_float(ev.get('ras_eve_voltagem',0)):.1f}V",
+            "🟢 ON" if ign else "⚫ OFF",ev.vel,
+            "✓ OK" if gps else "✗ FALHA",ev.sat,
+            f"{ev.bat}%",
+            f"{ev.volt:.1f}V",
             safe_str(ev.get("ras_eve_data_gps")),
-        ),tags=("on" if ign else "off",))
+        ),("on" if ign else "off",))
 
     def _render(self,data):
-        for r in self.tree.get_children(): self.tree.delete(r)
-        on=off=no_gps=0; vmax=0
-        for ev in data:
-            ign=safe_int(ev.get("ras_eve_ignicao",0)); gps=safe_int(ev.get("ras_eve_gps_status",0))
-            vel=safe_int(ev.get("ras_eve_velocidade",0))
-            if ign: on+=1
-            else: off+=1
-            if not gps: no_gps+=1
-            vmax=max(vmax,vel); self._row(ev)
-        self.s_total.config(text=str(len(data))); self.s_on.config(text=str(on))
-        self.s_off.config(text=str(off)); self.s_nogps.config(text=str(no_gps))
-        self.s_vmax.config(text=f"{vmax} km/h"); self.s_upd.config(text=now_str())
+        self._filter()    # reconcilia por ras_vei_id mantendo o filtro digitado
+        k=fleet_kpis(data)
+        self.s_total.config(text=str(k["total"])); self.s_on.config(text=str(k["on"]))
+        self.s_off.config(text=str(k["off"])); self.s_nogps.config(text=str(k["no_gps"]))
+        self.s_vmax.config(text=f"{k['vmax']} km/h"); self.s_upd.config(text=now_str())
 
     def refresh(self):
         def t():
-            d=get_all_events(); self._data=d; self._render(d)
-        threading.Thread(target=t,daemon=True).start()
-
-    def _loop(self):
-        if self.auto.get(): self.refresh()
-        self.after(30000,self._loop)
+            d=get_all_events(); self._data=d; post(self._render,d)
+        return run_bg(t,key="dashboard/refresh")
 
 # ─── ABA 2: ALERTAS ──────────────────────────────────────────────────────────
 class TabAlertas(tk.Frame):
@@ -342,17 +444,18 @@ class TabAlertas(tk.Frame):
             lb.config(text="⏳...")
             def task():
                 d=get_alerts_all()
-                for r in t.get_children(): t.delete(r)
+                rows=Rows()
                 for a in d:
-                    t.insert("","end",values=(safe_str(a.get("ras_eal_id_veiculo")),
+                    rows.add((safe_str(a.get("ras_eal_id_veiculo")),
                         safe_str(a.get("ras_eal_descricao")),safe_str(a.get("ras_eal_data_alerta")),
                         safe_str(a.get("ras_eal_id_alerta_tipo")),
                         safe_str(a.get("ras_eal_latitude")),safe_str(a.get("ras_eal_longitude"))))
-                lb.config(text=f"{len(d)} alertas | {now_str()}")
-            threading.Thread(target=task,daemon=True).start()
+                fill_tree(t,rows)
+                ui(lb).config(text=f"{len(d)} alertas | {now_str()}")
+            run_bg(task,key="alertas/load")
         btn(c,"⟳  ATUALIZAR",load,C["danger"]).pack(side="left")
         mk_export_btn(c,t).pack(side="left",padx=6)
-        self.after(300,load)
+        on_first_show(f,load)
         # Por período
         f2=tk.Frame(nb,bg=C["bg"]); nb.add(f2,text="  Por Período  ")
         c2=tk.Frame(f2,bg=C["bg"]); c2.pack(fill="x",padx=8,pady=6)
@@ -368,21 +471,22 @@ class TabAlertas(tk.Frame):
         t2=mk_tree(f2,cols2,ws2,"AlerP",C["warn"],14)
         def buscar2():
             lb2.config(text="⏳...")
+            try:
+                ini=datetime.strptime(ei.get().strip(),"%d/%m/%Y %H:%M")
+                fim=datetime.strptime(ef.get().strip(),"%d/%m/%Y %H:%M")
+            except: lb2.config(text="⚠ Datas inválidas"); return
             def task():
-                try:
-                    ini=datetime.strptime(ei.get().strip(),"%d/%m/%Y %H:%M")
-                    fim=datetime.strptime(ef.get().strip(),"%d/%m/%Y %H:%M")
-                except: lb2.config(text="⚠ Datas inválidas"); return
                 d=extract_list(api_get(f"/alerts/period/initial/{ts(ini)}/final/{ts(fim)}").get("data",[]))
-                for r in t2.get_children(): t2.delete(r)
+                rows=Rows()
                 for a in d:
-                    t2.insert("","end",values=(safe_str(a.get("ras_eal_id_veiculo")),
+                    rows.add((safe_str(a.get("ras_eal_id_veiculo")),
                         safe_str(a.get("ras_eal_descricao")),safe_str(a.get("ras_eal_data_alerta")),
                         "Sim" if safe_int(a.get("ras_eal_baixado")) else "Não",
                         safe_str(a.get("ras_eal_descricao_motivo")),safe_str(a.get("ras_eal_obs")),
                         safe_str(a.get("ras_eal_latitude")),safe_str(a.get("ras_eal_longitude"))))
-                lb2.config(text=f"{len(d)} alertas | {now_str()}")
-            threading.Thread(target=task,daemon=True).start()
+                fill_tree(t2,rows)
+                ui(lb2).config(text=f"{len(d)} alertas | {now_str()}")
+            run_bg(task,key="alertas/buscar2")
         btn(c2,"BUSCAR",buscar2,C["warn"]).pack(side="left",padx=8)
         mk_export_btn(c2,t2).pack(side="left",padx=4)
         # Fechar
@@ -400,12 +504,12 @@ class TabAlertas(tk.Frame):
             aid=e_id.get().strip()
             if not aid: write(res,"⚠ Informe o ID.",C["warn"]); return
             write(res,"⏳ Enviando...",C["accent"])
+            body={"ras_eal_motivo":safe_int(e_mot.get() or 0),"ras_eal_obs":e_obs.get().strip()}
             def task():
-                resp,code=api_post(f"/alerts/close/id/{aid}",
-                    {"ras_eal_motivo":safe_int(e_mot.get() or 0),"ras_eal_obs":e_obs.get().strip()})
+                resp,code=api_post(f"/alerts/close/id/{aid}",body)
                 if resp.get("status"): ok(res,f"Alerta {aid} fechado! HTTP {code}")
                 else: err(res,f"Falha HTTP {code}\n{json.dumps(resp,indent=2)}")
-            threading.Thread(target=task,daemon=True).start()
+            run_bg(task,name="alertas/fechar")
         btn(b3,"FECHAR ALERTA",fechar,C["danger"]).pack(pady=(12,0))
         mk_export_btn(b3,res,is_text=True).pack(pady=(6,0))
         # Tipos
@@ -416,13 +520,14 @@ class TabAlertas(tk.Frame):
         def load4():
             def task():
                 d=get_alert_types()
-                for r in t4.get_children(): t4.delete(r)
-                for a in d: t4.insert("","end",values=(safe_str(a.get("ras_eat_id")),safe_str(a.get("ras_eat_descricao"))))
-                lb4.config(text=f"{len(d)} tipos")
-            threading.Thread(target=task,daemon=True).start()
+                rows=Rows()
+                for a in d: rows.add((safe_str(a.get("ras_eat_id")),safe_str(a.get("ras_eat_descricao"))))
+                fill_tree(t4,rows)
+                ui(lb4).config(text=f"{len(d)} tipos")
+            run_bg(task,key="alertas/load4")
         btn(c4,"CARREGAR",load4,C["orange"]).pack(side="left")
         mk_export_btn(c4,t4).pack(side="left",padx=6)
-        self.after(400,load4)
+        on_first_show(f4,load4)
 
 # ─── ABA 3: CERCAS ───────────────────────────────────────────────────────────
 class TabCercas(tk.Frame):
@@ -442,18 +547,19 @@ class TabCercas(tk.Frame):
             lb.config(text="⏳...")
             def task():
                 d=get_fences_all()
-                for r in t.get_children(): t.delete(r)
+                rows=Rows()
                 for fc in d:
                     veics=",".join(str(v) for v in (fc.get("ras_vei_id") or []))
-                    t.insert("","end",values=(safe_str(fc.get("fence_id")),safe_str(fc.get("ras_vei_id_cli")),
+                    rows.add((safe_str(fc.get("fence_id")),safe_str(fc.get("ras_vei_id_cli")),
                         safe_str(fc.get("ras_cer_observacao")),"Sim" if fc.get("is_active") else "Não",
                         safe_str(fc.get("color")),safe_str(fc.get("start_time")),
                         safe_str(fc.get("end_time")),veics[:50] or "—"))
-                lb.config(text=f"{len(d)} cercas | {now_str()}")
-            threading.Thread(target=task,daemon=True).start()
+                fill_tree(t,rows)
+                ui(lb).config(text=f"{len(d)} cercas | {now_str()}")
+            run_bg(task,key="cercas/load")
         btn(c,"⟳  CARREGAR",load,C["green"]).pack(side="left")
         mk_export_btn(c,t).pack(side="left",padx=6)
-        self.after(300,load)
+        on_first_show(f,load)
         # Eventos por cliente
         f2=tk.Frame(nb,bg=C["bg"]); nb.add(f2,text="  Eventos por Cliente  ")
         c2=tk.Frame(f2,bg=C["bg"]); c2.pack(fill="x",padx=8,pady=6)
@@ -471,21 +577,22 @@ class TabCercas(tk.Frame):
         t2=mk_tree(f2,cols2,ws2,"FencE",C["green"],14)
         def buscar2():
             lb2.config(text="⏳...")
+            try:
+                ini=datetime.strptime(ei.get().strip(),"%d/%m/%Y %H:%M")
+                fim=datetime.strptime(ef.get().strip(),"%d/%m/%Y %H:%M")
+            except: lb2.config(text="⚠ Datas inválidas"); return
+            cli=e_cli.get().strip() or "0"
             def task():
-                try:
-                    ini=datetime.strptime(ei.get().strip(),"%d/%m/%Y %H:%M")
-                    fim=datetime.strptime(ef.get().strip(),"%d/%m/%Y %H:%M")
-                except: lb2.config(text="⚠ Datas inválidas"); return
-                cli=e_cli.get().strip() or "0"
                 d=extract_list(api_get(f"/fence/client/id/{cli}/initial/{ts(ini)}/final/{ts(fim)}").get("data",[]))
-                for r in t2.get_children(): t2.delete(r)
+                rows=Rows()
                 for ev in d:
-                    t2.insert("","end",values=(safe_str(ev.get("ras_vei_id")),safe_str(ev.get("ras_vei_placa")),
+                    rows.add((safe_str(ev.get("ras_vei_id")),safe_str(ev.get("ras_vei_placa")),
                         safe_str(ev.get("ras_vei_veiculo")),safe_str(ev.get("ras_cer_observacao")),
                         safe_str(ev.get("data_entrada")),safe_str(ev.get("data_saida")),
                         safe_str(ev.get("tempo_permanencia"))))
-                lb2.config(text=f"{len(d)} eventos | {now_str()}")
-            threading.Thread(target=task,daemon=True).start()
+                fill_tree(t2,rows)
+                ui(lb2).config(text=f"{len(d)} eventos | {now_str()}")
+            run_bg(task,key="cercas/buscar2")
         btn(c2,"BUSCAR",buscar2,C["green"]).pack(side="left",padx=8)
         mk_export_btn(c2,t2).pack(side="left",padx=4)
         # Criar cerca
@@ -507,28 +614,28 @@ class TabCercas(tk.Frame):
         _fr,res3=txtbox(b3,4); _fr.pack(fill="x",pady=(8,0))
         def criar():
             write(res3,"⏳ Criando...",C["accent"])
+            veics=[safe_int(v.strip()) for v in e_vs.get().split(",") if v.strip()]
+            coords=[]
+            for ln in t_co.get("1.0","end").strip().split("\n"):
+                pp=ln.strip().split(",")
+                if len(pp)==2: coords.append([pp[0].strip(),pp[1].strip()])
+            payload={"ras_cer_observacao":e_nm.get().strip(),"ras_vei_id_cli":safe_int(e_cl.get()),
+                "color":e_cr.get().strip() or "blue","is_active":True,"ras_vei_id":veics,
+                "contacts_id":[],"coordinates":coords,"start_time":"00:00:00","end_time":"23:59:59",
+                "group_id":0,"days_active":{d:True for d in ["monday","tuesday","wednesday","thursday","friday","saturday","sunday"]},
+                "shipping_settings":{"send_alert_email":False,"send_alert_client":True,"send_alert_mobile":False,
+                                     "send_alert_fullarm":False,"send_alert_in_screen":True,"send_alert_monitoring":False},
+                "generate_alerts":{"ignition_on":False,"ignition_off":False,"inside_fence":True,"outside_fence":True,
+                                   "speed_limit":{"is_active":False,"limit":0},
+                                   "time_inside_fence":{"is_active":False,"time":"00:00:00"},
+                                   "time_outside_fence":{"is_active":False,"time":"00:00:00"},
+                                   "time_on":{"is_active":False,"time":"00:00:00"},
+                                   "time_off":{"is_active":False,"time":"00:00:00"}}}
             def task():
-                veics=[safe_int(v.strip()) for v in e_vs.get().split(",") if v.strip()]
-                coords=[]
-                for ln in t_co.get("1.0","end").strip().split("\n"):
-                    pp=ln.strip().split(",")
-                    if len(pp)==2: coords.append([pp[0].strip(),pp[1].strip()])
-                payload={"ras_cer_observacao":e_nm.get().strip(),"ras_vei_id_cli":safe_int(e_cl.get()),
-                    "color":e_cr.get().strip() or "blue","is_active":True,"ras_vei_id":veics,
-                    "contacts_id":[],"coordinates":coords,"start_time":"00:00:00","end_time":"23:59:59",
-                    "group_id":0,"days_active":{d:True for d in ["monday","tuesday","wednesday","thursday","friday","saturday","sunday"]},
-                    "shipping_settings":{"send_alert_email":False,"send_alert_client":True,"send_alert_mobile":False,
-                                         "send_alert_fullarm":False,"send_alert_in_screen":True,"send_alert_monitoring":False},
-                    "generate_alerts":{"ignition_on":False,"ignition_off":False,"inside_fence":True,"outside_fence":True,
-                                       "speed_limit":{"is_active":False,"limit":0},
-                                       "time_inside_fence":{"is_active":False,"time":"00:00:00"},
-                                       "time_outside_fence":{"is_active":False,"time":"00:00:00"},
-                                       "time_on":{"is_active":False,"time":"00:00:00"},
-                                       "time_off":{"is_active":False,"time":"00:00:00"}}}
                 resp,code=api_put("/fence/save",payload)
                 if resp.get("status") or code in (200,201): ok(res3,f"Cerca criada! HTTP {code}")
                 else: err(res3,f"Falha {code}\n{json.dumps(resp,indent=2)}")
-            threading.Thread(target=task,daemon=True).start()
+            run_bg(task,name="cercas/criar")
         btn(b3,"CRIAR CERCA",criar,C["green"]).pack(pady=(10,0))
         # Deletar
         f4=tk.Frame(nb,bg=C["bg"]); nb.add(f4,text="  Deletar  ")
@@ -545,7 +652,7 @@ class TabCercas(tk.Frame):
                 resp,code=api_del(f"/fence/delete/id/{fid}")
                 if resp.get("status") or code in (200,204): ok(res4,f"Cerca {fid} deletada!")
                 else: err(res4,f"Falha {code}")
-            threading.Thread(target=task,daemon=True).start()
+            run_bg(task,name="cercas/deletar")
         btn(b4,"DELETAR",deletar,C["danger"]).pack(pady=(12,0))
 
 # ─── ABA 4: VEÍCULOS ─────────────────────────────────────────────────────────
@@ -566,19 +673,20 @@ class TabVeiculos(tk.Frame):
             lb.config(text="⏳...")
             def task():
                 d=get_vehicles_all()
-                for r in t.get_children(): t.delete(r)
+                rows=Rows()
                 for v in d:
-                    t.insert("","end",values=(safe_str(v.get("ras_vei_id")),safe_str(v.get("ras_vei_id_cli")),
+                    rows.add((safe_str(v.get("ras_vei_id")),safe_str(v.get("ras_vei_id_cli")),
                         safe_str(v.get("ras_vei_placa")),safe_str(v.get("ras_vei_veiculo")),
                         safe_str(v.get("ras_vei_tipo")),safe_str(v.get("ras_vei_fabricante")),
                         safe_str(v.get("ras_vei_ano")),safe_str(v.get("ras_vei_cor")),
                         safe_str(v.get("ras_vei_velocidade_limite")),safe_str(v.get("ras_vei_odometro")),
                         safe_str(v.get("ras_vei_data_cadastro"))))
-                lb.config(text=f"{len(d)} veículos")
-            threading.Thread(target=task,daemon=True).start()
+                fill_tree(t,rows)
+                ui(lb).config(text=f"{len(d)} veículos")
+            run_bg(task,key="veiculos/load")
         btn(c,"⟳  CARREGAR",load,C["blue"]).pack(side="left")
         mk_export_btn(c,t).pack(side="left",padx=6)
-        self.after(200,load)
+        on_first_show(f,load)
         # Atualizar
         f2=tk.Frame(nb,bg=C["bg"]); nb.add(f2,text="  Atualizar  ")
         b2=tk.Frame(f2,bg=C["bg"]); b2.pack(fill="both",expand=True,padx=20,pady=12)
@@ -601,25 +709,26 @@ class TabVeiculos(tk.Frame):
             def task():
                 ev=find_vehicle(q)
                 if not ev: err(res2,"Não encontrado."); return
-                vid=safe_int(ev.get("ras_vei_id",0))
+                vid=ev.vid
                 d=extract_list(api_get(f"/vehicles/single/id/{vid}").get("data",[]))
                 v=d[0] if d else ev
-                for k,e in fields.items(): e.delete(0,"end"); e.insert(0,safe_str(v.get(k,""),default=""))
+                for k,e in fields.items(): ui(e).delete(0,"end"); ui(e).insert(0,safe_str(v.get(k,""),default=""))
                 ok(res2,f"Veículo {vid} carregado.")
-            threading.Thread(target=task,daemon=True).start()
+            run_bg(task,key="veiculos/popular2")
         btn(rq,"CARREGAR",popular2,C["accent"]).pack(side="left")
         def salvar2():
             q=e_q.get().strip()
             if not q: return
             loading(res2)
+            body={k:v.get() for k,v in fields.items()}
             def task():
                 ev=find_vehicle(q)
                 if not ev: err(res2,"Não encontrado."); return
-                vid=safe_int(ev.get("ras_vei_id",0))
-                resp,code=api_post(f"/vehicles/update/id/{vid}",{k:v.get() for k,v in fields.items()})
+                vid=ev.vid
+                resp,code=api_post(f"/vehicles/update/id/{vid}",body)
                 if resp.get("status") or code in (200,201): ok(res2,f"Veículo {vid} atualizado!")
                 else: err(res2,f"Falha {code}")
-            threading.Thread(target=task,daemon=True).start()
+            run_bg(task,name="veiculos/salvar2")
         btn(b2,"💾  SALVAR",salvar2,C["green"]).pack(pady=(8,0))
         # Cadastrar
         f3=tk.Frame(nb,bg=C["bg"]); nb.add(f3,text="  Cadastrar  ")
@@ -636,13 +745,14 @@ class TabVeiculos(tk.Frame):
         _f3,res3=txtbox(b3,4); _f3.pack(fill="x",pady=(8,0))
         def cadastrar():
             write(res3,"⏳ Cadastrando...",C["accent"])
+            body={k:v.get() for k,v in fd3.items() if v.get().strip()}
             def task():
-                resp,code=api_put("/vehicles/save",{k:v.get() for k,v in fd3.items() if v.get().strip()})
+                resp,code=api_put("/vehicles/save",body)
                 if resp.get("status") or code in (200,201):
                     d=extract_list(resp.get("data",resp))
                     ok(res3,f"Veículo criado! ID: {d[0].get('ras_vei_id','?') if d else '?'}")
                 else: err(res3,f"Falha {code}\n{json.dumps(resp,indent=2)}")
-            threading.Thread(target=task,daemon=True).start()
+            run_bg(task,name="veiculos/cadastrar")
         btn(b3,"CADASTRAR",cadastrar,C["green"]).pack(pady=(8,0))
         # Instalação
         f4=tk.Frame(nb,bg=C["bg"]); nb.add(f4,text="  Instalação  ")
@@ -654,15 +764,16 @@ class TabVeiculos(tk.Frame):
         def load_inst():
             def task():
                 d=extract_list(api_get("/workshop/list").get("data",[]))
-                for r in ta.get_children(): ta.delete(r)
+                rows=Rows()
                 for i in d:
-                    ta.insert("","end",values=(safe_str(i.get("ras_ins_id")),safe_str(i.get("ras_ras_id_aparelho")),
+                    rows.add((safe_str(i.get("ras_ins_id")),safe_str(i.get("ras_ras_id_aparelho")),
                         safe_str(i.get("ras_vei_veiculo")),safe_str(i.get("ras_vei_placa")),safe_str(i.get("ras_cli_desc"))))
-                lba.config(text=f"{len(d)} instalações")
-            threading.Thread(target=task,daemon=True).start()
+                fill_tree(ta,rows)
+                ui(lba).config(text=f"{len(d)} instalações")
+            run_bg(task,key="veiculos/load_inst")
         btn(ca,"CARREGAR",load_inst,C["purple"]).pack(side="left")
         mk_export_btn(ca,ta).pack(side="left",padx=6)
-        self.after(300,load_inst)
+        on_first_show(fa,load_inst)
         fb=tk.Frame(nb4,bg=C["bg"]); nb4.add(fb,text="  Vincular  ")
         bb=tk.Frame(fb,bg=C["bg"]); bb.pack(fill="both",expand=True,padx=20,pady=12)
         sec(bb,"VINCULAR VEÍCULO ↔ RASTREADOR")
@@ -673,11 +784,12 @@ class TabVeiculos(tk.Frame):
         _,resv=txtbox(bb,4); _.pack(fill="x",pady=(10,0))
         def vincular():
             write(resv,"⏳...",C["accent"])
+            body={"ras_vei_id":safe_int(e_vv.get()),"ras_ras_id_aparelho":e_ap.get().strip()}
             def task():
-                resp,code=api_post("/workshop/install",{"ras_vei_id":safe_int(e_vv.get()),"ras_ras_id_aparelho":e_ap.get().strip()})
+                resp,code=api_post("/workshop/install",body)
                 if resp.get("status") or code in (200,201): ok(resv,"Vinculado com sucesso!")
                 else: err(resv,f"Falha {code}")
-            threading.Thread(target=task,daemon=True).start()
+            run_bg(task,name="veiculos/vincular")
         btn(bb,"VINCULAR",vincular,C["green"]).pack(pady=(8,0))
         fc=tk.Frame(nb4,bg=C["bg"]); nb4.add(fc,text="  Desvincular  ")
         bc=tk.Frame(fc,bg=C["bg"]); bc.pack(fill="both",expand=True,padx=20,pady=12)
@@ -687,11 +799,12 @@ class TabVeiculos(tk.Frame):
         _,resd=txtbox(bc,4); _.pack(fill="x",pady=(10,0))
         def desvincular():
             write(resd,"⏳...",C["accent"])
+            body={"ras_ins_id":safe_int(e_ins.get())}
             def task():
-                resp,code=api_put("/workshop/uninstall",{"ras_ins_id":safe_int(e_ins.get())})
+                resp,code=api_put("/workshop/uninstall",body)
                 if resp.get("status") or code in (200,201): ok(resd,"Desvinculado!")
                 else: err(resd,f"Falha {code}")
-            threading.Thread(target=task,daemon=True).start()
+            run_bg(task,name="veiculos/desvincular")
         btn(bc,"DESVINCULAR",desvincular,C["danger"]).pack(pady=(8,0))
 
 # ─── ABA 5: RELATÓRIOS ───────────────────────────────────────────────────────
@@ -717,32 +830,18 @@ class TabRelatorios(tk.Frame):
             q=ev.get().strip()
             if not q: return
             loading(res)
+            try:
+                ini=datetime.strptime(ei.get().strip(),"%d/%m/%Y %H:%M")
+                fim=datetime.strptime(ef.get().strip(),"%d/%m/%Y %H:%M")
+            except: write(res,"⚠ Datas inválidas.",C["warn"]); return
             def task():
                 entry=find_vehicle(q)
                 if not entry: err(res,"Não encontrado."); return
-                vid=safe_int(entry.get("ras_vei_id",0))
-                try:
-                    ini=datetime.strptime(ei.get().strip(),"%d/%m/%Y %H:%M")
-                    fim=datetime.strptime(ef.get().strip(),"%d/%m/%Y %H:%M")
-                except: write(res,"⚠ Datas inválidas.",C["warn"]); return
-                evs=extract_list(api_get(f"/events/interval/id/{vid}/begin/{ts(ini)}/end/{ts(fim)}").get("data",[]))
+                vid=entry.vid
+                sg=get_segments(vid,ini,fim); evs=sg.events
                 if not evs: write(res,"ℹ Nenhum evento.",C["text_mid"]); return
-                km=0.0; t_on=t_off=t_par=0.0; vmax=0; vels=[]; prev=None
-                for ev2 in evs:
-                    vel=safe_int(ev2.get("ras_eve_velocidade",0))
-                    ign=safe_int(ev2.get("ras_eve_ignicao",0))
-                    lat=ev2.get("ras_eve_latitude"); lon=ev2.get("ras_eve_longitude")
-                    try: dt=datetime.strptime(ev2.get("ras_eve_data_gps",""),"%d/%m/%Y %H:%M:%S")
-                    except: dt=None
-                    if prev and dt and prev[0]:
-                        s=max(0,(dt-prev[0]).total_seconds())
-                        if prev[1]: t_on+=s
-                        else: t_off+=s
-                        if prev[1] and prev[2]==0: t_par+=s
-                    if vel>0: vmax=max(vmax,vel); vels.append(vel)
-                    if prev and prev[3] is not None and lat: km+=haversine(prev[3],prev[4],lat,lon)
-                    prev=(dt,ign,vel,lat,lon)
-                vmed=sum(vels)/len(vels) if vels else 0
+                km,vmax,vmed=sg.km,sg.vmax,sg.vmed
+                t_on,t_off,t_par=sg.t_on,sg.t_off,sg.t_idle
                 lines=["="*46,f"  {entry.get('ras_vei_placa','—')} — {entry.get('ras_vei_veiculo','—')}",
                     f"  Motorista: {entry.get('ras_mot_nome','—')}",
                     f"  Período  : {ini.strftime('%d/%m/%Y %H:%M')} → {fim.strftime('%d/%m/%Y %H:%M')}",
@@ -755,7 +854,7 @@ class TabRelatorios(tk.Frame):
                     f"    Ignição OFF        : {hms(t_off):>12}",
                     f"    Parado c/ign.ON    : {hms(t_par):>12}","","="*46]
                 write(res,"\n".join(lines))
-            threading.Thread(target=task,daemon=True).start()
+            run_bg(task,key="relatorios/util")
         btn(hdr,"📊 GERAR",util,C["green"]).pack(side="right",pady=4)
         mk_export_btn(hdr,res,is_text=True).pack(side="right",padx=4,pady=4)
 
@@ -770,29 +869,18 @@ class TabRelatorios(tk.Frame):
             q=ev2.get().strip()
             if not q: return
             loading(res2)
+            try:
+                ini=datetime.strptime(ei2.get().strip(),"%d/%m/%Y %H:%M")
+                fim=datetime.strptime(ef2.get().strip(),"%d/%m/%Y %H:%M")
+                mn=int(e_min.get() or 5)
+            except: write(res2,"⚠ Inválido.",C["warn"]); return
             def task():
                 entry=find_vehicle(q)
                 if not entry: err(res2,"Não encontrado."); return
-                vid=safe_int(entry.get("ras_vei_id",0))
-                try:
-                    ini=datetime.strptime(ei2.get().strip(),"%d/%m/%Y %H:%M")
-                    fim=datetime.strptime(ef2.get().strip(),"%d/%m/%Y %H:%M")
-                    mn=int(e_min.get() or 5)
-                except: write(res2,"⚠ Inválido.",C["warn"]); return
-                evs=extract_list(api_get(f"/events/interval/id/{vid}/begin/{ts(ini)}/end/{ts(fim)}").get("data",[]))
-                if not evs: write(res2,"ℹ Nenhum evento.",C["text_mid"]); return
-                pars=[]; pi=None
-                for ev3 in evs:
-                    vel=safe_int(ev3.get("ras_eve_velocidade",0))
-                    try: dt=datetime.strptime(ev3.get("ras_eve_data_gps",""),"%d/%m/%Y %H:%M:%S")
-                    except: dt=None
-                    if vel==0 and dt:
-                        if pi is None: pi=dt
-                    else:
-                        if pi and dt:
-                            d=(dt-pi).total_seconds()/60
-                            if d>=mn: pars.append((pi,dt,d))
-                        pi=None
+                vid=entry.vid
+                sg=get_segments(vid,ini,fim)
+                if not sg.events: write(res2,"ℹ Nenhum evento.",C["text_mid"]); return
+                pars=sg.stops_over(mn)
                 tot=sum(d for _,_,d in pars)
                 lines=[f"  {entry.get('ras_vei_placa','—')}  |  Paradas ≥ {mn} min: {len(pars)}",
                     f"  Total parado: {tot:.0f} min  ({tot/60:.1f} h)","",
@@ -800,7 +888,7 @@ class TabRelatorios(tk.Frame):
                 for i,(a,b,d) in enumerate(pars,1):
                     lines.append(f"  {i:>3}  {a.strftime('%d/%m %H:%M:%S'):<18}  {b.strftime('%d/%m %H:%M:%S'):<18}  {d:>6.1f} min")
                 write(res2,"\n".join(lines))
-            threading.Thread(target=task,daemon=True).start()
+            run_bg(task,key="relatorios/paradas")
         btn(hdr2,"⏸ ANALISAR",paradas,C["blue"]).pack(side="right",pady=4)
         mk_export_btn(hdr2,res2,is_text=True).pack(side="right",padx=4,pady=4)
 
@@ -809,34 +897,46 @@ class TabRelatorios(tk.Frame):
         hdr3,ev3,ei3,ef3=self._hdr(f3)
         cols3=("Seq","Data GPS","Lat","Lon","Vel. km/h","Ign.","GPS","Satél.")
         ws3=(50,150,110,110,90,70,60,60)
-        t3=mk_tree(f3,cols3,ws3,"Replay",C["purple"],14)
+        t3=mk_ftree(f3,cols3,ws3,"Replay",C["purple"],14,virtual=True)
         lb3=lbl(f3,"",col=C["text_dim"]); lb3.pack(anchor="e",padx=10,pady=2)
+        last3={"evs":[],"placa":""}
         def replay():
             q=ev3.get().strip()
             if not q: return
             lb3.config(text="⏳...")
+            try:
+                ini=datetime.strptime(ei3.get().strip(),"%d/%m/%Y %H:%M")
+                fim=datetime.strptime(ef3.get().strip(),"%d/%m/%Y %H:%M")
+            except: lb3.config(text="⚠ Datas inválidas."); return
             def task():
                 entry=find_vehicle(q)
-                if not entry: lb3.config(text="✖ Não encontrado."); return
-                vid=safe_int(entry.get("ras_vei_id",0))
-                try:
-                    ini=datetime.strptime(ei3.get().strip(),"%d/%m/%Y %H:%M")
-                    fim=datetime.strptime(ef3.get().strip(),"%d/%m/%Y %H:%M")
-                except: lb3.config(text="⚠ Datas inválidas."); return
-                evs=extract_list(api_get(f"/events/interval/id/{vid}/begin/{ts(ini)}/end/{ts(fim)}").get("data",[]))
-                for r in t3.get_children(): t3.delete(r)
+                if not entry: ui(lb3).config(text="✖ Não encontrado."); return
+                vid=entry.vid
+                evs=get_interval_events(vid,ini,fim)
+                last3.update(evs=evs,placa=entry.placa or str(vid))
+                rows=[]
                 for i,ev4 in enumerate(evs,1):
-                    ign=safe_int(ev4.get("ras_eve_ignicao",0))
-                    t3.insert("","end",values=(i,safe_str(ev4.get("ras_eve_data_gps")),
+                    ign=ev4.ign
+                    rows.append(((i,safe_str(ev4.get("ras_eve_data_gps")),
                         safe_str(ev4.get("ras_eve_latitude")),safe_str(ev4.get("ras_eve_longitude")),
-                        safe_int(ev4.get("ras_eve_velocidade",0)),
-                        "ON" if ign else "OFF","✓" if safe_int(ev4.get("ras_eve_gps_status")) else "✗",
-                        safe_int(ev4.get("ras_eve_satelites",0))),tags=("on" if ign else "off",))
-                t3.tag_configure("on",background=C["surface2"]); t3.tag_configure("off",background=C["surface3"])
-                lb3.config(text=f"{entry.get('ras_vei_placa','—')}  |  {len(evs)} pontos  |  {now_str()}")
-            threading.Thread(target=task,daemon=True).start()
+                        ev4.vel,
+                        "ON" if ign else "OFF","✓" if ev4.gps else "✗",
+                        ev4.sat),("on" if ign else "off",)))
+                ui(t3).load(rows)
+                ui(t3).tag_configure("on",background=C["surface2"]); ui(t3).tag_configure("off",background=C["surface3"])
+                ui(lb3).config(text=f"{entry.get('ras_vei_placa','—')}  |  {len(evs)} pontos  |  {now_str()}")
+            run_bg(task,key="relatorios/replay")
+        def replay_fleet():
+            try:
+                ini=datetime.strptime(ei3.get().strip(),"%d/%m/%Y %H:%M")
+                fim=datetime.strptime(ef3.get().strip(),"%d/%m/%Y %H:%M")
+            except: lb3.config(text="⚠ Datas inválidas."); return
+            export_columnar_fleet(ini,fim,lb3)
         btn(hdr3,"🗺 REPLAY",replay,C["purple"]).pack(side="right",pady=4)
         mk_export_btn(hdr3,t3).pack(side="right",padx=4,pady=4)
+        btn(hdr3,"📦 PARQUET",lambda:export_columnar(lambda:last3["evs"],f"replay_{last3['placa']}"),
+            C["surface3"],C["purple"],px=10,py=5).pack(side="right",padx=4,pady=4)
+        btn(hdr3,"📦 FROTA",replay_fleet,C["surface3"],C["purple"],px=10,py=5).pack(side="right",padx=4,pady=4)
 
         # ── Temperatura Viva ──
         f4=tk.Frame(nb,bg=C["bg"]); nb.add(f4,text="  Temperatura Viva  ")
@@ -855,13 +955,13 @@ class TabRelatorios(tk.Frame):
                 if isinstance(sensors,str):
                     try: sensors=json.loads(sensors)
                     except: sensors={}
-                ign=safe_int(entry.get("ras_eve_ignicao",0))
+                ign=entry.ign
                 lines=["="*42,f"  Placa  : {entry.get('ras_vei_placa','—')}",
                     f"  Veículo: {entry.get('ras_vei_veiculo','—')}",
                     f"  Ignição: {'🟢 ON' if ign else '⚫ OFF'}",
                     f"  Frio   : {'🟢 ON' if safe_int(entry.get('ras_eve_input',0)[2]) else '⚫ OFF'}",
-                    f"  Vel.   : {safe_int(entry.get('ras_eve_velocidade',0))} km/h",
-                    f"  GPS    : {'✓ OK' if safe_int(entry.get('ras_eve_gps_status')) else '✗ FALHA'}",
+                    f"  Vel.   : {entry.vel} km/h",
+                    f"  GPS    : {'✓ OK' if entry.gps else '✗ FALHA'}",
                     f"  Última : {entry.get('ras_eve_data_gps','—')}","","  Sensores:","  "+"─"*36]
                 if isinstance(sensors,dict) and sensors:
                     for k,v in sensors.items():
@@ -869,7 +969,7 @@ class TabRelatorios(tk.Frame):
                         lines.append(f"  {k:12s}: {fv:>6.1f}°C  {bar}")
                 else: lines.append("  Sem dados de temperatura.")
                 write(res4,"\n".join(lines))
-            threading.Thread(target=task,daemon=True).start()
+            run_bg(task,key="relatorios/temp")
         btn(c4,"🌡 CONSULTAR",temp,C["orange"]).pack(side="left")
         mk_export_btn(c4,res4,is_text=True).pack(side="left",padx=6)
 
@@ -886,16 +986,16 @@ class TabRelatorios(tk.Frame):
             q=ev5.get().strip()
             if not q: return
             loading(res5)
+            try:
+                ini=datetime.strptime(ei5.get().strip(),"%d/%m/%Y %H:%M")
+                fim=datetime.strptime(ef5.get().strip(),"%d/%m/%Y %H:%M")
+                tmin=float(e_tmin.get()); tmax=float(e_tmax.get())
+            except: write(res5,"⚠ Inválido.",C["warn"]); return
             def task():
                 entry=find_vehicle(q)
                 if not entry: err(res5,"Não encontrado."); return
-                vid=safe_int(entry.get("ras_vei_id",0))
-                try:
-                    ini=datetime.strptime(ei5.get().strip(),"%d/%m/%Y %H:%M")
-                    fim=datetime.strptime(ef5.get().strip(),"%d/%m/%Y %H:%M")
-                    tmin=float(e_tmin.get()); tmax=float(e_tmax.get())
-                except: write(res5,"⚠ Inválido.",C["warn"]); return
-                evs=extract_list(api_get(f"/events/interval/id/{vid}/begin/{ts(ini)}/end/{ts(fim)}").get("data",[]))
+                vid=entry.vid
+                evs=get_interval_events(vid,ini,fim)
                 if not evs: write(res5,"ℹ Nenhum evento.",C["text_mid"]); return
                 temps={}; viols=[]
                 for ev6 in evs:
@@ -931,7 +1031,7 @@ class TabRelatorios(tk.Frame):
                         lines.append(f"  {'🔴' if v>tmax else '🔵'} {d}  {s}: {v:.1f}°C")
                 col=C["success"] if pct>=90 else C["warn"] if pct>=70 else C["danger"]
                 write(res5,"\n".join(lines),col)
-            threading.Thread(target=task,daemon=True).start()
+            run_bg(task,key="relatorios/frio")
         btn(hdr5,"❄ RELATÓRIO",frio,C["blue"]).pack(side="right",pady=4)
         mk_export_btn(hdr5,res5,is_text=True).pack(side="right",padx=4,pady=4)
 
@@ -950,23 +1050,24 @@ class TabRelatorios(tk.Frame):
             lb6.config(text="⏳ Verificando...")
             def task():
                 data=get_all_events()
-                for r in t6.get_children(): t6.delete(r)
+                rows=Rows()
                 ac=0
                 for ev7 in data:
-                    vel=safe_int(ev7.get("ras_eve_velocidade",0))
+                    vel=ev7.vel
                     if vel>lim or vel<0:
                         ac+=1
-                        t6.insert("","end",values=(safe_str(ev7.get("ras_vei_placa")),
+                        rows.add((safe_str(ev7.get("ras_vei_placa")),
                             safe_str(ev7.get("ras_mot_nome")),f"🚨 {vel} km/h",
-                            "ON" if safe_int(ev7.get("ras_eve_ignicao")) else "OFF",
-                            "✓" if safe_int(ev7.get("ras_eve_gps_status")) else "✗",
+                            "ON" if ev7.ign else "OFF",
+                            "✓" if ev7.gps else "✗",
                             safe_str(ev7.get("ras_eve_data_gps"))),tags=("al",))
-                t6.tag_configure("al",background="#1a0808")
-                lb6.config(text=f"Total: {len(data)}  |  ⚠ Alertas: {ac}  |  {now_str()}")
-            threading.Thread(target=task,daemon=True).start()
+                fill_tree(t6,rows)
+                ui(t6).tag_configure("al",background="#1a0808")
+                ui(lb6).config(text=f"Total: {len(data)}  |  ⚠ Alertas: {ac}  |  {now_str()}")
+            run_bg(task,key="relatorios/alertas_vel")
         btn(c6,"⚡ VERIFICAR",alertas_vel,C["danger"]).pack(side="left",padx=8)
         mk_export_btn(c6,t6).pack(side="left",padx=4)
-        self.after(500,alertas_vel)
+        on_first_show(f6,alertas_vel)
 
 # ─── ABA 6: CLIENTES ─────────────────────────────────────────────────────────
 class TabClientes(tk.Frame):
@@ -986,18 +1087,19 @@ class TabClientes(tk.Frame):
             lb.config(text="⏳...")
             def task():
                 d=get_clients_all()
-                for r in t.get_children(): t.delete(r)
+                rows=Rows()
                 for c2 in d:
-                    t.insert("","end",values=(safe_str(c2.get("ras_cli_id")),safe_str(c2.get("ras_cli_desc")),
+                    rows.add((safe_str(c2.get("ras_cli_id")),safe_str(c2.get("ras_cli_desc")),
                         safe_str(c2.get("ras_cli_razao")),safe_str(c2.get("ras_cli_endereco")),
                         safe_str(c2.get("ras_cli_cidade")),safe_str(c2.get("ras_cli_uf")),
                         safe_str(c2.get("ras_cli_cnpj")),safe_str(c2.get("ras_cli_tipo")),
                         safe_str(c2.get("ras_cli_liberado"))))
-                lb.config(text=f"{len(d)} clientes")
-            threading.Thread(target=task,daemon=True).start()
+                fill_tree(t,rows)
+                ui(lb).config(text=f"{len(d)} clientes")
+            run_bg(task,key="clientes/load")
         btn(c,"⟳  CARREGAR",load,C["pink"]).pack(side="left")
         mk_export_btn(c,t).pack(side="left",padx=6)
-        self.after(200,load)
+        on_first_show(f,load)
         # Cadastrar
         f2=tk.Frame(nb,bg=C["bg"]); nb.add(f2,text="  Cadastrar  ")
         b2=tk.Frame(f2,bg=C["bg"]); b2.pack(fill="both",expand=True,padx=20,pady=12)
@@ -1012,13 +1114,14 @@ class TabClientes(tk.Frame):
         _,res2=txtbox(b2,4); _.pack(fill="x",pady=(8,0))
         def cad():
             write(res2,"⏳...",C["accent"])
+            body={k:v.get() for k,v in fd2.items() if v.get().strip()}
             def task():
-                resp,code=api_put("/clients/save",{k:v.get() for k,v in fd2.items() if v.get().strip()})
+                resp,code=api_put("/clients/save",body)
                 if resp.get("status") or code in (200,201):
                     d=extract_list(resp.get("data",resp))
                     ok(res2,f"Cliente criado! ID: {d[0].get('ras_cli_id','?') if d else '?'}")
                 else: err(res2,f"Falha {code}")
-            threading.Thread(target=task,daemon=True).start()
+            run_bg(task,name="clientes/cad")
         btn(b2,"CADASTRAR",cad,C["green"]).pack(pady=(8,0))
         # Motoristas
         f3=tk.Frame(nb,bg=C["bg"]); nb.add(f3,text="  Motoristas  ")
@@ -1033,12 +1136,13 @@ class TabClientes(tk.Frame):
             lb3.config(text="⏳...")
             def task():
                 d=extract_list(api_get("/drivers",{"client":cid}).get("data",[]))
-                for r in t3.get_children(): t3.delete(r)
+                rows=Rows()
                 for m in d:
-                    t3.insert("","end",values=(safe_str(m.get("ras_mot_id")),safe_str(m.get("ras_mot_nome")),
+                    rows.add((safe_str(m.get("ras_mot_id")),safe_str(m.get("ras_mot_nome")),
                         safe_str(m.get("ras_mot_cpf")),safe_str(m.get("ras_mot_cnh"))))
-                lb3.config(text=f"{len(d)} motoristas")
-            threading.Thread(target=task,daemon=True).start()
+                fill_tree(t3,rows)
+                ui(lb3).config(text=f"{len(d)} motoristas")
+            run_bg(task,key="clientes/mot")
         btn(c3,"BUSCAR",mot,C["yellow"]).pack(side="left")
         mk_export_btn(c3,t3).pack(side="left",padx=6)
         # Contatos
@@ -1055,15 +1159,16 @@ class TabClientes(tk.Frame):
             if not cid: return
             def task():
                 d=extract_list(api_get(f"/contacts/single/id/{cid}").get("data",[]))
-                for r in t4.get_children(): t4.delete(r)
+                rows=Rows()
                 for c2 in d:
-                    t4.insert("","end",values=(safe_str(c2.get("ras_ccn_id")),safe_str(c2.get("ras_ccn_contato")),
+                    rows.add((safe_str(c2.get("ras_ccn_id")),safe_str(c2.get("ras_ccn_contato")),
                         safe_str(c2.get("ras_ccn_telefone")),safe_str(c2.get("ras_ccn_email")),
                         "Sim" if safe_int(c2.get("ras_ccn_email_alerta")) else "Não",
                         "Sim" if safe_int(c2.get("ras_ccn_sms_alerta")) else "Não",
                         "Sim" if safe_int(c2.get("ras_ccn_email_master")) else "Não"))
-                lb4.config(text=f"{len(d)} contatos")
-            threading.Thread(target=task,daemon=True).start()
+                fill_tree(t4,rows)
+                ui(lb4).config(text=f"{len(d)} contatos")
+            run_bg(task,key="clientes/cont")
         btn(c4,"BUSCAR",cont,C["pink"]).pack(side="left")
         mk_export_btn(c4,t4).pack(side="left",padx=6)
 
@@ -1084,17 +1189,18 @@ class TabRastreadores(tk.Frame):
         def load():
             def task():
                 d=get_trackers_all()
-                for r in t.get_children(): t.delete(r)
+                rows=Rows()
                 for tr in d:
-                    t.insert("","end",values=(safe_str(tr.get("ras_ras_id")),safe_str(tr.get("ras_ras_id_aparelho")),
+                    rows.add((safe_str(tr.get("ras_ras_id")),safe_str(tr.get("ras_ras_id_aparelho")),
                         safe_str(tr.get("ras_ras_status")),safe_str(tr.get("ras_ras_prd_id")),
                         safe_str(tr.get("ras_ras_cli_id")),safe_str(tr.get("ras_ras_chip")),
                         safe_str(tr.get("ras_ras_linha")),safe_str(tr.get("ras_ras_data_ult_comunicacao"))))
-                lb.config(text=f"{len(d)} rastreadores")
-            threading.Thread(target=task,daemon=True).start()
+                fill_tree(t,rows)
+                ui(lb).config(text=f"{len(d)} rastreadores")
+            run_bg(task,key="rastreadores/load")
         btn(c,"⟳  CARREGAR",load,C["orange"]).pack(side="left")
         mk_export_btn(c,t).pack(side="left",padx=6)
-        self.after(200,load)
+        on_first_show(f,load)
         # Veículos próximos
         f2=tk.Frame(nb,bg=C["bg"]); nb.add(f2,text="  Veículos Próximos  ")
         c2=tk.Frame(f2,bg=C["bg"]); c2.pack(fill="x",padx=8,pady=6)
@@ -1116,15 +1222,16 @@ class TabRastreadores(tk.Frame):
             lb2.config(text="⏳...")
             def task():
                 d=extract_list(api_get(f"/vehiclesnearby/nearpoint/id/{cid}/lat/{lat}/long/{lon}/limit/{r}").get("data",[]))
-                for r2 in t2.get_children(): t2.delete(r2)
+                rows=Rows()
                 for v in d:
                     loc=v.get("loc") or ["—","—"]
-                    t2.insert("","end",values=(safe_str(v.get("ras_vei_placa")),safe_str(v.get("ras_vei_veiculo")),
+                    rows.add((safe_str(v.get("ras_vei_placa")),safe_str(v.get("ras_vei_veiculo")),
                         safe_str(v.get("ras_vei_tipo")),"ON" if safe_int(v.get("ras_eve_ignicao")) else "OFF",
                         safe_str(v.get("ras_eve_velocidade")),safe_str(v.get("distancia")),
                         safe_str(v.get("ras_eve_data_gps")),str(loc[0]),str(loc[1])))
-                lb2.config(text=f"{len(d)} veículos próximos | {now_str()}")
-            threading.Thread(target=task,daemon=True).start()
+                fill_tree(t2,rows)
+                ui(lb2).config(text=f"{len(d)} veículos próximos | {now_str()}")
+            run_bg(task,key="rastreadores/prox")
         btn(c2,"BUSCAR",prox,C["green"]).pack(side="left",padx=8)
         mk_export_btn(c2,t2).pack(side="left",padx=4)
         # Pontos de referência
@@ -1141,14 +1248,15 @@ class TabRastreadores(tk.Frame):
             def task():
                 if cid: d=extract_list(api_get(f"/referencepoints/client/id/{cid}").get("data",[]))
                 else: d=extract_list(api_get("/referencepoints/all",{"limit":500,"offset":0}).get("data",[]))
-                for r in t3.get_children(): t3.delete(r)
+                rows=Rows()
                 for p in d:
-                    t3.insert("","end",values=(safe_str(p.get("ras_ref_id")),safe_str(p.get("ras_ref_descricao")),
+                    rows.add((safe_str(p.get("ras_ref_id")),safe_str(p.get("ras_ref_descricao")),
                         safe_str(p.get("ras_ref_latitude")),safe_str(p.get("ras_ref_longitude")),
                         safe_str(p.get("ras_ref_icone")),safe_str(p.get("ras_ref_cidade")),
                         safe_str(p.get("ras_ref_uf")),safe_str(p.get("ras_ref_data_cadastro"))))
-                lb3.config(text=f"{len(d)} pontos")
-            threading.Thread(target=task,daemon=True).start()
+                fill_tree(t3,rows)
+                ui(lb3).config(text=f"{len(d)} pontos")
+            run_bg(task,key="rastreadores/pts")
         btn(c3,"BUSCAR",pts,C["accent"]).pack(side="left")
         mk_export_btn(c3,t3).pack(side="left",padx=6)
         # Passageiros
@@ -1159,17 +1267,18 @@ class TabRastreadores(tk.Frame):
         def pass_load():
             def task():
                 d=get_passengers_all()
-                for r in t4.get_children(): t4.delete(r)
+                rows=Rows()
                 for p in d:
-                    t4.insert("","end",values=(safe_str(p.get("ras_pas_id")),safe_str(p.get("ras_pas_nome")),
+                    rows.add((safe_str(p.get("ras_pas_id")),safe_str(p.get("ras_pas_nome")),
                         safe_str(p.get("ras_pas_rfid")),safe_str(p.get("ras_pas_empresa")),
                         safe_str(p.get("ras_pas_setor")),safe_str(p.get("ras_pas_cargo")),
                         safe_str(p.get("ras_pas_data_cadastro"))))
-                lb4.config(text=f"{len(d)} passageiros")
-            threading.Thread(target=task,daemon=True).start()
+                fill_tree(t4,rows)
+                ui(lb4).config(text=f"{len(d)} passageiros")
+            run_bg(task,key="rastreadores/pass_load")
         btn(c4,"⟳  CARREGAR",pass_load,C["accent2"]).pack(side="left")
         mk_export_btn(c4,t4).pack(side="left",padx=6)
-        self.after(400,pass_load)
+        on_first_show(f4,pass_load)
         # Saúde da frota
         f5=tk.Frame(nb,bg=C["bg"]); nb.add(f5,text="  Saúde da Frota  ")
         c5=tk.Frame(f5,bg=C["bg"]); c5.pack(fill="x",padx=8,pady=6)
@@ -1181,24 +1290,25 @@ class TabRastreadores(tk.Frame):
             lb5.config(text="⏳...")
             def task():
                 d=get_all_events(); al=0
-                for r in t5.get_children(): t5.delete(r)
+                rows=KeyedRows()
                 for ev in d:
-                    bat=safe_int(ev.get("ras_eve_porc_bat_backup",100))
-                    volt=safe_float(ev.get("ras_eve_voltagem",0))
-                    gps=safe_int(ev.get("ras_eve_gps_status",0))
-                    ign=safe_int(ev.get("ras_eve_ignicao",0))
+                    bat=ev.bat
+                    volt=ev.volt
+                    gps=ev.gps
+                    ign=ev.ign
                     tag="al" if bat<30 or volt==0 or not gps else "ok"
                     if tag=="al": al+=1
-                    t5.insert("","end",values=(safe_str(ev.get("ras_vei_placa")),safe_str(ev.get("ras_vei_veiculo")),
+                    rows.add(ev.vid,(safe_str(ev.get("ras_vei_placa")),safe_str(ev.get("ras_vei_veiculo")),
                         f"{bat}%",f"{volt:.1f}V","✓ OK" if gps else "✗ FALHA",
-                        safe_int(ev.get("ras_eve_satelites",0)),"ON" if ign else "OFF",
+                        ev.sat,"ON" if ign else "OFF",
                         safe_str(ev.get("ras_eve_data_gps"))),tags=(tag,))
-                t5.tag_configure("al",background="#1a0808"); t5.tag_configure("ok",background=C["surface2"])
-                lb5.config(text=f"Total: {len(d)}  |  ⚠ Alertas: {al}  |  {now_str()}")
-            threading.Thread(target=task,daemon=True).start()
+                sync_tree(t5,rows)
+                ui(t5).tag_configure("al",background="#1a0808"); ui(t5).tag_configure("ok",background=C["surface2"])
+                ui(lb5).config(text=f"Total: {len(d)}  |  ⚠ Alertas: {al}  |  {now_str()}")
+            run_bg(task,key="rastreadores/saude")
         btn(c5,"⟳  ATUALIZAR",saude,C["warn"]).pack(side="left")
         mk_export_btn(c5,t5).pack(side="left",padx=6)
-        self.after(300,saude)
+        on_first_show(f5,saude)
         # Ranking
         f6=tk.Frame(nb,bg=C["bg"]); nb.add(f6,text="  Ranking Motoristas  ")
         c6=tk.Frame(f6,bg=C["bg"]); c6.pack(fill="x",padx=8,pady=6)
@@ -1210,7 +1320,7 @@ class TabRastreadores(tk.Frame):
                 data=get_all_events(); mots={}
                 for ev in data:
                     nm=safe_str(ev.get("ras_mot_nome"),"Desconhecido")
-                    vel=abs(safe_int(ev.get("ras_eve_velocidade",0)))
+                    vel=abs(ev.vel)
                     pl=safe_str(ev.get("ras_vei_placa"))
                     if nm not in mots: mots[nm]={"v":set(),"vels":[]}
                     mots[nm]["v"].add(pl)
@@ -1221,17 +1331,18 @@ class TabRastreadores(tk.Frame):
                     sc=max(0,100-max(0,vmx-80)//2-int(max(0,vmd-60)))
                     rk.append((nm,len(d["v"]),vmx,vmd,sc))
                 rk.sort(key=lambda x:x[4],reverse=True)
-                for r in t6.get_children(): t6.delete(r)
+                rows=Rows()
                 m=["🥇","🥈","🥉"]
                 for i,(nm,nv,vmx,vmd,sc) in enumerate(rk,1):
-                    t6.insert("","end",values=(m[i-1] if i<=3 else f"#{i}",nm,nv,f"{vmx} km/h",f"{vmd:.1f} km/h",f"{sc}"),
+                    rows.add((m[i-1] if i<=3 else f"#{i}",nm,nv,f"{vmx} km/h",f"{vmd:.1f} km/h",f"{sc}"),
                               tags=("t" if i<=3 else "n",))
-                t6.tag_configure("t",background="#1a1a2e"); t6.tag_configure("n",background=C["surface2"])
-                lb6.config(text=f"{len(rk)} motoristas")
-            threading.Thread(target=task,daemon=True).start()
+                fill_tree(t6,rows)
+                ui(t6).tag_configure("t",background="#1a1a2e"); ui(t6).tag_configure("n",background=C["surface2"])
+                ui(lb6).config(text=f"{len(rk)} motoristas")
+            run_bg(task,key="rastreadores/rank")
         btn(c6,"🏆 CALCULAR",rank,C["yellow"]).pack(side="left")
         mk_export_btn(c6,t6).pack(side="left",padx=6)
-        self.after(400,rank)
+        on_first_show(f6,rank)
 
 # ─── ABA 8: COMANDOS & PAGINAÇÃO ─────────────────────────────────────────────
 class TabComandos(tk.Frame):
@@ -1255,14 +1366,15 @@ class TabComandos(tk.Frame):
             if not e_ap.get().strip() or not e_cmd.get().strip():
                 write(res,"⚠ Preencha aparelho e comando.",C["warn"]); return
             write(res,"⏳ Enviando...",C["accent"])
+            body={"ras_ras_id_aparelho":e_ap.get().strip(),
+                  "comando_string":e_cmd.get().strip(),"comando_descricao":e_desc.get().strip()}
             def task():
-                resp,code=api_post("/commands/direct",{"ras_ras_id_aparelho":e_ap.get().strip(),
-                    "comando_string":e_cmd.get().strip(),"comando_descricao":e_desc.get().strip()})
+                resp,code=api_post("/commands/direct",body)
                 if resp.get("status") or code in (200,201):
                     d=extract_list(resp.get("data",resp))
                     ok(res,f"Enviado! ID comando: {d[0].get('ras_com_id','?') if d else '?'}")
                 else: err(res,f"Falha {code}\n{json.dumps(resp,indent=2)}")
-            threading.Thread(target=task,daemon=True).start()
+            run_bg(task,name="comandos/enviar")
         btn(b,"⚡  ENVIAR",enviar,C["danger"]).pack(pady=(10,0))
         mk_export_btn(b,res,is_text=True).pack(pady=(6,0))
         # Status comando
@@ -1282,7 +1394,7 @@ class TabComandos(tk.Frame):
                 lines=["="*44]
                 for k,v in d[0].items(): lines.append(f"  {k:30s}: {safe_str(v)}")
                 lines.append("="*44); write(res2,"\n".join(lines))
-            threading.Thread(target=task,daemon=True).start()
+            run_bg(task,key="comandos/status")
         btn(b2,"CONSULTAR STATUS",status,C["accent"]).pack(pady=(10,0))
         mk_export_btn(b2,res2,is_text=True).pack(pady=(6,0))
         # Comandos disponíveis
@@ -1297,10 +1409,11 @@ class TabComandos(tk.Frame):
             if not pid: return
             def task():
                 d=extract_list(api_get(f"/commands/list/id/{pid}").get("data",[]))
-                for r in t3.get_children(): t3.delete(r)
-                for c4 in d: t3.insert("","end",values=(safe_str(c4.get("ras_stc_id")),safe_str(c4.get("ras_stc_descricao"))))
-                lb3.config(text=f"{len(d)} comandos")
-            threading.Thread(target=task,daemon=True).start()
+                rows=Rows()
+                for c4 in d: rows.add((safe_str(c4.get("ras_stc_id")),safe_str(c4.get("ras_stc_descricao"))))
+                fill_tree(t3,rows)
+                ui(lb3).config(text=f"{len(d)} comandos")
+            run_bg(task,key="comandos/cmd_list")
         btn(c3,"LISTAR",cmd_list,C["accent"]).pack(side="left")
         mk_export_btn(c3,t3).pack(side="left",padx=6)
         # Paginação
@@ -1315,22 +1428,23 @@ class TabComandos(tk.Frame):
                    (90,130,150,70,60,60,120,120),"Pag",C["accent2"],13)
         def buscar4():
             lb4.config(text="⏳...")
+            try: pg=int(e4.get()); pp=int(e4b.get())
+            except: pg=1; pp=50
             def task():
-                try: pg=int(e4.get()); pp=int(e4b.get())
-                except: pg=1; pp=50
                 resp=api_get("/events/pagination",{"page":pg,"per_page":pp})
                 d=resp.get("data",{})
-                evs=d.get("eventos",[]) if isinstance(d,dict) else extract_list(d)
+                evs=parse_events(d.get("eventos",[]) if isinstance(d,dict) else extract_list(d))
                 tpg=d.get("pages",["?"])[0] if isinstance(d,dict) and d.get("pages") else resp.get("pages","?")
-                for r in t4.get_children(): t4.delete(r)
+                rows=Rows()
                 for ev in evs:
-                    t4.insert("","end",values=(safe_str(ev.get("ras_vei_placa")),safe_str(ev.get("ras_mot_nome")),
-                        safe_str(ev.get("ras_eve_data_gps")),f"{safe_int(ev.get('ras_eve_velocidade',0))} km/h",
-                        "ON" if safe_int(ev.get("ras_eve_ignicao")) else "OFF",
-                        "✓" if safe_int(ev.get("ras_eve_gps_status")) else "✗",
+                    rows.add((safe_str(ev.get("ras_vei_placa")),safe_str(ev.get("ras_mot_nome")),
+                        safe_str(ev.get("ras_eve_data_gps")),f"{ev.vel} km/h",
+                        "ON" if ev.ign else "OFF",
+                        "✓" if ev.gps else "✗",
                         safe_str(ev.get("ras_eve_latitude")),safe_str(ev.get("ras_eve_longitude"))))
-                lb4.config(text=f"Pg {pg}/{tpg}  |  {len(evs)} eventos  |  {now_str()}")
-            threading.Thread(target=task,daemon=True).start()
+                fill_tree(t4,rows)
+                ui(lb4).config(text=f"Pg {pg}/{tpg}  |  {len(evs)} eventos  |  {now_str()}")
+            run_bg(task,key="comandos/buscar4")
         def prev4():
             try: p=max(1,int(e4.get())-1)
             except: p=1
@@ -1344,7 +1458,7 @@ class TabComandos(tk.Frame):
         btn(c4b,"  BUSCAR  ",buscar4,C["accent2"]).pack(side="left",padx=4)
         btn(c4b,"PRÓXIMA ▶",next4,C["surface3"],C["text"]).pack(side="left")
         mk_export_btn(c4b,t4).pack(side="left",padx=8)
-        self.after(200,buscar4)
+        on_first_show(f4,buscar4)
         # Auditoria
         f5=tk.Frame(nb,bg=C["bg"]); nb.add(f5,text="  Auditoria  ")
         c5=tk.Frame(f5,bg=C["bg"]); c5.pack(fill="x",padx=8,pady=6)
@@ -1359,31 +1473,30 @@ class TabComandos(tk.Frame):
         lb5=lbl(c5,"",col=C["text_dim"]); lb5.pack(side="right")
         cols5=("Seq","Data GPS","Vel.","Ign.","GPS","Satél.","Volt.","Lat","Lon")
         ws5=(50,150,80,60,60,60,80,120,120)
-        t5=mk_tree(f5,cols5,ws5,"Aud",C["text_mid"],14)
+        t5=mk_ftree(f5,cols5,ws5,"Aud",C["text_mid"],14,virtual=True)
         def audit():
             q=e5.get().strip()
             if not q: lb5.config(text="⚠ Informe a placa."); return
             lb5.config(text="⏳...")
+            try:
+                ini=datetime.strptime(ei5.get().strip(),"%d/%m/%Y %H:%M")
+                fim=datetime.strptime(ef5.get().strip(),"%d/%m/%Y %H:%M")
+            except: lb5.config(text="⚠ Datas inválidas."); return
             def task():
                 entry=find_vehicle(q)
-                if not entry: lb5.config(text="✖ Não encontrado."); return
-                vid=safe_int(entry.get("ras_vei_id",0))
-                try:
-                    ini=datetime.strptime(ei5.get().strip(),"%d/%m/%Y %H:%M")
-                    fim=datetime.strptime(ef5.get().strip(),"%d/%m/%Y %H:%M")
-                except: lb5.config(text="⚠ Datas inválidas."); return
-                evs=extract_list(api_get(f"/events/interval/id/{vid}/begin/{ts(ini)}/end/{ts(fim)}").get("data",[]))
-                for r in t5.get_children(): t5.delete(r)
-                for i,ev in enumerate(evs,1):
-                    t5.insert("","end",values=(i,safe_str(ev.get("ras_eve_data_gps")),
-                        f"{safe_int(ev.get('ras_eve_velocidade',0))} km/h",
-                        "ON" if safe_int(ev.get("ras_eve_ignicao")) else "OFF",
-                        "✓" if safe_int(ev.get("ras_eve_gps_status")) else "✗",
-                        safe_int(ev.get("ras_eve_satelites",0)),
-                        f"{safe_float(ev.get('ras_eve_voltagem',0)):.1f}V",
-                        safe_str(ev.get("ras_eve_latitude")),safe_str(ev.get("ras_eve_longitude"))))
-                lb5.config(text=f"{entry.get('ras_vei_placa','—')}  |  {len(evs)} eventos  |  {now_str()}")
-            threading.Thread(target=task,daemon=True).start()
+                if not entry: ui(lb5).config(text="✖ Não encontrado."); return
+                vid=entry.vid
+                evs=get_interval_events(vid,ini,fim)
+                ui(t5).load([(i,safe_str(ev.get("ras_eve_data_gps")),
+                        f"{ev.vel} km/h",
+                        "ON" if ev.ign else "OFF",
+                        "✓" if ev.gps else "✗",
+                        ev.sat,
+                        f"{ev.volt:.1f}V",
+                        safe_str(ev.get("ras_eve_latitude")),safe_str(ev.get("ras_eve_longitude")))
+                    for i,ev in enumerate(evs,1)])
+                ui(lb5).config(text=f"{entry.get('ras_vei_placa','—')}  |  {len(evs)} eventos  |  {now_str()}")
+            run_bg(task,key="comandos/audit")
         btn(c5,"🔍  BUSCAR",audit,C["accent2"]).pack(side="left",padx=8)
         mk_export_btn(c5,t5).pack(side="left",padx=4)
 
@@ -1419,15 +1532,16 @@ class TabDiagnostico(tk.Frame):
             lb1.config(text="⏳ Verificando...")
             def task():
                 data=get_all_events()
-                for r in t1.get_children(): t1.delete(r)
+                rows=KeyedRows()
                 ac=0; now=datetime.now()
                 for ev in data:
+                    checkpoint()
                     placa=safe_str(ev.get("ras_vei_placa"))
-                    vel=safe_int(ev.get("ras_eve_velocidade",0))
+                    vel=ev.vel
                     d_gps=safe_str(ev.get("ras_eve_data_gps"))
                     d_env=safe_str(ev.get("ras_eve_data_enviado"))
-                    dt_gps=parse_dt(d_gps)
-                    dt_env=parse_dt(d_env)
+                    dt_gps=ev.dt
+                    dt_env=ev.dt_env
                     problemas=[]
                     defasagem="—"
                     # Defasagem de tempo
@@ -1442,24 +1556,25 @@ class TabDiagnostico(tk.Frame):
                         if diff>=tol:
                             problemas.append(f"Sem envio {diff:.0f}min")
                     # Veículo andando com velocidade mas GPS não muda
-                    lat=safe_float(ev.get("ras_eve_latitude"),None)
-                    lon=safe_float(ev.get("ras_eve_longitude"),None)
+                    lat=ev.lat
+                    lon=ev.lon
                     if vel>5 and lat is not None:
                         # Marca como suspeito — análise completa requereria histórico
                         problemas.append(f"Vel={vel}km/h")
                     if problemas:
                         ac+=1
                         sit=" | ".join(problemas)
-                        t1.insert("","end",values=(placa,safe_str(ev.get("ras_vei_veiculo")),
+                        rows.add(ev.vid,(placa,safe_str(ev.get("ras_vei_veiculo")),
                             safe_str(ev.get("ras_mot_nome")),d_gps,d_env,defasagem,
                             f"{vel} km/h",sit),tags=("al",))
-                t1.tag_configure("al",background="#1a1500")
-                lb1.config(text=f"Total: {len(data)}  |  ⚠ Suspeitos: {ac}  |  {now_str()}")
-            threading.Thread(target=task,daemon=True).start()
+                sync_tree(t1,rows)
+                ui(t1).tag_configure("al",background="#1a1500")
+                ui(lb1).config(text=f"Total: {len(data)}  |  ⚠ Suspeitos: {ac}  |  {now_str()}")
+            run_bg(task,key="diagnostico/gps_travado")
 
         btn(c1,"🔍 VERIFICAR",gps_travado,C["warn"]).pack(side="left",padx=8)
         mk_export_btn(c1,t1).pack(side="left",padx=4)
-        self.after(300,gps_travado)
+        on_first_show(f1,gps_travado)
 
         # ── GPS Travado por Período (análise de rota) ────────────────────────
         f1b=tk.Frame(nb,bg=C["bg"]); nb.add(f1b,text="  🛰 GPS Travado (Período)  ")
@@ -1477,7 +1592,7 @@ class TabDiagnostico(tk.Frame):
 
         cols1b=("Seq","Data GPS","Data Envio","Defasagem(min)","Vel.","Lat","Lon","Status")
         ws1b=(50,150,150,120,70,120,120,160)
-        t1b=mk_tree(f1b,cols1b,ws1b,"GpsTp",C["warn"],14)
+        t1b=mk_ftree(f1b,cols1b,ws1b,"GpsTp",C["warn"],14,virtual=True)
 
         def gps_travado_periodo():
             q=e1b_v.get().strip()
@@ -1490,27 +1605,28 @@ class TabDiagnostico(tk.Frame):
             lb1b.config(text="⏳...")
             def task():
                 entry=find_vehicle(q)
-                if not entry: lb1b.config(text="✖ Não encontrado."); return
-                vid=safe_int(entry.get("ras_vei_id",0))
-                evs=extract_list(api_get(f"/events/interval/id/{vid}/begin/{ts(ini)}/end/{ts(fim)}").get("data",[]))
-                for r in t1b.get_children(): t1b.delete(r)
-                ac=0; prev_lat=None; prev_lon=None; prev_gps_dt=None
+                if not entry: ui(lb1b).config(text="✖ Não encontrado."); return
+                vid=entry.vid
+                evs=get_interval_events(vid,ini,fim)
+                rows=[]; ac=0; prev_lat=None; prev_gps_dt=None
+                la,lo,_=geo.track_arrays(evs); passo=geo.pairwise_km(la,lo)   # km até o ponto anterior, em lote
                 for i,ev in enumerate(evs,1):
-                    vel=safe_int(ev.get("ras_eve_velocidade",0))
-                    lat=safe_float(ev.get("ras_eve_latitude"),None)
-                    lon=safe_float(ev.get("ras_eve_longitude"),None)
+                    checkpoint()
+                    vel=ev.vel
+                    lat=ev.lat
+                    lon=ev.lon
                     d_gps=safe_str(ev.get("ras_eve_data_gps"))
                     d_env=safe_str(ev.get("ras_eve_data_enviado"))
-                    dt_gps=parse_dt(d_gps)
-                    dt_env=parse_dt(d_env)
+                    dt_gps=ev.dt
+                    dt_env=ev.dt_env
                     defasagem="—"; problemas=[]
                     if dt_gps and dt_env:
                         diff=abs((dt_env-dt_gps).total_seconds())/60
                         defasagem=f"{diff:.1f}"
                         if diff>=tol: problemas.append(f"Defasagem {diff:.0f}min")
                     # GPS congelado: posição não muda mas velocidade > 0
-                    if prev_lat is not None and lat is not None and vel>5:
-                        dist_km=haversine(prev_lat,prev_lon,lat,lon)
+                    dist_km=float(passo[i-1])
+                    if prev_lat is not None and lat is not None and vel>5 and dist_km==dist_km:
                         if dist_km*1000<dist_m:
                             problemas.append(f"Pos.congelada({dist_km*1000:.0f}m)")
                     # GPS congelado: mesmo timestamp GPS em eventos seguidos
@@ -1518,14 +1634,15 @@ class TabDiagnostico(tk.Frame):
                         problemas.append("Timestamp repetido")
                     status="⚠ "+(" | ".join(problemas)) if problemas else "✓ OK"
                     if problemas: ac+=1
-                    t1b.insert("","end",values=(i,d_gps,d_env,defasagem,f"{vel} km/h",
+                    rows.append(((i,d_gps,d_env,defasagem,f"{vel} km/h",
                         f"{lat:.5f}" if lat else "—",f"{lon:.5f}" if lon else "—",status),
-                        tags=("al" if problemas else "ok",))
-                    prev_lat=lat; prev_lon=lon; prev_gps_dt=dt_gps
-                t1b.tag_configure("al",background="#1a1500")
-                t1b.tag_configure("ok",background=C["surface2"])
-                lb1b.config(text=f"{entry.get('ras_vei_placa','—')}  |  {len(evs)} eventos  |  ⚠ {ac} problemas  |  {now_str()}")
-            threading.Thread(target=task,daemon=True).start()
+                        ("al" if problemas else "ok",)))
+                    prev_lat=lat; prev_gps_dt=dt_gps
+                ui(t1b).load(rows)
+                ui(t1b).tag_configure("al",background="#1a1500")
+                ui(t1b).tag_configure("ok",background=C["surface2"])
+                ui(lb1b).config(text=f"{entry.get('ras_vei_placa','—')}  |  {len(evs)} eventos  |  ⚠ {ac} problemas  |  {now_str()}")
+            run_bg(task,key="diagnostico/gps_travado_periodo")
 
         btn(c1b,"🔍 ANALISAR",gps_travado_periodo,C["warn"]).pack(side="left",padx=8)
         mk_export_btn(c1b,t1b).pack(side="left",padx=4)
@@ -1551,26 +1668,28 @@ class TabDiagnostico(tk.Frame):
             lb2.config(text="⏳ Verificando...")
             def task():
                 data=get_all_events()
-                for r in t2.get_children(): t2.delete(r)
+                rows=KeyedRows()
                 ac=0
                 for ev in data:
-                    ign=safe_int(ev.get("ras_eve_ignicao",0))
-                    vel=safe_int(ev.get("ras_eve_velocidade",0))
+                    checkpoint()
+                    ign=ev.ign
+                    vel=ev.vel
                     if ign==0 and vel>=vmin:
                         ac+=1
-                        t2.insert("","end",values=(
+                        rows.add(ev.vid,(
                             safe_str(ev.get("ras_vei_placa")),safe_str(ev.get("ras_vei_veiculo")),
                             safe_str(ev.get("ras_mot_nome")),"⚫ OFF",f"🚨 {vel} km/h",
-                            "✓" if safe_int(ev.get("ras_eve_gps_status")) else "✗",
+                            "✓" if ev.gps else "✗",
                             safe_str(ev.get("ras_eve_data_gps")),safe_str(ev.get("ras_cli_desc"))),
                             tags=("al",))
-                t2.tag_configure("al",background="#1a0808")
-                lb2.config(text=f"Total: {len(data)}  |  🚨 Defeituosas: {ac}  |  {now_str()}")
-            threading.Thread(target=task,daemon=True).start()
+                sync_tree(t2,rows)
+                ui(t2).tag_configure("al",background="#1a0808")
+                ui(lb2).config(text=f"Total: {len(data)}  |  🚨 Defeituosas: {ac}  |  {now_str()}")
+            run_bg(task,key="diagnostico/ignicao_defeituosa")
 
         btn(c2,"🔍 VERIFICAR",ignicao_defeituosa,C["danger"]).pack(side="left",padx=8)
         mk_export_btn(c2,t2).pack(side="left",padx=4)
-        self.after(400,ignicao_defeituosa)
+        on_first_show(f2,ignicao_defeituosa)
 
         # ── Sensores com Problema ────────────────────────────────────────────
         f3=tk.Frame(nb,bg=C["bg"]); nb.add(f3,text="  🌡 Sensores Problema  ")
@@ -1601,20 +1720,21 @@ class TabDiagnostico(tk.Frame):
             lb3.config(text="⏳ Verificando...")
             def task():
                 data=get_all_events()
-                for r in t3.get_children(): t3.delete(r)
+                rows=KeyedRows()
                 ac=0
                 for ev in data:
+                    checkpoint()
                     placa=safe_str(ev.get("ras_vei_placa"))
                     veiculo=safe_str(ev.get("ras_vei_veiculo"))
                     cliente=safe_str(ev.get("ras_cli_desc"))
                     data_gps=safe_str(ev.get("ras_eve_data_gps"))
                     problemas=[]
                     # Bateria baixa
-                    bat=safe_int(ev.get("ras_eve_porc_bat_backup",100))
+                    bat=ev.bat
                     if bat<bat_min:
                         problemas.append((placa,veiculo,f"Bateria baixa",f"{bat}%","bat_backup",data_gps,cliente))
                     # Voltagem baixa
-                    volt=safe_float(ev.get("ras_eve_voltagem",0))
+                    volt=ev.volt
                     if 0<volt<volt_min:
                         problemas.append((placa,veiculo,f"Voltagem baixa",f"{volt:.1f}V","voltagem",data_gps,cliente))
                     # Temperatura
@@ -1635,14 +1755,15 @@ class TabDiagnostico(tk.Frame):
                                 label="🔴 Temp.Alta" if fv>tmax else "🔵 Temp.Baixa"
                                 problemas.append((placa,veiculo,label,f"{fv:.1f}°C",f"sensor_{i+1}",data_gps,cliente))
                     for p in problemas:
-                        ac+=1; t3.insert("","end",values=p,tags=("al",))
-                t3.tag_configure("al",background="#1a0a00")
-                lb3.config(text=f"Total: {len(data)}  |  ⚠ Problemas: {ac}  |  {now_str()}")
-            threading.Thread(target=task,daemon=True).start()
+                        ac+=1; rows.add(f"{ev.vid}:{p[4]}",p,tags=("al",))
+                sync_tree(t3,rows)
+                ui(t3).tag_configure("al",background="#1a0a00")
+                ui(lb3).config(text=f"Total: {len(data)}  |  ⚠ Problemas: {ac}  |  {now_str()}")
+            run_bg(task,key="diagnostico/sensores_problema")
 
         btn(c3,"🔍 VERIFICAR",sensores_problema,C["orange"]).pack(side="left",padx=8)
         mk_export_btn(c3,t3).pack(side="left",padx=4)
-        self.after(500,sensores_problema)
+        on_first_show(f3,sensores_problema)
 
         # ── Veículos Desatualizados ──────────────────────────────────────────
         f4=tk.Frame(nb,bg=C["bg"]); nb.add(f4,text="  ⏰ Desatualizados  ")
@@ -1721,24 +1842,22 @@ class TabDiagnostico(tk.Frame):
         _d4_cache={"rows":[]}
 
         def _render4(rows):
-            for r in t4.get_children(): t4.delete(r)
             filtro=e4_filtro.get()
             on=off=no_gps=0; maior_s=0
             shown=[]
-            for vals,tag,diff_s in rows:
+            for vals,tag,diff_s,vid in rows:
                 ign_txt=vals[7]; gps_txt=vals[8]
                 if filtro=="Ign. ON" and "ON" not in ign_txt: continue
                 if filtro=="Ign. OFF" and "OFF" not in ign_txt: continue
                 if filtro=="GPS Falha" and "FALHA" not in gps_txt: continue
                 if filtro=="GPS OK" and "OK" not in gps_txt: continue
-                shown.append((vals,tag,diff_s))
+                shown.append((vid,vals,(tag,)))
                 if "ON" in ign_txt: on+=1
                 else: off+=1
                 if "FALHA" in gps_txt: no_gps+=1
                 maior_s=max(maior_s,diff_s)
 
-            for vals,tag,_ in shown:
-                t4.insert("","end",values=vals,tags=(tag,))
+            reconcile(t4,shown)
 
             r4_desatual.config(text=str(len(shown)))
             r4_ign_on.config(text=str(on))
@@ -1766,7 +1885,7 @@ class TabDiagnostico(tk.Frame):
                 now=datetime.now(TZ_BR).replace(tzinfo=None)
 
                 events=get_all_events()
-                r4_total.config(text=str(len(events)))
+                ui(r4_total).config(text=str(len(events)))
 
                 # Indexa rastreadores por veiculo_id e por aparelho
                 try:
@@ -1780,8 +1899,9 @@ class TabDiagnostico(tk.Frame):
 
                 rows=[]; ac=0
                 for ev in events:
+                    checkpoint()
                     d_gps=safe_str(ev.get("ras_eve_data_gps"))
-                    dt_gps=parse_dt(d_gps)
+                    dt_gps=ev.dt
                     if dt_gps is None: continue
                     diff_s=(now-dt_gps).total_seconds()
                     if diff_s<0: diff_s=0
@@ -1797,8 +1917,8 @@ class TabDiagnostico(tk.Frame):
                         atraso=f"{diff_s/3600:.1f} h" if diff_s<86400 else f"{diff_s/86400:.1f} dias"
                         tag="al_crit"
 
-                    ign=safe_int(ev.get("ras_eve_ignicao",0))
-                    gps=safe_int(ev.get("ras_eve_gps_status",0))
+                    ign=ev.ign
+                    gps=ev.gps
                     d_env=safe_str(ev.get("ras_eve_data_enviado"))
 
                     # Dados do rastreador
@@ -1820,21 +1940,21 @@ class TabDiagnostico(tk.Frame):
                          "🟢 ON" if ign else "⚫ OFF",
                          "✓ OK" if gps else "✗ FALHA",
                          chip, num_equip, modelo, linha, operadora),
-                        tag, diff_s
+                        tag, diff_s, ev.vid
                     ))
 
                 # Ordena por maior atraso primeiro
                 rows.sort(key=lambda x: x[2], reverse=True)
                 _d4_cache["rows"]=rows
-                _render4(rows)
-                lb4.config(text=f"Total: {len(events)}  |  ⏰ Desatualizados: {ac}  |  {now_str()}")
+                post(_render4,rows)
+                ui(lb4).config(text=f"Total: {len(events)}  |  ⏰ Desatualizados: {ac}  |  {now_str()}")
 
-            threading.Thread(target=task,daemon=True).start()
+            return run_bg(task,key="diagnostico/desatualizados")
 
         btn(c4,"🔍 VERIFICAR",desatualizados,C["purple"]).pack(side="left",padx=8)
         mk_export_btn(c4,t4).pack(side="left",padx=4)
-        auto_refresh_register("desatualizados",desatualizados)
-        self.after(600,desatualizados)
+        auto_refresh_register("desatualizados",desatualizados,f4)
+        on_first_show(f4,desatualizados)
 
 # ═══════════════════════════════════════════════════════════════════════════════
 #  JANELA PRINCIPAL
@@ -1844,15 +1964,42 @@ class TabDiagnostico(tk.Frame):
 #  SISTEMA DE FILTROS UNIVERSAIS PARA TREEVIEW
 # ═══════════════════════════════════════════════════════════════════════════════
 
+VIRTUAL_BUFFER = 2     # linhas extras renderizadas abaixo da área visível
+FILTER_DEBOUNCE_MS = 150   # espera após a última tecla antes de filtrar
+
+def _sort_key_of(val):
+    """Chave de ordenação tipada: números (sem unidades) antes de texto."""
+    s = str(val).replace("—","").replace("km/h","").replace("%","").replace("V","").strip()
+    try: return (0, float(s))
+    except ValueError: return (1, s.lower())
+
 class FilterableTree:
     """
     Wrapper que adiciona filtro de texto, ordenação por coluna (asc/desc),
     cópia Ctrl+C e menu de contexto a qualquer Treeview.
+
+    virtual=True: os dados ficam só em Python e o Treeview mantém apenas as
+    linhas visíveis (+ VIRTUAL_BUFFER), reaproveitando os mesmos itens ao
+    rolar — para resultados com dezenas de milhares de linhas.
     """
-    def __init__(self, parent, cols, ws, sname="B", hcol=None, h=12):
-        self._all_data = []          # lista de (values, tags) originais
+    def __init__(self, parent, cols, ws, sname="B", hcol=None, h=12, virtual=False):
+        self._all_data = []          # lista de (values, tags, chave) originais
+        self._keyed    = False       # True após sync(): linhas reconciliadas por chave
+        self._view     = []          # linhas após filtro/ordenação
         self._sort_col = None
         self._sort_asc = True
+        self.virtual   = virtual
+        self._top      = 0           # 1ª linha de _view exibida (modo virtual)
+        self._pool     = []          # itens reaproveitados do Treeview (modo virtual)
+        self._rows_vis = h
+        self._sel      = set()       # índices de _view selecionados (modo virtual)
+        self._syncing  = False
+        self._hay      = []          # haystack minúsculo ("Todas") por linha de _all_data
+        self._col_hay  = {}          # coluna → haystacks só daquela coluna
+        self._col_keys = {}          # coluna → chaves de ordenação tipadas
+        self._last_q   = None        # (consulta, coluna) do último filtro
+        self._match    = None        # índices de _all_data que passaram no último filtro
+        self._debounce = None
 
         # Container principal
         self.frame = tk.Frame(parent, bg=C["bg"])
@@ -1920,12 +2067,27 @@ class FilterableTree:
                               command=lambda _c=c: self._header_click(_c))
             self.tree.column(c, width=w, anchor="w", stretch=True)
 
-        vs = ttk.Scrollbar(inner, orient="vertical", command=self.tree.yview)
+        vs = ttk.Scrollbar(inner, orient="vertical",
+                           command=self._vscroll if virtual else self.tree.yview)
         hs = ttk.Scrollbar(inner, orient="horizontal", command=self.tree.xview)
-        self.tree.configure(yscrollcommand=vs.set, xscrollcommand=hs.set)
+        self.tree.configure(yscrollcommand="" if virtual else vs.set, xscrollcommand=hs.set)
         vs.pack(side="right", fill="y")
         hs.pack(side="bottom", fill="x")
         self.tree.pack(fill="both", expand=True)
+        self._vs = vs
+        if virtual:
+            self._rowh = int(ttk.Style().lookup(style, "rowheight") or 20)
+            self.tree.bind("<Configure>", self._on_resize)
+            self.tree.bind("<MouseWheel>", lambda e: self._scroll_rows(-3 if e.delta > 0 else 3))
+            self.tree.bind("<Button-4>", lambda e: self._scroll_rows(-3))
+            self.tree.bind("<Button-5>", lambda e: self._scroll_rows(3))
+            self.tree.bind("<Prior>", lambda e: self._scroll_rows(-self._rows_vis))
+            self.tree.bind("<Next>", lambda e: self._scroll_rows(self._rows_vis))
+            self.tree.bind("<Home>", lambda e: self._scroll_to(0))
+            self.tree.bind("<End>", lambda e: self._scroll_to(len(self._view)))
+            self.tree.bind("<Up>", lambda e: self._key_step(-1))
+            self.tree.bind("<Down>", lambda e: self._key_step(1))
+            self.tree.bind("<<TreeviewSelect>>", self._on_select, add="+")
 
         # Binds de cópia e menu
         self.tree.bind("<Control-c>", self._copy_selection)
@@ -1940,7 +2102,7 @@ class FilterableTree:
         self._menu.add_command(label="📋  Copiar célula", command=self._copy_cell_from_menu)
         self._menu.add_command(label="📋  Copiar tudo (CSV)", command=self._copy_all_csv)
         self._menu.add_separator()
-        self._menu.add_command(label="📥  Exportar CSV", command=lambda: export_tree(self.tree))
+        self._menu.add_command(label="📥  Exportar CSV", command=lambda: export_tree(self))
         self._menu.add_separator()
         self._menu.add_command(label="🔃  Limpar filtros", command=self._clear_filter)
 
@@ -1965,7 +2127,8 @@ class FilterableTree:
         self._apply_filter()
 
     def _on_filter_change(self, *_):
-        self._apply_filter()
+        if self._debounce: self.tree.after_cancel(self._debounce)
+        self._debounce = self.tree.after(FILTER_DEBOUNCE_MS, self._apply_filter)
 
     def _apply_sort(self):
         col = self._sort_var.get()
@@ -1984,58 +2147,210 @@ class FilterableTree:
         self._asc_btn.config(text="↑ ASC")
         self._apply_filter()
 
+    # ── Índice de busca ────────────────────────────────────────────────────
+    def _index(self):
+        """Recria o índice após load()/sync(). Haystacks por coluna e chaves de
+        ordenação são montados na primeira vez que a coluna é usada e valem
+        até o próximo load()."""
+        self._hay = [" ".join(str(v).lower() for v in row[0]) for row in self._all_data]
+        self._col_hay = {}; self._col_keys = {}
+        self._last_q = None; self._match = None
+
+    def _haystacks(self, ci):
+        if ci is None: return self._hay
+        hay = self._col_hay.get(ci)
+        if hay is None:
+            hay = self._col_hay[ci] = [str(r[0][ci]).lower() if ci < len(r[0]) else ""
+                                       for r in self._all_data]
+        return hay
+
+    def _sort_keys(self, ci):
+        keys = self._col_keys.get(ci)
+        if keys is None:
+            keys = self._col_keys[ci] = [_sort_key_of(r[0][ci] if ci < len(r[0]) else "")
+                                         for r in self._all_data]
+        return keys
+
     def _apply_filter(self):
+        if self._debounce:
+            self.tree.after_cancel(self._debounce); self._debounce = None
         q = self._filter_var.get().lower().strip()
         filter_col = self._col_var.get()
         cols = self._cols
+        ci = cols.index(filter_col) if filter_col in cols else None
 
-        # Filtra
+        # Filtra — se a consulta só estendeu a anterior, busca só no resultado anterior
         if not q:
-            filtered = list(self._all_data)
+            match = list(range(len(self._all_data)))
         else:
-            filtered = []
-            for (vals, tags) in self._all_data:
-                if filter_col == "Todas":
-                    haystack = " ".join(str(v).lower() for v in vals)
-                else:
-                    try:
-                        idx = list(cols).index(filter_col)
-                        haystack = str(vals[idx]).lower()
-                    except:
-                        haystack = " ".join(str(v).lower() for v in vals)
-                if q in haystack:
-                    filtered.append((vals, tags))
-
-        # Ordena
+            hay = self._haystacks(ci)
+            prev = self._last_q
+            base = self._match if (self._match is not None and prev and prev[1] == ci
+                                   and q.startswith(prev[0])) else range(len(hay))
+            match = [i for i in base if q in hay[i]]
+        self._last_q = (q, ci) if q else None
+        self._match  = match if q else None
+
+        # Ordena (estável: empates mantêm a ordem original)
         if self._sort_col and self._sort_col in cols:
-            idx = list(cols).index(self._sort_col)
-            def sort_key(x):
-                val = x[0][idx] if idx < len(x[0]) else ""
-                s = str(val).replace("—","").replace("km/h","").replace("%","").replace("V","").strip()
-                try: return (0, float(s))
-                except: return (1, s.lower())
-            filtered.sort(key=sort_key, reverse=not self._sort_asc)
-
-        # Renderiza
-        for r in self.tree.get_children():
-            self.tree.delete(r)
-        for (vals, tags) in filtered:
-            self.tree.insert("", "end", values=vals, tags=tags)
-
-        self._count_lbl.config(text=f"{len(filtered)}/{len(self._all_data)}")
+            keys = self._sort_keys(cols.index(self._sort_col))
+            match = sorted(match, key=keys.__getitem__, reverse=not self._sort_asc)
+
+        data = self._all_data
+        self._view = [data[i] for i in match]
+        self._render()
+
+    def _render(self):
+        if self.virtual:
+            self._sel.clear(); self._top = 0
+            self._sync_pool()
+        elif self._keyed:
+            reconcile(self.tree, [(key, vals, tags) for vals, tags, key in self._view])
+        else:
+            forget(self.tree)                   # iids automáticos: o estado por chave não vale mais
+            for r in self.tree.get_children():
+                self.tree.delete(r)
+            for (vals, tags, _) in self._view:
+                self.tree.insert("", "end", values=vals, tags=tags)
+        self._count_lbl.config(text=f"{len(self._view)}/{len(self._all_data)}")
+
+    # ── Modo virtual ───────────────────────────────────────────────────────
+    def _sync_pool(self):
+        """Copia _view[_top : _top+visíveis] para os itens reaproveitados."""
+        n = len(self._view)
+        want = self._rows_vis + VIRTUAL_BUFFER
+        self._pool = [i for i in self._pool if self.tree.exists(i)]
+        self._top = max(0, min(self._top, n - self._rows_vis)) if n > self._rows_vis else 0
+        while len(self._pool) < want:
+            self._pool.append(self.tree.insert("", "end", values=()))
+        self._syncing = True
+        try:
+            sel = []
+            for i, iid in enumerate(self._pool):
+                idx = self._top + i
+                if i < want and idx < n:
+                    vals, tags, _ = self._view[idx]
+                    self.tree.item(iid, values=vals, tags=tags)
+                    self.tree.move(iid, "", i)          # reanexa se estava oculto
+                    if idx in self._sel: sel.append(iid)
+                else:
+                    self.tree.detach(iid)
+            self.tree.selection_set(sel)
+            self.tree.yview_moveto(0)
+        finally:
+            self._syncing = False
+        if n:
+            self._vs.set(self._top / n, min(1.0, (self._top + self._rows_vis) / n))
+        else:
+            self._vs.set(0, 1)
+
+    def _scroll_to(self, top):
+        self._top = int(top); self._sync_pool(); return "break"
+
+    def _scroll_rows(self, delta):
+        return self._scroll_to(self._top + delta)
+
+    def _vscroll(self, *args):
+        n = len(self._view)
+        if args[0] == "moveto":
+            self._scroll_to(float(args[1]) * n)
+        elif args[0] == "scroll":
+            step = int(args[1]) * (self._rows_vis if args[2] == "pages" else 1)
+            self._scroll_rows(step)
+
+    def _on_resize(self, e):
+        rows = max(1, (e.height - self._rowh) // self._rowh)   # desconta o cabeçalho
+        if rows != self._rows_vis:
+            self._rows_vis = rows; self._sync_pool()
+
+    def _key_step(self, d):
+        """Setas: dentro da janela o Treeview cuida; na borda, rola uma linha."""
+        foc = self.tree.focus()
+        if foc not in self._pool: return None
+        pos = self._pool.index(foc)
+        if not ((d < 0 and pos == 0) or (d > 0 and pos >= self._rows_vis - 1)): return None
+        idx = max(0, min(len(self._view) - 1, self._top + pos + d))
+        self._sel = {idx}
+        self._scroll_to(self._top + d)
+        p = idx - self._top
+        if 0 <= p < len(self._pool):
+            self.tree.focus(self._pool[p]); self.tree.see(self._pool[p])
+        return "break"
+
+    def _on_select(self, _e=None):
+        if self._syncing: return
+        vis = range(self._top, self._top + len(self._pool))
+        self._sel.difference_update(vis)
+        for iid in self.tree.selection():
+            if iid in self._pool: self._sel.add(self._top + self._pool.index(iid))
+
+    def rows(self):
+        """Valores de todas as linhas filtradas/ordenadas (não só as visíveis)."""
+        return [row[0] for row in self._view]
+
+    # ── Fonte para exportação (modelo, não o Treeview) ─────────────────────
+    def columns(self): return list(self._cols)
+
+    def count(self, scope="view"):
+        return len(self._view if scope == "view" else self._all_data)
+
+    def iter_rows(self, scope="view"):
+        """Gera os valores das linhas: "view" = filtradas/ordenadas como na
+        tela, "all" = tudo o que foi carregado, na ordem de chegada."""
+        for row in list(self._view if scope == "view" else self._all_data):
+            yield row[0]
+
+    @staticmethod
+    def _norm_item(item):
+        if isinstance(item, tuple) and len(item) == 2 and isinstance(item[1], (tuple,list,str)):
+            vals, tags = item
+        else:
+            vals, tags = item, ()
+        if isinstance(tags, str): tags = (tags,)
+        return (vals, tuple(tags), None)
 
     def load(self, data_list):
         """data_list: list of (values_tuple, tags_tuple_or_str)"""
-        self._all_data = []
-        for item in data_list:
-            if isinstance(item, tuple) and len(item) == 2 and isinstance(item[1], (tuple,list,str)):
-                vals, tags = item
-            else:
-                vals, tags = item, ()
-            if isinstance(tags, str): tags = (tags,)
-            self._all_data.append((vals, tuple(tags)))
+        self._all_data = [self._norm_item(item) for item in data_list]
+        self._keyed = False
+        self._index()
         self._apply_filter()
 
+    def sync(self, keyed_rows):
+        """Como load(), mas com linhas (chave, values, tags): a tabela é
+        reconciliada por chave (ras_vei_id) — só muda o que mudou, e a
+        seleção/rolagem sobrevivem ao refresh."""
+        self._all_data = [(tuple(v), (t,) if isinstance(t, str) else tuple(t), k)
+                          for k, v, t in keyed_rows]
+        self._keyed = not self.virtual
+        self._index()
+        self._apply_filter()
+
+    def clear(self):
+        self.load([])
+
+    def append(self, data_list):
+        """Acrescenta linhas sem redesenhar a tabela (resultados em streaming).
+        Linhas que passam no filtro aplicado (_last_q — não o texto ainda em
+        debounce) vão para o fim; a ordenação é reaplicada no próximo
+        load()/_apply_filter()."""
+        q, idx = self._last_q or ("", None)
+        self._col_hay = {}; self._col_keys = {}
+        for item in data_list:
+            row = self._norm_item(item); vals, tags, _ = row
+            i = len(self._all_data)
+            self._all_data.append(row)
+            full = " ".join(str(v).lower() for v in vals)
+            self._hay.append(full)
+            if q:
+                hay = str(vals[idx]).lower() if idx is not None and idx < len(vals) else full
+                if q not in hay: continue
+                if self._match is not None: self._match.append(i)
+            self._view.append(row)
+            if not self.virtual: self.tree.insert("", "end", values=vals, tags=tags)
+        if self.virtual: self._sync_pool()
+        self._count_lbl.config(text=f"{len(self._view)}/{len(self._all_data)}")
+
     def tag_configure(self, tag, **kw):
         self.tree.tag_configure(tag, **kw)
 
@@ -2044,12 +2359,14 @@ class FilterableTree:
         self._copy_row()
 
     def _copy_row(self):
-        sel = self.tree.selection()
-        if not sel:
+        if self.virtual:
+            rows = [self._view[i][0] for i in sorted(self._sel) if i < len(self._view)]
+        else:
+            rows = [self.tree.item(item)["values"] for item in self.tree.selection()]
+        if not rows:
             return
         lines = []
-        for item in sel:
-            vals = self.tree.item(item)["values"]
+        for vals in rows:
             lines.append("\t".join(str(v) for v in vals))
         text = "\n".join(lines)
         self.tree.clipboard_clear()
@@ -2072,11 +2389,8 @@ class FilterableTree:
             self.tree.clipboard_append(str(vals[col_idx]))
 
     def _copy_all_csv(self):
-        cols = [self.tree.heading(c)["text"] for c in self.tree["columns"]]
-        rows = [self.tree.item(r)["values"] for r in self.tree.get_children()]
-        lines = [";".join(str(c) for c in cols)]
-        for row in rows:
-            lines.append(";".join(str(v) for v in row))
+        lines = [";".join(str(c) for c in self._cols)]
+        lines.extend(";".join(str(v) for v in row) for row in self.iter_rows())
         text = "\n".join(lines)
         self.tree.clipboard_clear()
         self.tree.clipboard_append(text)
@@ -2099,9 +2413,9 @@ class FilterableTree:
     def __getitem__(self, k): return self.tree[k]
 
 
-def mk_ftree(parent, cols, ws, sname="B", hcol=None, h=12):
+def mk_ftree(parent, cols, ws, sname="B", hcol=None, h=12, virtual=False):
     """Cria um FilterableTree e retorna o objeto (use .tree para o widget raw)."""
-    ft = FilterableTree(parent, cols, ws, sname, hcol, h)
+    ft = FilterableTree(parent, cols, ws, sname, hcol, h, virtual)
     return ft
 
 
@@ -2118,10 +2432,9 @@ def attach_copy(tree_widget):
         tree_widget.clipboard_clear(); tree_widget.clipboard_append("\n".join(lines))
 
     def copy_all():
-        cols = [tree_widget.heading(c)["text"] for c in tree_widget["columns"]]
-        rows = [tree_widget.item(r)["values"] for r in tree_widget.get_children()]
-        lines = [";".join(str(c) for c in cols)]
-        for row in rows: lines.append(";".join(str(v) for v in row))
+        src = export_source(tree_widget)
+        lines = [";".join(str(c) for c in src.cols)]
+        lines.extend(";".join(str(v) for v in row) for row in src)
         tree_widget.clipboard_clear(); tree_widget.clipboard_append("\n".join(lines))
 
     menu.add_command(label="📋  Copiar linha selecionada", command=copy_row)
@@ -2148,8 +2461,9 @@ class TabKPIs(tk.Frame):
     def __init__(self, master):
         super().__init__(master, bg=C["bg"])
         self._data = []
+        self._cards = {}
         self._build()
-        auto_refresh_register("kpis", self.refresh)
+        auto_refresh_register("kpis", self.refresh, self, hidden_s=0)
 
 
     def _build(self):
@@ -2178,47 +2492,38 @@ class TabKPIs(tk.Frame):
             lambda e: canvas.yview_scroll(int(-1*(e.delta/120)), "units"))
 
         self.sf = self._scroll_frame
-        self.after(400, self.refresh)
+        on_first_show(self, self.refresh)
 
-    def _card(self, parent, title, value, sub, col, w=200):
+    # ── Widgets persistentes: montados uma vez, atualizados a cada refresh ──
+    def _card(self, parent, key, title, col, w=200):
         f = tk.Frame(parent, bg=C["surface2"], width=w, height=110,
                      highlightthickness=1, highlightbackground=C["border"])
         f.pack_propagate(False); f.pack(side="left", padx=6, pady=6)
         tk.Label(f, text=title, bg=C["surface2"], fg=C["text_dim"],
                  font=("Helvetica Neue",7,"bold")).pack(pady=(10,0))
-        tk.Label(f, text=value, bg=C["surface2"], fg=col,
-                 font=("Helvetica Neue",20,"bold")).pack()
-        tk.Label(f, text=sub, bg=C["surface2"], fg=C["text_mid"],
-                 font=("Helvetica Neue",8), wraplength=180).pack()
+        val = tk.Label(f, text="—", bg=C["surface2"], fg=col,
+                       font=("Helvetica Neue",20,"bold")); val.pack()
+        sub = tk.Label(f, text="", bg=C["surface2"], fg=C["text_mid"],
+                       font=("Helvetica Neue",8), wraplength=180); sub.pack()
+        self._cards[key] = (val, sub, col)
         return f
 
-    def _bar_chart(self, parent, title, data_pairs, col, h=120, w_total=None):
-        """data_pairs: list of (label, value)"""
+    def _set_card(self, key, value, sub, col=None):
+        val, sb, base = self._cards[key]
+        col = col or base         # também restaura a cor após a troca de tema
+        if val.cget("text") != value: val.config(text=value)
+        if sb.cget("text") != sub:    sb.config(text=sub)
+        if val.cget("fg") != col:     val.config(fg=col)
+
+    def _bar_chart(self, parent, key, title, col, h=120):
         sec_f = tk.Frame(parent, bg=C["bg"]); sec_f.pack(fill="x", padx=10, pady=4)
         tk.Label(sec_f, text=title, bg=C["bg"], fg=C["accent"],
                  font=("Helvetica Neue",9,"bold")).pack(anchor="w")
-        if not data_pairs: return
-
-        cv_w = w_total or 900
-        cv = tk.Canvas(sec_f, bg=C["surface2"], height=h, highlightthickness=0, width=cv_w)
+        cv = tk.Canvas(sec_f, bg=C["surface2"], height=h, highlightthickness=0, width=900)
         cv.pack(fill="x", pady=2)
+        self._bars[key] = BarChart(cv, col)
 
-        max_v = max(v for _, v in data_pairs) or 1
-        bar_w = max(8, (cv_w - 40) // max(len(data_pairs),1))
-        for i, (lab, val) in enumerate(data_pairs):
-            x0 = 20 + i * bar_w
-            bar_h = int((val / max_v) * (h - 35))
-            y1 = h - 22
-            y0 = y1 - bar_h
-            cv.create_rectangle(x0+2, y0, x0+bar_w-4, y1, fill=col, outline="")
-            # label abreviado
-            short = lab[:6] if len(lab)>6 else lab
-            cv.create_text(x0 + bar_w//2, y1+2, text=short, fill=C["text_dim"],
-                           font=("Consolas",6), anchor="n")
-            cv.create_text(x0 + bar_w//2, y0-2, text=str(int(val)), fill=col,
-                           font=("Consolas",7), anchor="s")
-
-    def _pie_canvas(self, parent, title, data_pairs, colors):
+    def _pie_canvas(self, parent, key, title, labels, colors):
         """Mini gráfico de pizza em canvas."""
         sec_f = tk.Frame(parent, bg=C["surface2"], highlightthickness=1,
                          highlightbackground=C["border"])
@@ -2228,163 +2533,135 @@ class TabKPIs(tk.Frame):
 
         cv = tk.Canvas(sec_f, bg=C["surface2"], width=160, height=130, highlightthickness=0)
         cv.pack(padx=6, pady=4)
-
-        total = sum(v for _, v in data_pairs) or 1
-        start = 0
-        cx, cy, r = 65, 65, 55
-        for i, (lab, val) in enumerate(data_pairs):
-            extent = 360 * val / total
-            c_col = colors[i % len(colors)]
-            cv.create_arc(cx-r, cy-r, cx+r, cy+r, start=start, extent=extent,
-                          fill=c_col, outline=C["bg"])
-            # Legend
-            cv.create_rectangle(135, 10+i*18, 148, 22+i*18, fill=c_col, outline="")
-            pct = f"{100*val//total}%"
-            cv.create_text(150, 16+i*18, text=f"{pct}", fill=C["text_mid"],
-                           font=("Consolas",7), anchor="w")
-            cv.create_text(133, 16+i*18, text=f"{lab[:7]}", fill=C["text_dim"],
-                           font=("Consolas",6), anchor="e")
-            start += extent
+        self._pies[key] = PieChart(cv, labels, colors)
 
     def refresh(self):
         def task():
             d = get_all_events()
             self._data = d
-            self._render(d)
-            self._status.config(text=f"Atualizado: {now_str()}  |  {len(d)} veículos")
-        threading.Thread(target=task, daemon=True).start()
-
-    def _render(self, data):
-        for w in self.sf.winfo_children(): w.destroy()
-        if not data: return
+            post(self._render, d)
+            ui(self._status).config(text=f"Atualizado: {now_str()}  |  {len(d)} veículos")
+        return run_bg(task,key="kpis/refresh")
 
-        on = sum(1 for e in data if safe_int(e.get("ras_eve_ignicao")))
-        off = len(data) - on
-        no_gps = sum(1 for e in data if not safe_int(e.get("ras_eve_gps_status")))
-        vel_list = [abs(safe_int(e.get("ras_eve_velocidade",0))) for e in data]
-        speeding = sum(1 for v in vel_list if v > 80)
-        vmax = max(vel_list) if vel_list else 0
-        vmed = sum(vel_list)/len(vel_list) if vel_list else 0
-        bats = [safe_int(e.get("ras_eve_porc_bat_backup",100)) for e in data]
-        low_bat = sum(1 for b in bats if b < 30)
-        avg_bat = sum(bats)/len(bats) if bats else 0
-        volts = [safe_float(e.get("ras_eve_voltagem",0)) for e in data if safe_float(e.get("ras_eve_voltagem",0))>0]
-        avg_volt = sum(volts)/len(volts) if volts else 0
-        moving = sum(1 for e in data if safe_int(e.get("ras_eve_velocidade",0)) > 0)
+    def _build_view(self):
+        """Monta cards, gráficos e a tabela do Top 10 (uma vez só)."""
+        self._cards = {}; self._bars = {}; self._pies = {}
 
         # ─── Row 1: Cards principais ───────────────────────────────────────
         sec(self.sf, "📊  KPIs PRINCIPAIS")
         row1 = tk.Frame(self.sf, bg=C["bg"]); row1.pack(fill="x", padx=6)
-        self._card(row1,"FROTA TOTAL", str(len(data)), "veículos monitorados", C["blue"])
-        self._card(row1,"IGN. ON", str(on), f"{100*on//max(len(data),1)}% da frota", C["green"])
-        self._card(row1,"IGN. OFF", str(off), f"{100*off//max(len(data),1)}% da frota", C["text_mid"])
-        self._card(row1,"EM MOVIMENTO", str(moving), "com velocidade > 0", C["accent"])
-        self._card(row1,"SEM GPS", str(no_gps), "sinal perdido/falha", C["danger"])
-        self._card(row1,"EXCESSO VEL.", str(speeding), "acima de 80 km/h", C["warn"])
+        self._card(row1,"total","FROTA TOTAL", C["blue"])
+        self._card(row1,"on","IGN. ON", C["green"])
+        self._card(row1,"off","IGN. OFF", C["text_mid"])
+        self._card(row1,"moving","EM MOVIMENTO", C["accent"])
+        self._card(row1,"no_gps","SEM GPS", C["danger"])
+        self._card(row1,"speeding","EXCESSO VEL.", C["warn"])
 
         # ─── Row 2: Velocidade ─────────────────────────────────────────────
         sec(self.sf, "🚀  VELOCIDADE")
         row2 = tk.Frame(self.sf, bg=C["bg"]); row2.pack(fill="x", padx=6)
-        self._card(row2,"VEL. MÁXIMA", f"{vmax}", "km/h registrado agora", C["danger"])
-        self._card(row2,"VEL. MÉDIA", f"{vmed:.1f}", "km/h média da frota", C["warn"])
-        self._card(row2,"ACIMA 60", str(sum(1 for v in vel_list if v>60)), "veículos", C["orange"])
-        self._card(row2,"ACIMA 80", str(speeding), "veículos em excesso", C["danger"])
-        self._card(row2,"ACIMA 100", str(sum(1 for v in vel_list if v>100)), "crítico", "#FF0000")
+        self._card(row2,"vmax","VEL. MÁXIMA", C["danger"])
+        self._card(row2,"vmed","VEL. MÉDIA", C["warn"])
+        self._card(row2,"above_60","ACIMA 60", C["orange"])
+        self._card(row2,"above_80","ACIMA 80", C["danger"])
+        self._card(row2,"above_100","ACIMA 100", "#FF0000")
 
         # ─── Bar chart: vel por faixa ─────────────────────────────────────
-        faixas = [("0","0"),("1-30","1-30"),("31-60","31-60"),("61-80","61-80"),("81-100","81-100"),(">100",">100")]
-        counts_f = [
-            sum(1 for v in vel_list if v==0),
-            sum(1 for v in vel_list if 1<=v<=30),
-            sum(1 for v in vel_list if 31<=v<=60),
-            sum(1 for v in vel_list if 61<=v<=80),
-            sum(1 for v in vel_list if 81<=v<=100),
-            sum(1 for v in vel_list if v>100),
-        ]
-        self._bar_chart(self.sf, "📊 Distribuição de Velocidade (km/h)",
-                        list(zip(["0","1-30","31-60","61-80","81-100",">100"], counts_f)), C["accent"])
+        self._bar_chart(self.sf, "speed", "📊 Distribuição de Velocidade (km/h)", "accent")
 
         # ─── Row 3: Saúde ─────────────────────────────────────────────────
         sec(self.sf, "🔋  SAÚDE DA FROTA")
         row3 = tk.Frame(self.sf, bg=C["bg"]); row3.pack(fill="x", padx=6)
-        self._card(row3,"BAT. MÉDIA", f"{avg_bat:.0f}%", "bateria backup", C["green"] if avg_bat>50 else C["warn"])
-        self._card(row3,"BAT. BAIXA (<30%)", str(low_bat), "veículos críticos", C["danger"])
-        self._card(row3,"VOLT. MÉDIA", f"{avg_volt:.1f}V", "tensão elétrica", C["blue"])
-        sat_vals = [safe_int(e.get("ras_eve_satelites",0)) for e in data]
-        avg_sat = sum(sat_vals)/len(sat_vals) if sat_vals else 0
-        self._card(row3,"SATÉLITES MÉD.", f"{avg_sat:.1f}", "satélites por veículo", C["accent"])
-        gps_ok = len(data) - no_gps
-        self._card(row3,"GPS OK", str(gps_ok), f"{100*gps_ok//max(len(data),1)}% da frota", C["green"])
+        self._card(row3,"avg_bat","BAT. MÉDIA", C["green"])
+        self._card(row3,"low_bat","BAT. BAIXA (<30%)", C["danger"])
+        self._card(row3,"avg_volt","VOLT. MÉDIA", C["blue"])
+        self._card(row3,"avg_sat","SATÉLITES MÉD.", C["accent"])
+        self._card(row3,"gps_ok","GPS OK", C["green"])
 
         # ─── Gráfico pizza: Ignição ────────────────────────────────────────
         row4 = tk.Frame(self.sf, bg=C["bg"]); row4.pack(fill="x", padx=10, pady=4)
         sec(self.sf, "🥧  Distribuição Visual")
         row_pie = tk.Frame(self.sf, bg=C["bg"]); row_pie.pack(fill="x", padx=10, pady=4)
-        if len(data) > 0:
-            self._pie_canvas(row_pie, "Ignição",
-                             [("ON", on),("OFF", off)],
-                             [C["green"], C["surface3"]])
-            self._pie_canvas(row_pie, "GPS Status",
-                             [("OK", gps_ok),("Falha", no_gps)],
-                             [C["accent"], C["danger"]])
-            self._pie_canvas(row_pie, "Velocidade",
-                             [("Parado",counts_f[0]),("Normal",counts_f[1]+counts_f[2]),
-                              ("Atento",counts_f[3]),("Excesso",counts_f[4]+counts_f[5])],
-                             [C["text_mid"],C["green"],C["warn"],C["danger"]])
+        self._pie_canvas(row_pie, "ign", "Ignição", ("ON","OFF"), ["green", "surface3"])
+        self._pie_canvas(row_pie, "gps", "GPS Status", ("OK","Falha"), ["accent", "danger"])
+        self._pie_canvas(row_pie, "vel", "Velocidade", ("Parado","Normal","Atento","Excesso"),
+                         ["text_mid","green","warn","danger"])
 
         # ─── Top 10 mais rápidos ───────────────────────────────────────────
         sec(self.sf, "🏎  TOP 10 MAIS RÁPIDOS AGORA")
-        top10 = sorted(data, key=lambda e: abs(safe_int(e.get("ras_eve_velocidade",0))), reverse=True)[:10]
-        ft_top = FilterableTree(self.sf,
+        self._top = FilterableTree(self.sf,
             ("Pos.","Placa","Veículo","Motorista","Velocidade","Ignição","GPS","Data"),
             (40,90,130,130,100,80,60,150), "Top10", C["warn"], 10)
-        for i,e in enumerate(top10,1):
-            v = abs(safe_int(e.get("ras_eve_velocidade",0)))
-            medals = ["🥇","🥈","🥉"]
-            pos = medals[i-1] if i<=3 else f"#{i}"
-            ft_top.tree.insert("","end", values=(pos,
-                safe_str(e.get("ras_vei_placa")),safe_str(e.get("ras_vei_veiculo")),
-                safe_str(e.get("ras_mot_nome")),f"{v} km/h",
-                "🟢 ON" if safe_int(e.get("ras_eve_ignicao")) else "⚫ OFF",
-                "✓" if safe_int(e.get("ras_eve_gps_status")) else "✗",
-                safe_str(e.get("ras_eve_data_gps"))),
-                tags=("al" if v>80 else "ok",))
-        ft_top.tag_configure("al", background="#1a0808")
-        ft_top.tag_configure("ok", background=C["surface2"])
+        self._top.tag_configure("al", background="#1a0808")
+        self._top.tag_configure("ok", background=C["surface2"])
 
         # ─── Clientes com mais veículos ────────────────────────────────────
         sec(self.sf, "👥  FROTA POR CLIENTE")
-        from collections import Counter
-        cli_count = Counter(safe_str(e.get("ras_cli_desc","Desconhecido")) for e in data)
-        top_cli = cli_count.most_common(15)
-        self._bar_chart(self.sf, "Veículos por Cliente (Top 15)",
-                        top_cli, C["purple"])
+        self._bar_chart(self.sf, "clients", "Veículos por Cliente (Top 15)", "purple")
 
         # ─── Alerta de qualidade GPS ───────────────────────────────────────
         sec(self.sf, "📡  QUALIDADE DE SINAL GPS")
-        sat_ranges = [
-            ("0 sat",  sum(1 for e in data if safe_int(e.get("ras_eve_satelites",0)) == 0)),
-            ("1-3",    sum(1 for e in data if 1 <= safe_int(e.get("ras_eve_satelites",0)) <= 3)),
-            ("4-6",    sum(1 for e in data if 4 <= safe_int(e.get("ras_eve_satelites",0)) <= 6)),
-            ("7-9",    sum(1 for e in data if 7 <= safe_int(e.get("ras_eve_satelites",0)) <= 9)),
-            ("10+",    sum(1 for e in data if safe_int(e.get("ras_eve_satelites",0)) >= 10)),
-        ]
-        self._bar_chart(self.sf, "Distribuição de Satélites",
-                        sat_ranges, C["accent"])
+        self._bar_chart(self.sf, "sats", "Distribuição de Satélites", "accent")
+
+    def _render(self, data):
+        if not data: return
+        if not self._cards: self._build_view()
+
+        k = fleet_kpis(data)
+        on, off, no_gps, gps_ok = k["on"], k["off"], k["no_gps"], k["gps_ok"]
+        speeding, vmax, vmed = k["speeding"], k["vmax"], k["vmed"]
+        low_bat, avg_bat, avg_volt, moving = k["low_bat"], k["avg_bat"], k["avg_volt"], k["moving"]
+        n = max(len(data),1)
+
+        self._set_card("total", str(len(data)), "veículos monitorados")
+        self._set_card("on", str(on), f"{100*on//n}% da frota")
+        self._set_card("off", str(off), f"{100*off//n}% da frota")
+        self._set_card("moving", str(moving), "com velocidade > 0")
+        self._set_card("no_gps", str(no_gps), "sinal perdido/falha")
+        self._set_card("speeding", str(speeding), "acima de 80 km/h")
+
+        self._set_card("vmax", f"{vmax}", "km/h registrado agora")
+        self._set_card("vmed", f"{vmed:.1f}", "km/h média da frota")
+        self._set_card("above_60", str(k["above_60"]), "veículos")
+        self._set_card("above_80", str(speeding), "veículos em excesso")
+        self._set_card("above_100", str(k["above_100"]), "crítico")
+
+        self._bars["speed"].set(k["speed_bands"])
+
+        self._set_card("avg_bat", f"{avg_bat:.0f}%", "bateria backup", C["green"] if avg_bat>50 else C["warn"])
+        self._set_card("low_bat", str(low_bat), "veículos críticos")
+        self._set_card("avg_volt", f"{avg_volt:.1f}V", "tensão elétrica")
+        self._set_card("avg_sat", f"{k['avg_sat']:.1f}", "satélites por veículo")
+        self._set_card("gps_ok", str(gps_ok), f"{100*gps_ok//n}% da frota")
+
+        counts_f = [c for _, c in k["speed_bands"]]
+        self._pies["ign"].set((on, off))
+        self._pies["gps"].set((gps_ok, no_gps))
+        self._pies["vel"].set((counts_f[0], counts_f[1]+counts_f[2], counts_f[3], counts_f[4]+counts_f[5]))
+
+        medals = ["🥇","🥈","🥉"]
+        rows = KeyedRows()
+        for i,e in enumerate(k["top"],1):
+            v = abs(e.vel)
+            rows.add(e.vid, (medals[i-1] if i<=3 else f"#{i}",
+                safe_str(e.get("ras_vei_placa")),safe_str(e.get("ras_vei_veiculo")),
+                safe_str(e.get("ras_mot_nome")),f"{v} km/h",
+                "🟢 ON" if e.ign else "⚫ OFF",
+                "✓" if e.gps else "✗",
+                safe_str(e.get("ras_eve_data_gps"))),
+                ("al" if v>80 else "ok",))
+        self._top.sync(rows)
+
+        self._bars["clients"].set(k["clients"])
+        self._bars["sats"].set(k["sat_bands"])
 
     def _export_report(self):
         if not self._data:
             messagebox.showinfo("KPIs","Carregue os dados primeiro."); return
         data = self._data
-        on = sum(1 for e in data if safe_int(e.get("ras_eve_ignicao")))
-        off = len(data) - on
-        no_gps = sum(1 for e in data if not safe_int(e.get("ras_eve_gps_status")))
-        vel_list = [abs(safe_int(e.get("ras_eve_velocidade",0))) for e in data]
-        speeding = sum(1 for v in vel_list if v > 80)
-        vmax = max(vel_list) if vel_list else 0
-        vmed = sum(vel_list)/len(vel_list) if vel_list else 0
-        bats = [safe_int(e.get("ras_eve_porc_bat_backup",100)) for e in data]
-        avg_bat = sum(bats)/len(bats) if bats else 0
+        k = fleet_kpis(data)
+        on, off, no_gps = k["on"], k["off"], k["no_gps"]
+        speeding, vmax, vmed, avg_bat = k["speeding"], k["vmax"], k["vmed"], k["avg_bat"]
 
         lines = [
             "="*60,
@@ -2404,13 +2681,12 @@ class TabKPIs(tk.Frame):
             "",
             "  ─── SAÚDE DA FROTA ──────────────────────────────────",
             f"    Bateria média backup  : {avg_bat:.0f}%",
-            f"    Veículos bat < 30%    : {sum(1 for b in bats if b<30)}",
+            f"    Veículos bat < 30%    : {k['low_bat']}",
             "",
             "  ─── TOP 10 MAIS RÁPIDOS ─────────────────────────────",
         ]
-        top10 = sorted(data, key=lambda e: abs(safe_int(e.get("ras_eve_velocidade",0))), reverse=True)[:10]
-        for i, e in enumerate(top10,1):
-            lines.append(f"    {i:>2}. {safe_str(e.get('ras_vei_placa')):<10} {abs(safe_int(e.get('ras_eve_velocidade',0))):>4} km/h  {safe_str(e.get('ras_mot_nome'))}")
+        for i, e in enumerate(k["top"],1):
+            lines.append(f"    {i:>2}. {safe_str(e.get('ras_vei_placa')):<10} {abs(e.vel):>4} km/h  {safe_str(e.get('ras_mot_nome'))}")
         lines += ["","="*60]
 
         path = filedialog.asksaveasfilename(defaultextension=".txt",
@@ -2461,10 +2737,11 @@ class TabComportamento(tk.Frame):
             def task():
                 data=get_all_events(); mots={}
                 for ev in data:
+                    checkpoint()
                     nm=safe_str(ev.get("ras_mot_nome"),"Desconhecido")
-                    vel=abs(safe_int(ev.get("ras_eve_velocidade",0)))
-                    gps=safe_int(ev.get("ras_eve_gps_status",0))
-                    bat=safe_int(ev.get("ras_eve_porc_bat_backup",100))
+                    vel=abs(ev.vel)
+                    gps=ev.gps
+                    bat=ev.bat
                     pl=safe_str(ev.get("ras_vei_placa"))
                     if nm not in mots: mots[nm]={"veics":set(),"vels":[],"no_gps":0,"low_bat":0}
                     mots[nm]["veics"].add(pl)
@@ -2485,13 +2762,13 @@ class TabComportamento(tk.Frame):
                     rows.append(((f"{sc}",nm,len(d["veics"]),f"{vmx} km/h",f"{vmd:.1f} km/h",
                                   excesso,d["no_gps"],d["low_bat"],cls_),tag))
                 rows.sort(key=lambda x:int(x[0][0]))
-                ft1.load(rows)
-                lb1.config(text=f"{len(mots)} motoristas | {now_str()}")
-            threading.Thread(target=task,daemon=True).start()
+                ui(ft1).load(rows)
+                ui(lb1).config(text=f"{len(mots)} motoristas | {now_str()}")
+            run_bg(task,key="comportamento/calc_score")
 
         btn(c1,"🎯 CALCULAR",calc_score,C["danger"]).pack(side="left",padx=8)
-        mk_export_btn(c1,ft1.tree).pack(side="left",padx=4)
-        self.after(400,calc_score)
+        mk_export_btn(c1,ft1).pack(side="left",padx=4)
+        on_first_show(f1,calc_score)
 
         # ── Motor Ocioso ──────────────────────────────────────────────────
         f2=tk.Frame(nb,bg=C["bg"]); nb.add(f2,text="  ⏱ Motor Ocioso  ")
@@ -2509,33 +2786,19 @@ class TabComportamento(tk.Frame):
             q=e2v.get().strip()
             if not q: return
             loading(res2)
+            try:
+                ini=datetime.strptime(ei2.get().strip(),"%d/%m/%Y %H:%M")
+                fim=datetime.strptime(ef2.get().strip(),"%d/%m/%Y %H:%M")
+                mn=int(e2_mn.get() or 5)
+            except: write(res2,"⚠ Inválido.",C["warn"]); return
             def task():
                 entry=find_vehicle(q)
                 if not entry: err(res2,"Não encontrado."); return
-                vid=safe_int(entry.get("ras_vei_id",0))
-                try:
-                    ini=datetime.strptime(ei2.get().strip(),"%d/%m/%Y %H:%M")
-                    fim=datetime.strptime(ef2.get().strip(),"%d/%m/%Y %H:%M")
-                    mn=int(e2_mn.get() or 5)
-                except: write(res2,"⚠ Inválido.",C["warn"]); return
-                evs=extract_list(api_get(f"/events/interval/id/{vid}/begin/{ts(ini)}/end/{ts(fim)}").get("data",[]))
+                vid=entry.vid
+                sg=get_segments(vid,ini,fim); evs=sg.events
                 if not evs: write(res2,"ℹ Nenhum evento.",C["text_mid"]); return
 
-                ociosos=[]; inicio_ocio=None; tot_ocio=0.0
-                for ev in evs:
-                    ign=safe_int(ev.get("ras_eve_ignicao",0))
-                    vel=safe_int(ev.get("ras_eve_velocidade",0))
-                    try: dt=datetime.strptime(ev.get("ras_eve_data_gps",""),"%d/%m/%Y %H:%M:%S")
-                    except: dt=None
-                    if dt and ign==1 and vel==0:
-                        if inicio_ocio is None: inicio_ocio=dt
-                    else:
-                        if inicio_ocio and dt:
-                            dur=(dt-inicio_ocio).total_seconds()/60
-                            if dur>=mn:
-                                ociosos.append((inicio_ocio,dt,dur))
-                                tot_ocio+=dur
-                        inicio_ocio=None
+                ociosos=sg.idles_over(mn); tot_ocio=sum(d for _,_,d in ociosos)
 
                 consumo_est=tot_ocio*0.5  # estimativa: ~0.5L/h ocioso
                 lines=[f"  {entry.get('ras_vei_placa','—')}  |  Período: {ini.strftime('%d/%m %H:%M')} → {fim.strftime('%d/%m %H:%M')}",
@@ -2548,7 +2811,7 @@ class TabComportamento(tk.Frame):
                 for i,(a,b,d) in enumerate(ociosos,1):
                     lines.append(f"  {i:>3}  {a.strftime('%d/%m %H:%M:%S'):<20}  {b.strftime('%d/%m %H:%M:%S'):<20}  {d:>5.1f} min")
                 write(res2,"\n".join(lines))
-            threading.Thread(target=task,daemon=True).start()
+            run_bg(task,key="comportamento/motor_ocioso")
 
         btn(c2,"⏱ ANALISAR",motor_ocioso,C["accent"]).pack(side="left",padx=8)
         mk_export_btn(c2,res2,is_text=True).pack(side="left",padx=4)
@@ -2563,6 +2826,7 @@ class TabComportamento(tk.Frame):
         ei3.master.pack(fill="x",padx=8)
 
         cv3=tk.Canvas(f3,bg=C["surface2"],height=220,highlightthickness=0)
+        ch3=HourBars(cv3,height=220)
         cv3.pack(fill="x",padx=8,pady=4)
         _,res3=txtbox(f3,5); _.pack(fill="x",padx=8,pady=2)
 
@@ -2570,52 +2834,30 @@ class TabComportamento(tk.Frame):
             q=e3v.get().strip()
             if not q: return
             lb3.config(text="⏳...")
+            try:
+                ini=datetime.strptime(ei3.get().strip(),"%d/%m/%Y %H:%M")
+                fim=datetime.strptime(ef3.get().strip(),"%d/%m/%Y %H:%M")
+            except: lb3.config(text="⚠ Datas"); return
             def task():
                 entry=find_vehicle(q)
-                if not entry: lb3.config(text="✖"); return
-                vid=safe_int(entry.get("ras_vei_id",0))
-                try:
-                    ini=datetime.strptime(ei3.get().strip(),"%d/%m/%Y %H:%M")
-                    fim=datetime.strptime(ef3.get().strip(),"%d/%m/%Y %H:%M")
-                except: lb3.config(text="⚠ Datas"); return
-                evs=extract_list(api_get(f"/events/interval/id/{vid}/begin/{ts(ini)}/end/{ts(fim)}").get("data",[]))
-                if not evs: lb3.config(text="Sem eventos"); return
+                if not entry: ui(lb3).config(text="✖"); return
+                vid=entry.vid
+                evs=get_interval_events(vid,ini,fim)
+                if not evs: ui(lb3).config(text="Sem eventos"); return
 
                 hora_vel=[[] for _ in range(24)]
                 for ev in evs:
-                    try: h=datetime.strptime(ev.get("ras_eve_data_gps",""),"%d/%m/%Y %H:%M:%S").hour
-                    except: continue
-                    v=abs(safe_int(ev.get("ras_eve_velocidade",0)))
+                    checkpoint()
+                    if ev.dt is None: continue
+                    h=ev.dt.hour
+                    v=abs(ev.vel)
                     hora_vel[h].append(v)
 
                 avg_h=[sum(vs)/len(vs) if vs else 0 for vs in hora_vel]
                 max_h=[max(vs) if vs else 0 for vs in hora_vel]
 
-                # Desenha gráfico
-                cv3.delete("all")
-                W=cv3.winfo_width() or 900; H=220
-                pad=40; bar_w=max(4,(W-pad*2)//24)
-                max_v=max(max_h) or 1
-                for h in range(24):
-                    x=pad+h*bar_w
-                    # Barra max (fundo)
-                    bh=int(max_h[h]/max_v*(H-pad-20))
-                    cv3.create_rectangle(x+1,H-pad-bh,x+bar_w-2,H-pad,
-                                         fill=C["surface3"],outline="")
-                    # Barra média
-                    bh2=int(avg_h[h]/max_v*(H-pad-20))
-                    cv3.create_rectangle(x+3,H-pad-bh2,x+bar_w-4,H-pad,
-                                         fill=C["accent"],outline="")
-                    # Hora label
-                    cv3.create_text(x+bar_w//2,H-pad+12,text=str(h),
-                                    fill=C["text_dim"],font=("Consolas",6),anchor="n")
-                # Legenda
-                cv3.create_rectangle(W-180,8,W-170,18,fill=C["surface3"],outline="")
-                cv3.create_text(W-168,13,text="Vel.Máx",fill=C["text_dim"],font=("Consolas",8),anchor="w")
-                cv3.create_rectangle(W-180,22,W-170,32,fill=C["accent"],outline="")
-                cv3.create_text(W-168,27,text="Vel.Média",fill=C["text_dim"],font=("Consolas",8),anchor="w")
-                cv3.create_text(pad//2,H//2,text="km/h",fill=C["text_dim"],
-                                font=("Consolas",7),angle=90)
+                # Desenha gráfico (itens reaproveitados)
+                post(ch3.set,avg_h,max_h)
 
                 # Resumo texto
                 hora_pico=avg_h.index(max(avg_h))
@@ -2623,8 +2865,8 @@ class TabComportamento(tk.Frame):
                     f"  Velocidade máxima registrada: {max(max_h):.0f} km/h",
                     f"  Eventos analisados: {len(evs)}"]
                 write(res3,"\n".join(lines))
-                lb3.config(text=f"{entry.get('ras_vei_placa','—')} | {len(evs)} pts | {now_str()}")
-            threading.Thread(target=task,daemon=True).start()
+                ui(lb3).config(text=f"{entry.get('ras_vei_placa','—')} | {len(evs)} pts | {now_str()}")
+            run_bg(task,key="comportamento/vel_horario")
 
         btn(c3,"📈 GERAR",vel_horario,C["accent2"]).pack(side="left",padx=8)
 
@@ -2644,38 +2886,22 @@ class TabComportamento(tk.Frame):
             qa=e4a.get().strip(); qb=e4b.get().strip()
             if not qa or not qb: return
             loading(res4)
+            try:
+                ini=datetime.strptime(ei4.get().strip(),"%d/%m/%Y %H:%M")
+                fim=datetime.strptime(ef4.get().strip(),"%d/%m/%Y %H:%M")
+            except: write(res4,"⚠ Datas.",C["warn"]); return
             def task():
                 ea=find_vehicle(qa); eb=find_vehicle(qb)
                 if not ea or not eb: err(res4,"Um ou ambos não encontrados."); return
-                try:
-                    ini=datetime.strptime(ei4.get().strip(),"%d/%m/%Y %H:%M")
-                    fim=datetime.strptime(ef4.get().strip(),"%d/%m/%Y %H:%M")
-                except: write(res4,"⚠ Datas.",C["warn"]); return
 
                 def stats(entry):
-                    vid=safe_int(entry.get("ras_vei_id",0))
-                    evs=extract_list(api_get(f"/events/interval/id/{vid}/begin/{ts(ini)}/end/{ts(fim)}").get("data",[]))
-                    vel_l=[abs(safe_int(e.get("ras_eve_velocidade",0))) for e in evs]
-                    t_on=t_off=km=0.0; prev=None
-                    for ev in evs:
-                        vel=safe_int(ev.get("ras_eve_velocidade",0))
-                        ign=safe_int(ev.get("ras_eve_ignicao",0))
-                        lat=ev.get("ras_eve_latitude"); lon=ev.get("ras_eve_longitude")
-                        try: dt=datetime.strptime(ev.get("ras_eve_data_gps",""),"%d/%m/%Y %H:%M:%S")
-                        except: dt=None
-                        if prev and dt and prev[0]:
-                            s=max(0,(dt-prev[0]).total_seconds())
-                            if prev[1]: t_on+=s
-                            else: t_off+=s
-                        if prev and prev[2] and lat: km+=haversine(prev[2],prev[3],lat,lon)
-                        prev=(dt,ign,lat,lon)
+                    sg=get_segments(entry.vid,ini,fim)
                     return {"placa":safe_str(entry.get("ras_vei_placa")),
                             "veiculo":safe_str(entry.get("ras_vei_veiculo")),
-                            "eventos":len(evs),"km":km,
-                            "vmax":max(vel_l) if vel_l else 0,
-                            "vmed":sum(vel_l)/len(vel_l) if vel_l else 0,
-                            "t_on":t_on,"t_off":t_off,
-                            "excesso":sum(1 for v in vel_l if v>80)}
+                            "eventos":sg.count,"km":sg.km,
+                            "vmax":sg.vmax,"vmed":sg.vmed_all,
+                            "t_on":sg.t_on,"t_off":sg.t_off,
+                            "excesso":sg.excessos}
 
                 sa=stats(ea); sb=stats(eb)
 
@@ -2698,8 +2924,8 @@ class TabComportamento(tk.Frame):
                     f"  {'Excessos >80km/h':<22}  {sa['excesso']:<{w}}  {sb['excesso']:<{w}}",
                     "="*70]
                 write(res4,"\n".join(lines))
-                lb4.config(text=f"Comparativo gerado | {now_str()}")
-            threading.Thread(target=task,daemon=True).start()
+                ui(lb4).config(text=f"Comparativo gerado | {now_str()}")
+            run_bg(task,key="comportamento/comparar")
 
         btn(c4,"⚖ COMPARAR",comparar,C["accent2"]).pack(side="left",padx=8)
         mk_export_btn(c4,res4,is_text=True).pack(side="left",padx=4)
@@ -2716,6 +2942,7 @@ class TabComportamento(tk.Frame):
         lb5=lbl(c5,"",col=C["text_dim"]); lb5.pack(side="right")
 
         cv5=tk.Canvas(f5,bg=C["surface2"],height=200,highlightthickness=0)
+        ch5=HeatMap(cv5,["Seg","Ter","Qua","Qui","Sex","Sáb","Dom"],range(24),height=200)
         cv5.pack(fill="x",padx=8,pady=4)
         info5=lbl(f5,"",8,col=C["text_mid"]); info5.pack(padx=8,anchor="w")
 
@@ -2729,40 +2956,20 @@ class TabComportamento(tk.Frame):
                 d=extract_list(api_get(f"/alerts/period/initial/{ts(ini)}/final/{ts(fim)}").get("data",[]))
                 # matriz 7 dias × 24 horas
                 mat=[[0]*24 for _ in range(7)]
-                dias=["Seg","Ter","Qua","Qui","Sex","Sáb","Dom"]
+                dias=ch5.rows
                 for a in d:
+                    checkpoint()
                     dt=parse_dt(safe_str(a.get("ras_eal_data_alerta")))
                     if dt: mat[dt.weekday()][dt.hour]+=1
 
-                mx=max(max(row) for row in mat) or 1
-                cv5.delete("all")
-                W=cv5.winfo_width() or 900; H=200
-                cell_w=(W-50)//24; cell_h=(H-20)//7
-                # Cabeçalhos horas
-                for h in range(24):
-                    cv5.create_text(50+h*cell_w+cell_w//2,8,text=str(h),
-                                    fill=C["text_dim"],font=("Consolas",6))
-                for d_idx,dia in enumerate(dias):
-                    cv5.create_text(24,22+d_idx*cell_h+cell_h//2,text=dia,
-                                    fill=C["text_dim"],font=("Consolas",7))
-                    for h in range(24):
-                        v=mat[d_idx][h]
-                        intensity=int(255*v/mx) if mx>0 else 0
-                        r2=min(255,intensity+50); g2=max(0,50-intensity//3); b2=10
-                        col_hex=f"#{r2:02x}{g2:02x}{b2:02x}"
-                        x=50+h*cell_w; y=16+d_idx*cell_h
-                        cv5.create_rectangle(x+1,y+1,x+cell_w-1,y+cell_h-1,
-                                             fill=col_hex,outline=C["bg"])
-                        if v>0 and cell_w>16:
-                            cv5.create_text(x+cell_w//2,y+cell_h//2,text=str(v),
-                                            fill="white",font=("Consolas",6))
+                post(ch5.set,mat)
 
                 total=sum(mat[d_idx][h] for d_idx in range(7) for h in range(24))
                 pico_d=max(range(7),key=lambda d_idx:sum(mat[d_idx]))
                 pico_h=max(range(24),key=lambda h:sum(mat[d_idx][h] for d_idx in range(7)))
-                info5.config(text=f"Total: {total} alertas  |  Dia pico: {dias[pico_d]}  |  Hora pico: {pico_h:02d}h")
-                lb5.config(text=f"{len(d)} alertas carregados | {now_str()}")
-            threading.Thread(target=task,daemon=True).start()
+                ui(info5).config(text=f"Total: {total} alertas  |  Dia pico: {dias[pico_d]}  |  Hora pico: {pico_h:02d}h")
+                ui(lb5).config(text=f"{len(d)} alertas carregados | {now_str()}")
+            run_bg(task,key="comportamento/heat_map")
 
         btn(c5,"🔥 GERAR MAPA",heat_map,C["danger"]).pack(side="left",padx=8)
 
@@ -2797,33 +3004,19 @@ class TabCustos(tk.Frame):
             q=e1v.get().strip()
             if not q: return
             loading(res1)
+            try:
+                ini=datetime.strptime(ei1.get().strip(),"%d/%m/%Y %H:%M")
+                fim=datetime.strptime(ef1.get().strip(),"%d/%m/%Y %H:%M")
+                preco=float(e1_preco.get()); cons=float(e1_cons.get()); custo_h=float(e1_mot.get())
+            except: write(res1,"⚠ Parâmetros inválidos.",C["warn"]); return
             def task():
                 entry=find_vehicle(q)
                 if not entry: err(res1,"Não encontrado."); return
-                vid=safe_int(entry.get("ras_vei_id",0))
-                try:
-                    ini=datetime.strptime(ei1.get().strip(),"%d/%m/%Y %H:%M")
-                    fim=datetime.strptime(ef1.get().strip(),"%d/%m/%Y %H:%M")
-                    preco=float(e1_preco.get()); cons=float(e1_cons.get()); custo_h=float(e1_mot.get())
-                except: write(res1,"⚠ Parâmetros inválidos.",C["warn"]); return
-                evs=extract_list(api_get(f"/events/interval/id/{vid}/begin/{ts(ini)}/end/{ts(fim)}").get("data",[]))
-                if not evs: write(res1,"ℹ Nenhum evento.",C["text_mid"]); return
-
-                km=0.0; t_on=t_off=t_ocio=0.0; vmax=0; prev=None
-                for ev in evs:
-                    vel=safe_int(ev.get("ras_eve_velocidade",0))
-                    ign=safe_int(ev.get("ras_eve_ignicao",0))
-                    lat=ev.get("ras_eve_latitude"); lon=ev.get("ras_eve_longitude")
-                    try: dt=datetime.strptime(ev.get("ras_eve_data_gps",""),"%d/%m/%Y %H:%M:%S")
-                    except: dt=None
-                    if prev and dt and prev[0]:
-                        s=max(0,(dt-prev[0]).total_seconds())
-                        if prev[1]: t_on+=s
-                        else: t_off+=s
-                        if prev[1] and prev[2]==0: t_ocio+=s
-                    vmax=max(vmax,vel)
-                    if prev and prev[3] and lat: km+=haversine(prev[3],prev[4],lat,lon)
-                    prev=(dt,ign,vel,lat,lon)
+                vid=entry.vid
+                sg=get_segments(vid,ini,fim)
+                if not sg.events: write(res1,"ℹ Nenhum evento.",C["text_mid"]); return
+
+                km,vmax,t_on,t_ocio=sg.km,sg.vmax,sg.t_on,sg.t_idle
 
                 litros=km/cons if cons>0 else 0
                 c_comb=litros*preco
@@ -2857,7 +3050,7 @@ class TabCustos(tk.Frame):
                     f"    Custo horista mot.    : R$ {custo_h:.2f}/h",
                     "="*52]
                 write(res1,"\n".join(lines))
-            threading.Thread(target=task,daemon=True).start()
+            run_bg(task,key="custos/custo_veiculo")
 
         btn(ph,"💰 CALCULAR CUSTOS",custo_veiculo,C["success"]).pack(pady=(6,0))
         mk_export_btn(ph,res1,is_text=True).pack(pady=(4,0))
@@ -2884,8 +3077,9 @@ class TabCustos(tk.Frame):
             def task():
                 data=get_all_events(); mots={}
                 for ev in data:
+                    checkpoint()
                     nm=safe_str(ev.get("ras_mot_nome"),"Desconhecido")
-                    vel=abs(safe_int(ev.get("ras_eve_velocidade",0)))
+                    vel=abs(ev.vel)
                     pl=safe_str(ev.get("ras_vei_placa"))
                     if nm not in mots: mots[nm]={"veics":set(),"vels":[]}
                     mots[nm]["veics"].add(pl); mots[nm]["vels"].append(vel)
@@ -2904,13 +3098,13 @@ class TabCustos(tk.Frame):
                 medals=["🥇","🥈","🥉"]
                 for i,(vals,tag) in enumerate(rows):
                     rows[i]=((medals[i] if i<3 else f"#{i+1}",)+vals[1:],tag)
-                ft2.load(rows)
-                lb2.config(text=f"{len(mots)} motoristas | {now_str()}")
-            threading.Thread(target=task,daemon=True).start()
+                ui(ft2).load(rows)
+                ui(lb2).config(text=f"{len(mots)} motoristas | {now_str()}")
+            run_bg(task,key="custos/ranking_custo")
 
         btn(c2,"📋 CALCULAR",ranking_custo,C["success"]).pack(side="left",padx=8)
-        mk_export_btn(c2,ft2.tree).pack(side="left",padx=4)
-        self.after(400,ranking_custo)
+        mk_export_btn(c2,ft2).pack(side="left",padx=4)
+        on_first_show(f2,ranking_custo)
 
         # ── Configuração de parâmetros de custo ───────────────────────────
         f3=tk.Frame(nb,bg=C["bg"]); nb.add(f3,text="  ⚙ Parâmetros  ")
@@ -2963,28 +3157,20 @@ class TabComunicacao(tk.Frame):
             q=e1v.get().strip()
             if not q: return
             loading(res1)
+            try:
+                ini=datetime.strptime(ei1.get().strip(),"%d/%m/%Y %H:%M")
+                fim=datetime.strptime(ef1.get().strip(),"%d/%m/%Y %H:%M")
+                mn=int(e1mn.get() or 10)
+            except: write(res1,"⚠",C["warn"]); return
             def task():
                 entry=find_vehicle(q)
                 if not entry: err(res1,"Não encontrado."); return
-                vid=safe_int(entry.get("ras_vei_id",0))
-                try:
-                    ini=datetime.strptime(ei1.get().strip(),"%d/%m/%Y %H:%M")
-                    fim=datetime.strptime(ef1.get().strip(),"%d/%m/%Y %H:%M")
-                    mn=int(e1mn.get() or 10)
-                except: write(res1,"⚠",C["warn"]); return
-                evs=extract_list(api_get(f"/events/interval/id/{vid}/begin/{ts(ini)}/end/{ts(fim)}").get("data",[]))
+                vid=entry.vid
+                sg=get_segments(vid,ini,fim); evs=sg.events
                 if not evs: write(res1,"ℹ Sem eventos.",C["text_mid"]); return
 
-                gaps=[]; prev_dt=None; tot_gap=0.0
-                for ev in evs:
-                    dt=parse_dt(safe_str(ev.get("ras_eve_data_enviado") or ev.get("ras_eve_data_gps")))
-                    if dt is None: continue
-                    if prev_dt:
-                        g=(dt-prev_dt).total_seconds()/60
-                        if g>=mn:
-                            gaps.append((prev_dt,dt,g))
-                            tot_gap+=g
-                    prev_dt=dt
+                gaps=[(a,b,g/60) for a,b,g in sg.gaps_over(mn*60,sequential=True)]
+                tot_gap=sum(g for _,_,g in gaps)
 
                 periodo_min=(fim-ini).total_seconds()/60 or 1
                 disponib=max(0,100-tot_gap*100/periodo_min)
@@ -3000,7 +3186,7 @@ class TabComunicacao(tk.Frame):
                     sev="🔴" if g>60 else "🟡" if g>30 else "🟠"
                     lines.append(f"  {i:>3}  {a.strftime('%d/%m %H:%M:%S'):<22}  {b.strftime('%d/%m %H:%M:%S'):<22}  {sev} {g:.0f} min")
                 write(res1,"\n".join(lines),C["success"] if disponib>95 else C["warn"] if disponib>80 else C["danger"])
-            threading.Thread(target=task,daemon=True).start()
+            run_bg(task,key="comunicacao/silencio")
 
         btn(c1,"📡 ANALISAR",silencio,C["accent"]).pack(side="left",padx=8)
         mk_export_btn(c1,res1,is_text=True).pack(side="left",padx=4)
@@ -3026,10 +3212,11 @@ class TabComunicacao(tk.Frame):
             lb2.config(text="⏳...")
             def task():
                 data=get_all_events(); now=datetime.now()
-                rows=[]
+                rows=KeyedRows()
                 for ev in data:
+                    checkpoint()
                     d_env=safe_str(ev.get("ras_eve_data_enviado") or ev.get("ras_eve_data_gps"))
-                    dt=parse_dt(d_env)
+                    dt=ev.dt_com
                     if dt:
                         diff_min=(now-dt).total_seconds()/60
                         if diff_min<0: diff_min=0
@@ -3039,23 +3226,23 @@ class TabComunicacao(tk.Frame):
                         atr=f"{diff_min:.0f} min"
                     else:
                         diff_min=9999; st="⚫ Sem data"; tag="crit"; atr="?"
-                    ign=safe_int(ev.get("ras_eve_ignicao",0))
-                    gps=safe_int(ev.get("ras_eve_gps_status",0))
-                    rows.append(((safe_str(ev.get("ras_vei_placa")),
+                    ign=ev.ign
+                    gps=ev.gps
+                    rows.add(ev.vid,(safe_str(ev.get("ras_vei_placa")),
                                   safe_str(ev.get("ras_vei_veiculo")),
                                   safe_str(ev.get("ras_mot_nome")),
                                   d_env, atr, st,
                                   "✓ OK" if gps else "✗ FALHA",
-                                  "🟢 ON" if ign else "⚫ OFF"),tag))
-                rows.sort(key=lambda x: (0 if x[1]=="crit" else 1 if x[1]=="warn" else 2))
-                ft2.load(rows)
-                ok_c=sum(1 for _,t in rows if t=="ok")
-                lb2.config(text=f"✅ OK: {ok_c}  |  ⚠: {sum(1 for _,t in rows if t=='warn')}  |  🔴: {sum(1 for _,t in rows if t=='crit')}  |  {now_str()}")
-            threading.Thread(target=task,daemon=True).start()
+                                  "🟢 ON" if ign else "⚫ OFF"),tag)
+                rows.sort(key=lambda x: (0 if x[2]==("crit",) else 1 if x[2]==("warn",) else 2))
+                ui(ft2).sync(rows)
+                n={t:sum(1 for _,_,tg in rows if tg==(t,)) for t in ("ok","warn","crit")}
+                ui(lb2).config(text=f"✅ OK: {n['ok']}  |  ⚠: {n['warn']}  |  🔴: {n['crit']}  |  {now_str()}")
+            run_bg(task,key="comunicacao/status_frota")
 
         btn(c2,"⟳ VERIFICAR",status_frota,C["accent"]).pack(side="left",padx=8)
-        mk_export_btn(c2,ft2.tree).pack(side="left",padx=4)
-        self.after(300,status_frota)
+        mk_export_btn(c2,ft2).pack(side="left",padx=4)
+        on_first_show(f2,status_frota)
 
         # ── Uptime por Veículo (Período) ──────────────────────────────────
         f3=tk.Frame(nb,bg=C["bg"]); nb.add(f3,text="  ⏱ Uptime / Disponibilidade  ")
@@ -3073,43 +3260,61 @@ class TabComunicacao(tk.Frame):
         ft3.tag_configure("warn",background="#1a1300")
         ft3.tag_configure("crit",background="#1a0505")
 
+        lbl(c3,"  Paralelo:",9,col=C["text_mid"]).pack(side="left")
+        e3par=ent(c3,w=4); e3par.pack(side="left",padx=4,ipady=4); e3par.insert(0,str(UPTIME_WORKERS))
+        _run3={"token":None}
+
+        def _uptime_row(ev,sg,periodo_s,max_gap):
+            if sg.first is None: return None
+            gaps_over=[g for _,_,g in sg.gaps_over(max_gap,strict=True)]; tot_gap=sum(gaps_over)
+            uptime=max(0,100-tot_gap*100/periodo_s)
+            t_online=periodo_s-tot_gap
+            maior=max(gaps_over)/60 if gaps_over else 0
+            tag="ok" if uptime>95 else "warn" if uptime>80 else "crit"
+            return ((safe_str(ev.get("ras_vei_placa")),
+                     safe_str(ev.get("ras_vei_veiculo")),
+                     sg.count,f"{uptime:.1f}%",hms(t_online),
+                     len(gaps_over),f"{maior:.0f} min"),tag)
+
         def uptime_all():
             try:
                 max_gap=int(e3int.get())*60
                 ini=datetime.strptime(ei3.get().strip(),"%d/%m/%Y %H:%M")
                 fim=datetime.strptime(ef3.get().strip(),"%d/%m/%Y %H:%M")
             except: lb3.config(text="⚠ Parâmetros"); return
+            try: par=max(1,int(e3par.get()))
+            except: par=UPTIME_WORKERS
+            tok=_run3["token"]=CancelToken()       # a execução anterior é cancelada pela key
             lb3.config(text="⏳...")
             def task():
                 periodo_s=(fim-ini).total_seconds()
-                data=get_all_events()
-                rows=[]
-                for ev in data:
-                    vid=safe_int(ev.get("ras_vei_id",0))
-                    if not vid: continue
-                    evs=extract_list(api_get(f"/events/interval/id/{vid}/begin/{ts(ini)}/end/{ts(fim)}").get("data",[]))
-                    if not evs: continue
-                    dts=sorted(filter(None,[parse_dt(safe_str(e.get("ras_eve_data_enviado") or e.get("ras_eve_data_gps"))) for e in evs]))
-                    if not dts: continue
-                    gaps_over=[]; tot_gap=0
-                    for i in range(1,len(dts)):
-                        g=(dts[i]-dts[i-1]).total_seconds()
-                        if g>max_gap: gaps_over.append(g); tot_gap+=g
-                    uptime=max(0,100-tot_gap*100/periodo_s)
-                    t_online=periodo_s-tot_gap
-                    maior=max(gaps_over)/60 if gaps_over else 0
-                    tag="ok" if uptime>95 else "warn" if uptime>80 else "crit"
-                    rows.append(((safe_str(ev.get("ras_vei_placa")),
-                                  safe_str(ev.get("ras_vei_veiculo")),
-                                  len(evs),f"{uptime:.1f}%",hms(t_online),
-                                  len(gaps_over),f"{maior:.0f} min"),tag))
-                rows.sort(key=lambda x:float(str(x[0][3]).replace("%","")))
-                ft3.load(rows)
-                lb3.config(text=f"{len(rows)} veículos analisados | {now_str()}")
-            threading.Thread(target=task,daemon=True).start()
+                data=[ev for ev in get_all_events() if ev.vid]
+                ui(ft3).clear()
+                def one(ev):
+                    sg=get_segments(ev.vid,ini,fim)
+                    return _uptime_row(ev,sg,periodo_s,max_gap) if sg.events else None
+                def progress(done,total,failed):
+                    if tok.cancelled: return
+                    pct=100*done//max(total,1)
+                    ui(lb3).config(text=f"⏳ {done}/{total} veículos ({pct}%)"+(f"  |  ✖ {failed} falhas" if failed else ""))
+                def finished(rows,cancelled):
+                    if tok is not _run3["token"]: return       # execução substituída por outra
+                    rows.sort(key=lambda x:float(str(x[0][3]).replace("%","")))
+                    ui(ft3).load(rows)
+                    pre="⏹ Cancelado — " if cancelled else ""
+                    ui(lb3).config(text=f"{pre}{len(rows)} veículos analisados | {now_str()}")
+                rows=FanOut(data,one,workers=par,limiter=host_limiter(BASE_URL,API_RATE_LIMIT),
+                            on_result=lambda ev,row: tok.cancelled or ui(ft3).append([row]),
+                            on_progress=progress,token=tok).run()
+                finished(rows,tok.cancelled)
+            run_bg(task,key="comunicacao/uptime_all",token=tok,lane="long")
+
+        def cancelar3():
+            if _run3["token"]: _run3["token"].cancel()
 
         btn(c3,"⏱ ANALISAR TODOS",uptime_all,C["green"]).pack(side="left",padx=8)
-        mk_export_btn(c3,ft3.tree).pack(side="left",padx=4)
+        btn(c3,"⏹ CANCELAR",cancelar3,C["surface3"],C["text"]).pack(side="left",padx=4)
+        mk_export_btn(c3,ft3).pack(side="left",padx=4)
 
 
 
@@ -3117,6 +3322,7 @@ class TabComunicacao(tk.Frame):
 #  JANELA PRINCIPAL
 # ═══════════════════════════════════════════════════════════════════════════════
 root=tk.Tk()
+install_ui(root)
 root.title("IFControll v3.0 — Fleet Intelligence Platform")
 root.configure(bg=C["bg"])
 sw,sh=root.winfo_screenwidth(),root.winfo_screenheight()
@@ -3135,8 +3341,20 @@ mk_theme_btn(rf, root).pack(side="right", padx=8, pady=14)
 ctrl_rf = mk_refresh_controls(rf, root)
 ctrl_rf.pack(side="right", padx=4, pady=14)
 tk.Label(rf,text="  LIVE  ",bg=C["success"],fg=C["bg"],font=("Helvetica Neue",8,"bold"),padx=6,pady=3).pack(side="right",pady=16)
+api_lbl=tk.Label(rf,text="  API OK  ",bg=C["surface2"],fg=C["success"],font=("Helvetica Neue",8,"bold"),padx=6,pady=3)
+api_lbl.pack(side="right",padx=(0,6),pady=16)
+mk_tasks_panel(rf, root).pack(side="right",padx=(0,6),pady=16)
 clk=tk.Label(rf,bg=C["surface"],fg=C["text_dim"],font=("Courier New",9)); clk.pack(side="right",padx=12,pady=16)
-def tick(): clk.config(text=datetime.now().strftime("%d/%m/%Y  %H:%M:%S")); root.after(1000,tick)
+def _api_status():
+    st=_breaker.state
+    if st==CircuitBreaker.OPEN:      return f"  API OFF · {_breaker.retry_in():.0f}s  ",C["danger"]
+    if st==CircuitBreaker.HALF_OPEN: return "  API TESTANDO  ",C["warn"]
+    if _breaker.latency_ms>3000:     return f"  API LENTA · {_breaker.latency_ms/1000:.1f}s  ",C["yellow"]
+    return "  API OK  ",C["success"]
+def tick():
+    clk.config(text=datetime.now().strftime("%d/%m/%Y  %H:%M:%S"))
+    txt,cor=_api_status(); api_lbl.config(text=txt,fg=cor)
+    root.after(1000,tick)
 tick()
 
 # Notebook principal
@@ -3148,6 +3366,7 @@ st.map("M.TNotebook.Tab",background=[("selected",C["surface2"]),("active",C["hov
        foreground=[("selected",C["accent"]),("active",C["text"])])
 
 nb=ttk.Notebook(root,style="M.TNotebook"); nb.pack(fill="both",expand=True)
+tabs=LazyNotebook(nb,bg=C["bg"],fg=C["text_dim"])   # cada aba só é montada ao ser aberta
 for name,cls in [
     ("  📡  Dashboard  ",TabDashboard),
     ("  🚨  Alertas  ",TabAlertas),
@@ -3164,7 +3383,8 @@ for name,cls in [
     ("  📶  Comunicação  ",TabComunicacao),
     (" 📋 Cronologia ",    TabCronologia),
 ]:
-    nb.add(cls(nb),text=name)
+    tabs.add(cls,name)
+tabs.warm_up([TabDiagnostico,TabKPIs])
 
 # Footer
 tk.Frame(root,bg=C["border"],height=1).pack(fill="x")
@@ -3177,6 +3397,9 @@ tk.Label(ft,text=f"Python {__import__('sys').version.split()[0]}  ·  Tkinter  
 # Ctrl+C universal
 bind_global_copy(root)
 
-# Inicia o loop de auto-refresh de 60 segundos
-auto_refresh_loop(root)
-root.mainloop()
\ No newline at end of file
+# Inicia o agendador de auto-refresh (recua quando a API fica lenta)
+auto_refresh_loop(root, latency=lambda: _breaker.latency_ms)
+root.mainloop()
+task_manager().cancel_all()
+close_pool()
+if _event_store: _event_store.close()
\ No newline at end of file
@@ -0,0 +1,237 @@
+"""
+api_client.py — IFControll v3.0
+• Pool de conexões HTTP compartilhado (keep-alive) para as APIs
+• Sessões por thread reaproveitando um único pool urllib3 thread-safe
+• Negociação gzip/deflate em todas as requisições
+• Limitador de taxa (token bucket) por host
+• Retentativas com backoff exponencial + jitter e circuit breaker
+
+INTEGRAÇÃO:
+  1. Use http_session() no lugar de requests.get/post/put/delete.
+  2. Ajuste o tamanho do pool com configure_pool() antes de abrir as abas.
+  3. resilient_request() aplica timeout, retentativa e breaker numa chamada.
+"""
+
+import threading, time, random
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+
+# ─── CONFIGURAÇÃO DO POOL ────────────────────────────────────────────────────
+_POOL_SIZE     = 16    # conexões mantidas abertas por host
+_POOL_HOSTS    = 4     # hosts distintos em cache (Fulltrack2 + Cronologia)
+_POOL_BLOCK    = False # True = threads esperam por conexão livre em vez de abrir extra
+
+_DEFAULT_HEADERS = {
+    "Accept-Encoding": "gzip, deflate",
+    "Connection":      "keep-alive",
+    "Accept":          "application/json",
+}
+
+_adapter      = None
+_adapter_lock = threading.Lock()
+_local        = threading.local()
+_generation   = 0     # incrementa a cada configure_pool() para descartar sessões antigas
+
+
+def _build_adapter():
+    return HTTPAdapter(pool_connections=_POOL_HOSTS,
+                       pool_maxsize=_POOL_SIZE,
+                       pool_block=_POOL_BLOCK,
+                       max_retries=0)
+
+def _get_adapter():
+    global _adapter
+    if _adapter is None:
+        with _adapter_lock:
+            if _adapter is None:
+                _adapter = _build_adapter()
+    return _adapter
+
+def configure_pool(size=None, hosts=None, block=None):
+    """Redimensiona o pool compartilhado. Sessões existentes são recriadas
+    na próxima chamada de http_session() em cada thread."""
+    global _POOL_SIZE, _POOL_HOSTS, _POOL_BLOCK, _adapter, _generation
+    with _adapter_lock:
+        if size is not None:  _POOL_SIZE  = max(1, int(size))
+        if hosts is not None: _POOL_HOSTS = max(1, int(hosts))
+        if block is not None: _POOL_BLOCK = bool(block)
+        old, _adapter = _adapter, _build_adapter()
+        _generation += 1
+    if old is not None:
+        try: old.close()
+        except Exception: pass
+
+def http_session():
+    """
+    Retorna a requests.Session da thread atual.
+    Todas as sessões montam o MESMO HTTPAdapter, então as conexões TCP/TLS
+    aquecidas são reaproveitadas por qualquer worker das abas.
+    """
+    s = getattr(_local, "session", None)
+    if s is None or getattr(_local, "generation", -1) != _generation:
+        s = requests.Session()
+        s.headers.update(_DEFAULT_HEADERS)
+        adapter = _get_adapter()
+        s.mount("https://", adapter)
+        s.mount("http://", adapter)
+        _local.session = s
+        _local.generation = _generation
+    return s
+
+def pool_info():
+    """Resumo da configuração atual (para diagnóstico)."""
+    return {"pool_size": _POOL_SIZE, "pool_hosts": _POOL_HOSTS,
+            "pool_block": _POOL_BLOCK, "generation": _generation}
+
+def close_pool():
+    """Fecha todas as conexões mantidas (chamar ao encerrar o app)."""
+    global _adapter
+    with _adapter_lock:
+        old, _adapter = _adapter, None
+    if old is not None:
+        try: old.close()
+        except Exception: pass
+
+
+# ─── LIMITE DE TAXA POR HOST ─────────────────────────────────────────────────
+class RateLimiter:
+    """Token bucket: até `rate` requisições/s, rajadas de até `burst`."""
+    def __init__(self, rate=10.0, burst=None):
+        self.rate   = float(rate)
+        self.burst  = float(burst if burst is not None else max(1.0, rate))
+        self._tokens = self.burst
+        self._stamp  = time.monotonic()
+        self._lock   = threading.Lock()
+
+    def acquire(self, token=None):
+        """Bloqueia até haver ficha disponível (token = CancelToken opcional)."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+                self._stamp = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                delay = (1 - self._tokens) / self.rate
+            if token is not None:
+                if token.wait(delay): token.check()
+            else:
+                time.sleep(delay)
+
+_limiters      = {}
+_limiters_lock = threading.Lock()
+
+def host_limiter(url_or_host, rate=10.0, burst=None):
+    """Limitador compartilhado por host (criado na primeira chamada)."""
+    host = urlsplit(url_or_host).netloc or url_or_host
+    with _limiters_lock:
+        lim = _limiters.get(host)
+        if lim is None:
+            lim = _limiters[host] = RateLimiter(rate, burst)
+        return lim
+
+
+# ─── CIRCUIT BREAKER ─────────────────────────────────────────────────────────
+class CircuitOpen(Exception):
+    """Upstream marcado como indisponível — a chamada nem foi feita."""
+
+class CircuitBreaker:
+    """
+    closed    → chamadas normais; `threshold` falhas seguidas abrem o circuito
+    open      → falha imediata por `reset_after` segundos
+    half_open → deixa passar UMA chamada de teste; sucesso fecha, falha reabre
+    """
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, threshold=5, reset_after=30.0):
+        self.threshold   = threshold
+        self.reset_after = reset_after
+        self._lock       = threading.Lock()
+        self._state      = self.CLOSED
+        self._failures   = 0
+        self._opened_at  = 0.0
+        self._probing    = False
+        self.last_error  = ""
+        self.latency_ms  = 0.0      # média móvel das chamadas bem-sucedidas
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_after:
+                self._state = self.HALF_OPEN; self._probing = False
+            return self._state
+
+    def retry_in(self):
+        """Segundos até a próxima tentativa (0 se não estiver aberto)."""
+        with self._lock:
+            if self._state != self.OPEN: return 0.0
+            return max(0.0, self.reset_after - (time.monotonic() - self._opened_at))
+
+    def allow(self):
+        st = self.state
+        with self._lock:
+            if st == self.CLOSED: return True
+            if st == self.HALF_OPEN and not self._probing:
+                self._probing = True; return True
+            return False
+
+    def record_success(self, elapsed=None):
+        with self._lock:
+            self._state = self.CLOSED; self._failures = 0; self._probing = False
+            if elapsed is not None:
+                ms = elapsed * 1000
+                self.latency_ms = ms if not self.latency_ms else self.latency_ms * 0.8 + ms * 0.2
+
+    def record_failure(self, error=""):
+        with self._lock:
+            self._failures += 1; self.last_error = str(error)[:200]
+            if self._state == self.HALF_OPEN or self._failures >= self.threshold:
+                self._state = self.OPEN; self._opened_at = time.monotonic(); self._probing = False
+
+
+# ─── REQUISIÇÃO RESILIENTE ───────────────────────────────────────────────────
+RETRY_STATUS = (500, 502, 503, 504)
+
+def backoff_delay(attempt, base=0.5, cap=8.0):
+    """Backoff exponencial com jitter total: U(0, min(cap, base·2^attempt))."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+def resilient_request(method, url, breaker=None, retries=2, timeout=30,
+                      backoff=0.5, max_backoff=8.0, **kw):
+    """
+    Executa a requisição pela sessão do pool.
+    • Falhas de rede, timeouts e HTTP 5xx contam para o breaker; qualquer
+      outra exceção também conta (e sobe sem repetir).
+    • Só métodos idempotentes (GET/HEAD) são repetidos.
+    • Levanta CircuitOpen sem tocar a rede se o breaker estiver aberto.
+    """
+    method = method.upper()
+    attempts = 1 + (retries if method in ("GET", "HEAD") else 0)
+    last_exc = None
+    for attempt in range(attempts):
+        if breaker is not None and not breaker.allow():
+            raise CircuitOpen(f"API indisponível — nova tentativa em {breaker.retry_in():.0f}s")
+        t0 = time.monotonic()
+        try:
+            r = http_session().request(method, url, timeout=timeout, **kw)
+        except (requests.Timeout, requests.ConnectionError) as e:
+            last_exc = e
+            if breaker is not None: breaker.record_failure(e)
+        except BaseException as e:
+            # Demais erros (ChunkedEncodingError, InvalidURL…) não são repetidos,
+            # mas precisam fechar a conta no breaker — senão a sonda do
+            # half_open fica presa e o circuito nunca mais deixa passar.
+            if breaker is not None: breaker.record_failure(e)
+            raise
+        else:
+            if r.status_code not in RETRY_STATUS:
+                if breaker is not None: breaker.record_success(time.monotonic() - t0)
+                return r
+            last_exc = None
+            if breaker is not None: breaker.record_failure(f"HTTP {r.status_code}")
+            if attempt == attempts - 1: return r
+        if attempt < attempts - 1:
+            time.sleep(backoff_delay(attempt, backoff, max_backoff))
+    raise last_exc
@@ -1,8 +1,17 @@
 """
 auto_refresh_export.py — IFControll v3.0
-• Auto-refresh global de 15 segundos para todas as abas
+• Auto-refresh por view: rápido quando visível, lento (ou só ao abrir)
+  quando oculta, com jitter, sem sobrepor execuções e recuo por latência
 • Correção de fuso horário (UTC-3 / Brasília)
-• Exportação multi-formato: CSV, XLSX, XLS, PDF, TXT
+• Parse de datas por fatias fixas, memorizado, com modo em lote (epoch)
+• Exportação multi-formato: CSV, XLSX, XLS, PDF, TXT — lida do modelo de
+  linhas (FilterableTree / fill_tree / reconcile), não do Treeview; CSV e TXT
+  gravam linha a linha; com filtro ativo, escolhe filtrado ou tudo
+• XLSX em modo write_only com estilos nomeados; XLSX/XLS quebram em várias
+  planilhas no limite de linhas do formato (65.536 no XLS)
+• Exportações rodam como tarefa em segundo plano (barra de progresso +
+  Cancelar); PDF em tabelas de uma página, cabeçalho repetido e colunas
+  dimensionadas pelo conteúdo
 • Ctrl+C universal em qualquer widget de texto/tabela
 
 INTEGRAÇÃO:
@@ -12,10 +21,14 @@ INTEGRAÇÃO:
   4. Substitua mk_export_btn() pela versão abaixo.
 """
 
-import csv, os, io, threading
+import csv, os, io, random, time, traceback
+from itertools import chain, islice
 from datetime import datetime, timedelta, timezone
-from tkinter import filedialog, messagebox
+from tkinter import filedialog, messagebox, ttk
 import tkinter as tk
+from workers import Cancelled, checkpoint, task_manager
+from tree_sync import reconcile
+from ui_dispatch import post, run_bg, tree_model
 
 # ─── FUSO HORÁRIO BRASIL (UTC-3) ─────────────────────────────────────────────
 TZ_BR = timezone(timedelta(hours=-3))
@@ -35,16 +48,131 @@ def ts(dt):
         dt = dt.replace(tzinfo=TZ_BR)
     return int(dt.timestamp())
 
-def parse_dt(s):
-    """Parse de string de data/hora — igual ao original, sem alteração de tz."""
-    for fmt in ("%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M",
-                "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S"):
-        try:
-            return datetime.strptime(str(s).strip(), fmt)
-        except:
-            pass
+# ─── PARSE DE DATAS ──────────────────────────────────────────────────────────
+# Os formatos aceitos são os mesmos de sempre; o layout da API
+# (dd/mm/YYYY HH:MM:SS) é decodificado por fatias de largura fixa, sem
+# strptime, e cada string vista fica memorizada (datas se repetem muito
+# entre snapshots). O resultado continua "ingênuo" (sem tzinfo) = UTC-3.
+_DT_FORMATS   = ("%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M",
+                 "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S")
+_DT_MEMO      = {}
+_DT_MEMO_MAX  = 200_000
+_MISS         = object()
+_BR_OFFSET_S  = 3 * 3600          # UTC-3 → UTC
+
+def _fields_br(s):
+    """dd/mm/YYYY HH:MM[:SS] → (Y,m,d,H,M,S) ou None."""
+    n = len(s)
+    if (n != 19 and n != 16) or s[2] != "/" or s[5] != "/" or s[10] != " " or s[13] != ":":
+        return None
+    if n == 19 and s[16] != ":": return None
+    # int() aceitaria sinal e espaço ("+1", "1 "); strptime não
+    if not (s[0:2] + s[3:5] + s[6:10] + s[11:13] + s[14:16] + s[17:19]).isdigit():
+        return None
+    try:
+        return (int(s[6:10]), int(s[3:5]), int(s[0:2]),
+                int(s[11:13]), int(s[14:16]), int(s[17:19]) if n == 19 else 0)
+    except ValueError:
+        return None
+
+def _fields_iso(s):
+    """YYYY-mm-dd[ T]HH:MM:SS → (Y,m,d,H,M,S) ou None."""
+    if len(s) != 19 or s[4] != "-" or s[7] != "-" or s[10] not in " T" or s[13] != ":" or s[16] != ":":
+        return None
+    if not (s[0:4] + s[5:7] + s[8:10] + s[11:13] + s[14:16] + s[17:19]).isdigit():
+        return None
+    try:
+        return (int(s[0:4]), int(s[5:7]), int(s[8:10]),
+                int(s[11:13]), int(s[14:16]), int(s[17:19]))
+    except ValueError:
+        return None
+
+def _sniff(s):
+    """Escolhe o decodificador pelo formato da string."""
+    if len(s) >= 16 and s[2:3] == "/": return _fields_br
+    if len(s) == 19 and s[4:5] == "-": return _fields_iso
+    return None
+
+def _slow_parse(s):
+    for fmt in _DT_FORMATS:
+        try: return datetime.strptime(s, fmt)
+        except ValueError: pass
     return None
 
+def _decode(s, dec=None):
+    f = (dec or _sniff(s) or (lambda _: None))(s)
+    if f is not None:
+        try: return datetime(*f)
+        except ValueError: pass
+    return _slow_parse(s)
+
+def parse_dt(s):
+    """Parse de string de data/hora (mesmos formatos do original, sem tz)."""
+    if s is None: return None
+    if s.__class__ is datetime: return s
+    s = str(s).strip()
+    r = _DT_MEMO.get(s, _MISS)
+    if r is _MISS:
+        r = _decode(s)
+        if len(_DT_MEMO) >= _DT_MEMO_MAX: _DT_MEMO.clear()
+        _DT_MEMO[s] = r
+    return r
+
+def parse_dt_many(values):
+    """parse_dt em lote: o formato é detectado uma vez, no 1º valor não vazio."""
+    dec = None; memo = _DT_MEMO; out = []
+    for v in values:
+        if v is None or v == "": out.append(None); continue
+        if v.__class__ is datetime: out.append(v); continue
+        s = str(v).strip()
+        r = memo.get(s, _MISS)
+        if r is _MISS:
+            if dec is None: dec = _sniff(s)
+            r = _decode(s, dec)
+            if len(memo) >= _DT_MEMO_MAX: memo.clear()
+            memo[s] = r
+        out.append(r)
+    return out
+
+def _days_from_civil(y, m, d):
+    """Dias desde 1970-01-01 (algoritmo de H. Hinnant, calendário gregoriano)."""
+    y -= m <= 2
+    era = (y if y >= 0 else y - 399) // 400
+    yoe = y - era * 400
+    doy = (153 * (m + (-3 if m > 2 else 9)) + 2) // 5 + d - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468
+
+_MDAYS = (31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+def parse_epochs(values, as_array=True):
+    """
+    Datas (strings UTC-3) → epoch-segundos, sem criar datetime.
+    Mesma semântica de ts(parse_dt(v)). Retorna array float64 do NumPy
+    (NaN = inválido) quando disponível e as_array=True; senão lista (None).
+    """
+    dec = None; out = []
+    for v in values:
+        if v is None or v == "": out.append(None); continue
+        if v.__class__ is datetime: out.append(ts(v)); continue
+        s = str(v).strip()
+        if dec is None: dec = _sniff(s)
+        f = dec(s) if dec else None
+        if f is not None:
+            y, mo, d, h, mi, se = f
+            if 1 <= mo <= 12 and 1 <= d <= _MDAYS[mo-1] and h < 24 and mi < 60 and se < 60 \
+                    and (mo != 2 or d < 29 or (y % 4 == 0 and (y % 100 != 0 or y % 400 == 0))):
+                out.append(_days_from_civil(y, mo, d) * 86400 + h * 3600 + mi * 60 + se + _BR_OFFSET_S)
+                continue
+        dt = parse_dt(s)
+        out.append(ts(dt) if dt else None)
+    if not as_array: return out
+    try:
+        import numpy as np
+    except ImportError:
+        return out
+    return np.array([float("nan") if x is None else x for x in out], dtype=np.float64)
+
 def fmt_now_default():
     """Retorna string de 'agora' para preencher campos de data."""
     return now_br().strftime("%d/%m/%Y %H:%M")
@@ -57,24 +185,110 @@ def fmt_days_ago(d=7):
 
 
 # ─── AUTO-REFRESH GLOBAL ─────────────────────────────────────────────────────
-_refresh_tasks = []   # lista de (name, callable)
+# Agendador por view: cada refresh registrado tem intervalo próprio quando
+# visível e um intervalo lento (ou "só ao abrir") quando oculto. O loop do
+# Tk verifica a cada TICK_MS quem está vencido; uma view oculta que ficou
+# velha atualiza assim que volta a ser exibida.
+_refresh_tasks = []   # lista de RefreshJob
 _auto_enabled  = True
-_INTERVAL_MS   = 60_000  # 60 segundos
-
-def auto_refresh_register(name, fn):
-    """Registra uma função de refresh para ser chamada automaticamente."""
-    _refresh_tasks.append((name, fn))
+_INTERVAL_MS   = 60_000  # intervalo padrão (view visível)
+TICK_MS        = 1000
+HIDDEN_FACTOR  = 5       # oculta: intervalo × 5 (hidden_s=0 → só ao abrir)
+JITTER         = 0.10    # ±10% para as views não dispararem juntas
+SLOW_MS        = 1500    # latência da API a partir da qual o agendador recua
+MAX_BACKOFF    = 4.0
+_latency       = None    # callable → latência recente da API em ms
+
+class RefreshJob:
+    """Um refresh registrado. fn() pode devolver a Thread da task (run_bg)
+    para que o próximo ciclo seja pulado enquanto ela não terminar."""
+    __slots__ = ("name", "fn", "widget", "every_s", "hidden_s",
+                 "last", "jit", "handle", "runs", "skips")
+
+    def __init__(self, name, fn, widget=None, every_s=None, hidden_s=None):
+        self.name     = name
+        self.fn       = fn
+        self.widget   = widget
+        self.every_s  = every_s or _INTERVAL_MS / 1000
+        self.hidden_s = self.every_s * HIDDEN_FACTOR if hidden_s is None else hidden_s
+        self.last     = time.monotonic()      # a carga inicial é da própria aba
+        self.jit      = random.uniform(-JITTER, JITTER)
+        self.handle   = None
+        self.runs = self.skips = 0
+
+    def visible(self):
+        if self.widget is None: return True
+        try: return bool(self.widget.winfo_viewable())
+        except tk.TclError: return False
+
+    def running(self):
+        h = self.handle
+        return h is not None and hasattr(h, "is_alive") and h.is_alive()
+
+    def interval(self, backoff=1.0):
+        """Segundos entre execuções no estado atual (None = só ao abrir)."""
+        base = self.every_s if self.visible() else self.hidden_s
+        if not base: return None
+        return base * backoff * (1 + self.jit)
+
+    def due_in(self, backoff=1.0, now=None):
+        iv = self.interval(backoff)
+        if iv is None: return None
+        return self.last + iv - (now or time.monotonic())
+
+    def run(self):
+        if self.running():
+            self.skips += 1; return False
+        self.last = time.monotonic(); self.jit = random.uniform(-JITTER, JITTER)
+        self.runs += 1
+        try: self.handle = self.fn()
+        except Exception: traceback.print_exc(); self.handle = None
+        return True
+
+def auto_refresh_register(name, fn, widget=None, every_s=None, hidden_s=None):
+    """Registra um refresh. widget: a página/aba da view (visibilidade);
+    every_s: intervalo visível; hidden_s: intervalo oculto (0 = só ao abrir)."""
+    job = RefreshJob(name, fn, widget, every_s, hidden_s)
+    _refresh_tasks.append(job)
+    return job
+
+def auto_refresh_set_rate(name, every_s=None, hidden_s=None):
+    for job in _refresh_tasks:
+        if job.name != name: continue
+        if every_s is not None: job.every_s = every_s
+        if hidden_s is not None: job.hidden_s = hidden_s
+
+def auto_refresh_backoff():
+    """Fator de recuo pela latência da API (1.0 = normal)."""
+    lat = _latency() if _latency else 0
+    if not lat or lat < SLOW_MS: return 1.0
+    return min(MAX_BACKOFF, lat / SLOW_MS)
 
 def auto_refresh_run_all():
-    """Executa todos os refreshes registrados em threads separadas."""
-    for name, fn in _refresh_tasks:
-        threading.Thread(target=fn, daemon=True, name=f"refresh-{name}").start()
+    """Executa agora todos os refreshes (pulando os que ainda estão rodando).
+    Chamar na thread do Tk."""
+    for job in _refresh_tasks:
+        job.run()
+
+def auto_refresh_schedule():
+    """[(nome, segundos até o próximo ou None, visível, rodando)] para a UI."""
+    b = auto_refresh_backoff(); now = time.monotonic()
+    return [(j.name, j.due_in(b, now), j.visible(), j.running()) for j in _refresh_tasks]
 
-def auto_refresh_loop(root):
-    """Loop principal — chame uma vez após criar a janela."""
+def _auto_tick(root):
     if _auto_enabled:
-        auto_refresh_run_all()
-    root.after(_INTERVAL_MS, lambda: auto_refresh_loop(root))
+        b = auto_refresh_backoff(); now = time.monotonic()
+        for job in _refresh_tasks:
+            left = job.due_in(b, now)
+            if left is not None and left <= 0: job.run()
+    root.after(TICK_MS, lambda: _auto_tick(root))
+
+def auto_refresh_loop(root, latency=None):
+    """Inicia o agendador — chame uma vez após criar a janela.
+    latency: callable que devolve a latência recente da API em ms."""
+    global _latency
+    _latency = latency
+    root.after(TICK_MS, lambda: _auto_tick(root))
 
 def auto_refresh_set_enabled(val: bool):
     global _auto_enabled
@@ -82,14 +296,63 @@ def auto_refresh_set_enabled(val: bool):
 
 
 # ─── EXPORTAÇÃO MULTI-FORMATO ─────────────────────────────────────────────────
-def _cols_rows_from_tree(tree):
+class RowSource:
+    """Linhas a exportar, re-iteráveis: cada passada gera as linhas sob
+    demanda a partir do modelo em Python (nada é copiado nem formatado
+    antes da hora). len() = número de linhas."""
+    def __init__(self, cols, make_iter, total, make_scan=None):
+        self.cols  = list(cols)
+        self._make = make_iter
+        self._scan = make_scan
+        self.total = total
+
+    def __iter__(self): return iter(self._make())
+    def __len__(self):  return self.total
+
+    def scan(self):
+        """Passada auxiliar (ex.: medir colunas) — não conta no progresso."""
+        return iter((self._scan or self._make)())
+
+def export_source(src, scope="view"):
+    """
+    RowSource de:
+      • FilterableTree — scope "view" (filtrado/ordenado) ou "all" (tudo)
+      • Treeview — modelo gravado por fill_tree()/reconcile(); sem modelo
+        (ou fora de sincronia), lê os valores do Tk uma vez
+    Chame na thread do Tk: as linhas são fixadas aqui (só as referências, os
+    valores não são copiados) e o RowSource pode ser percorrido por uma task.
+      • (cols, linhas) — dados já em memória
+    """
+    if hasattr(src, "iter_rows"):
+        # cópia da lista de linhas aqui, na thread do Tk: um refresh/filtro
+        # durante a exportação não muda o que é gravado (nem entre as passadas)
+        rows = list(src.iter_rows(scope))
+        return RowSource(src.columns(), lambda: rows, len(rows))
+    if isinstance(src, tuple):
+        cols, rows = src
+        return RowSource(cols, lambda: rows, len(rows))
+    tree = src
     cols = [tree.heading(c)["text"] for c in tree["columns"]]
-    rows = [tree.item(r)["values"] for r in tree.get_children()]
-    return cols, rows
-
-def _cols_rows_from_ftree(ft):
-    """FilterableTree wrapper."""
-    return _cols_rows_from_tree(ft.tree)
+    iids = tree.get_children()
+    model = tree_model(tree)
+    if model is not None and len(model) == len(iids):
+        model = list(model)
+        return RowSource(cols, lambda: model, len(model))
+    rows = [tree.item(i, "values") for i in iids]   # lido aqui, na thread do Tk
+    return RowSource(cols, lambda: rows, len(rows))
+
+def ask_export_scope(src):
+    """Com filtro ativo num FilterableTree, pergunta se exporta só o filtrado
+    ou tudo. Retorna "view", "all" ou None (cancelado)."""
+    if not hasattr(src, "count"): return "view"
+    v, a = src.count("view"), src.count("all")
+    if v == a: return "view"
+    r = messagebox.askyesnocancel("Exportar",
+        f"A tabela está filtrada ({v} de {a} linhas).\n\n"
+        f"Sim — exportar só as {v} linhas filtradas\n"
+        f"Não — exportar todas as {a} linhas")
+    if r is None: return None
+    return "view" if r else "all"
 
 def export_universal(source, title="Exportar", source_type="tree"):
     """
@@ -98,13 +361,12 @@ def export_universal(source, title="Exportar", source_type="tree"):
 
     source_type: "tree" | "ftree" | "text"
     """
-    # ── Coleta dados ──────────────────────────────────────────────
+    # ── Coleta dados (do modelo, sob demanda) ─────────────────────
     if source_type in ("tree", "ftree"):
-        if source_type == "ftree":
-            cols, rows = _cols_rows_from_ftree(source)
-        else:
-            cols, rows = _cols_rows_from_tree(source)
-        if not rows:
+        scope = ask_export_scope(source)
+        if scope is None: return
+        rows = export_source(source, scope); cols = rows.cols
+        if not len(rows):
             messagebox.showinfo("Exportar", "Nenhum dado para exportar.")
             return
         text_content = None
@@ -138,89 +400,230 @@ def export_universal(source, title="Exportar", source_type="tree"):
         return
 
     ext = os.path.splitext(path)[1].lower()
-
-    try:
-        if ext == ".csv":
-            _export_csv(path, cols, rows, text_content)
-        elif ext == ".xlsx":
-            _export_xlsx(path, cols, rows, text_content)
-        elif ext == ".xls":
-            _export_xls(path, cols, rows, text_content)
-        elif ext == ".pdf":
-            _export_pdf(path, cols, rows, text_content, title)
-        else:  # .txt ou qualquer outro
-            _export_txt(path, cols, rows, text_content)
-
-        messagebox.showinfo("Exportar", f"✔ Arquivo salvo:\n{path}")
-    except ImportError as e:
-        messagebox.showerror("Dependência faltando",
-            f"Instale a biblioteca necessária:\n{e}\n\n"
-            f"Execute: pip install openpyxl xlwt reportlab")
-    except Exception as e:
-        messagebox.showerror("Erro ao exportar", str(e))
+    writer = {".csv": _export_csv, ".xlsx": _export_xlsx, ".xls": _export_xls,
+              ".pdf": _export_pdf}.get(ext, _export_txt)      # .txt ou qualquer outro
+    if writer is _export_pdf:
+        write = lambda p, r: _export_pdf(p, cols, r, text_content, title)
+    else:
+        write = lambda p, r: writer(p, cols, r, text_content)
+    run_export(getattr(source, "tree", source), path, write,
+               None if text_content else rows, title=title)
+
+
+# ─── EXPORTAÇÃO EM SEGUNDO PLANO ──────────────────────────────────────────────
+# O arquivo é gravado numa task do TaskManager; a task percorre as linhas por
+# um RowSource "rastreado" que avisa o progresso e para no Cancelar
+# (checkpoint). Cancelado ou com erro, o arquivo parcial é apagado.
+PROGRESS_EVERY = 200       # linhas entre verificações de progresso/cancelamento
+PROGRESS_MIN_S = 0.1       # intervalo mínimo entre atualizações da barra
+
+class ExportProgress:
+    """Janelinha com barra de progresso e Cancelar. Só a thread do Tk mexe
+    nela (a task usa post)."""
+    def __init__(self, master, title, total):
+        self.total = total
+        self.task  = None
+        top = self.top = tk.Toplevel(master)
+        top.title(title); top.configure(bg="#12151E"); top.resizable(False, False)
+        top.transient(master.winfo_toplevel())
+        self.lb = tk.Label(top, text="Preparando…", bg="#12151E", fg="#DDE1F0",
+                           font=("Helvetica Neue", 9))
+        self.lb.pack(anchor="w", padx=12, pady=(10, 4))
+        self.bar = ttk.Progressbar(top, length=320, maximum=max(total, 1),
+                                   mode="determinate" if total else "indeterminate")
+        self.bar.pack(padx=12)
+        if not total: self.bar.start(15)
+        b = tk.Label(top, text="⏹ Cancelar", bg="#1E2335", fg="#00C8F8",
+                     font=("Helvetica Neue", 8, "bold"), padx=8, pady=3, cursor="hand2")
+        b.bind("<Button-1>", lambda e: self.cancel()); b.pack(pady=10)
+        top.protocol("WM_DELETE_WINDOW", self.cancel)
+
+    def cancel(self):
+        if self.task is not None: self.task.cancel()
+        try: self.lb.config(text="Cancelando…")
+        except tk.TclError: pass
+
+    def update(self, done):
+        try:
+            self.bar["value"] = min(done, self.total)
+            self.lb.config(text=f"{done:,} / {self.total:,} linhas".replace(",", "."))
+        except tk.TclError: pass
+
+    def close(self):
+        try: self.top.destroy()
+        except tk.TclError: pass
+
+def _tracked(src, report):
+    """RowSource que chama checkpoint() e report(n) a cada PROGRESS_EVERY linhas."""
+    def gen():
+        n = 0; last = 0.0
+        for row in src:
+            yield row; n += 1
+            if n % PROGRESS_EVERY == 0:
+                checkpoint()
+                now = time.perf_counter()
+                if now - last >= PROGRESS_MIN_S: report(n); last = now
+        report(n)
+    def scan():
+        for n, row in enumerate(src, 1):
+            yield row
+            if n % PROGRESS_EVERY == 0: checkpoint()
+    return RowSource(src.cols, gen, len(src), scan)
+
+def _discard(path):
+    try: os.remove(path)
+    except OSError: pass
+
+def run_export(master, path, write, src=None, title="Exportar"):
+    """
+    Grava em segundo plano: write(path, linhas) numa task, com ExportProgress.
+    src: RowSource (None = exportação de texto, barra indeterminada).
+    Se write retornar um int, ele entra na mensagem final como nº de linhas.
+    """
+    prog = ExportProgress(master, title, len(src) if src is not None else 0)
+    def task():
+        rows = _tracked(src, lambda n: post(prog.update, n)) if src is not None else None
+        try:
+            n = write(path, rows)
+        except Cancelled:
+            _discard(path); post(prog.close)
+            post(messagebox.showinfo, title, "Exportação cancelada."); return
+        except ImportError as e:
+            _discard(path); post(prog.close)
+            post(messagebox.showerror, "Dependência faltando",
+                 f"Instale a biblioteca necessária:\n{e}\n\n"
+                 f"Execute: pip install openpyxl xlwt reportlab"); return
+        except Exception as e:
+            _discard(path); post(prog.close)
+            post(messagebox.showerror, "Erro ao exportar", str(e)); return
+        post(prog.close)
+        info = f" ({n} linhas)" if isinstance(n, int) else ""
+        post(messagebox.showinfo, title, f"✔ Arquivo salvo{info}:\n{path}")
+    prog.task = run_bg(task, name=f"{title}: {os.path.basename(path)}", lane="long")
+    return prog
 
 
 # ── Formatos internos ──────────────────────────────────────────────
-def _export_csv(path, cols, rows, text_content):
+# rows pode ser lista ou RowSource; CSV e TXT gravam linha a linha.
+def write_csv(path, src):
+    """Grava um RowSource em CSV (;) linha a linha. Retorna as linhas gravadas."""
+    n = 0
     with open(path, "w", newline="", encoding="utf-8-sig") as f:
-        if text_content:
+        w = csv.writer(f, delimiter=";")
+        w.writerow(src.cols)
+        for row in src:
+            w.writerow(row); n += 1
+    return n
+
+def _export_csv(path, cols, rows, text_content):
+    if text_content:
+        with open(path, "w", newline="", encoding="utf-8-sig") as f:
             f.write(text_content)
-        else:
-            w = csv.writer(f, delimiter=";")
-            w.writerow(cols)
-            w.writerows(rows)
+    else:
+        return write_csv(path, rows if isinstance(rows, RowSource) else RowSource(cols, lambda: rows, len(rows)))
 
 def _export_txt(path, cols, rows, text_content):
     with open(path, "w", encoding="utf-8") as f:
         if text_content:
             f.write(text_content)
         else:
-            widths = [max(len(str(c)), max((len(str(r[i])) for r in rows if i < len(r)), default=0))
-                      for i, c in enumerate(cols)]
+            # 1ª passada só mede as colunas; a 2ª grava (nada fica em memória)
+            widths = [len(str(c)) for c in cols]
+            for r in (rows.scan() if isinstance(rows, RowSource) else rows):
+                for i, v in enumerate(r[:len(widths)]):
+                    n = len(str(v))
+                    if n > widths[i]: widths[i] = n
             header = "  ".join(str(c).ljust(widths[i]) for i, c in enumerate(cols))
             f.write(header + "\n")
             f.write("─" * len(header) + "\n")
             for row in rows:
-                f.write("  ".join(str(v).ljust(widths[i]) for i, v in enumerate(row)) + "\n")
+                f.write("  ".join(str(v).ljust(widths[i]) if i < len(widths) else str(v)
+                                  for i, v in enumerate(row)) + "\n")
+
+# Planilhas: as linhas passam uma vez, direto para o arquivo. A largura das
+# colunas sai de uma amostra do início; acima do limite de linhas do formato
+# os dados continuam numa nova planilha, com o cabeçalho repetido.
+XLSX_MAX_ROWS = 1_048_576   # linhas por planilha, cabeçalho incluso
+XLS_MAX_ROWS  = 65_536
+WIDTH_SAMPLE  = 500         # linhas usadas para estimar a largura das colunas
+XLS_FLUSH     = 1000        # xlwt: descarrega as linhas a cada N
+
+def _peek(rows, n):
+    """(primeiras n linhas, iterador com todas as linhas) sem reler a fonte."""
+    it = iter(rows); head = list(islice(it, n))
+    return head, chain(head, it)
+
+def _col_widths(cols, sample, cap=40):
+    """Largura (caracteres) por coluna estimada do cabeçalho + amostra."""
+    w = [len(str(c)) for c in cols]
+    for row in sample:
+        for i, v in enumerate(row):
+            n = len(_cell_text(v))
+            if i >= len(w): w.append(n)
+            elif n > w[i]: w[i] = n
+    return [min(n + 4, cap) for n in w]
+
+def _cell_text(v): return str(v) if v is not None else ""
+
+def _sheet_name(base, n): return base if n == 1 else f"{base} ({n})"
+
+def _stream_sheets(rows, cols, limit, new_sheet, write_row):
+    """Distribui as linhas em planilhas de até `limit` linhas. new_sheet(n)
+    cria a n-ésima; write_row(ws, r, i, vals) grava a linha r (i=None: cabeçalho).
+    Retorna o número de planilhas."""
+    n = 0; ws = None; r = limit
+    for i, row in enumerate(rows):
+        if r >= limit:
+            n += 1; ws = new_sheet(n); r = 0
+            if cols: write_row(ws, 0, None, cols); r = 1
+        write_row(ws, r, i, row); r += 1
+    if ws is None:
+        n = 1; ws = new_sheet(1)
+        if cols: write_row(ws, 0, None, cols)
+    return n
 
 def _export_xlsx(path, cols, rows, text_content):
     try:
         import openpyxl
-        from openpyxl.styles import Font, PatternFill, Alignment
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font, PatternFill, Alignment, NamedStyle
+        from openpyxl.utils import get_column_letter
     except ImportError:
         raise ImportError("openpyxl não instalado. Execute: pip install openpyxl")
 
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "IFControll"
-
     if text_content:
-        for i, line in enumerate(text_content.split("\n"), 1):
-            ws.cell(row=i, column=1, value=line)
-    else:
-        # Cabeçalho
-        hdr_fill = PatternFill("solid", fgColor="1E2335")
-        hdr_font = Font(bold=True, color="00C8F8")
-        for ci, col in enumerate(cols, 1):
-            cell = ws.cell(row=1, column=ci, value=col)
-            cell.fill = hdr_fill
-            cell.font = hdr_font
-            cell.alignment = Alignment(horizontal="left")
-
-        # Dados
-        alt_fill = PatternFill("solid", fgColor="181C29")
-        for ri, row in enumerate(rows, 2):
-            for ci, val in enumerate(row, 1):
-                cell = ws.cell(row=ri, column=ci, value=str(val) if val is not None else "")
-                if ri % 2 == 0:
-                    cell.fill = alt_fill
-                cell.alignment = Alignment(horizontal="left")
-
-        # Auto-width
-        for col_cells in ws.columns:
-            length = max(len(str(c.value or "")) for c in col_cells)
-            ws.column_dimensions[col_cells[0].column_letter].width = min(length + 4, 40)
-
+        cols, rows = [], [(line,) for line in text_content.split("\n")]
+
+    # write_only: as linhas vão para o arquivo à medida que chegam; os
+    # estilos são nomeados e compartilhados por todas as células
+    wb = openpyxl.Workbook(write_only=True)
+    wb.add_named_style(NamedStyle("ifc_hdr", font=Font(bold=True, color="00C8F8"),
+                                  fill=PatternFill("solid", fgColor="1E2335"),
+                                  alignment=Alignment(horizontal="left")))
+    wb.add_named_style(NamedStyle("ifc_alt", fill=PatternFill("solid", fgColor="181C29"),
+                                  alignment=Alignment(horizontal="left")))
+    sample, rows = _peek(rows, WIDTH_SAMPLE)
+    widths = _col_widths(cols, sample)
+
+    def new_sheet(n):
+        ws = wb.create_sheet(_sheet_name("IFControll", n))
+        for ci, w in enumerate(widths, 1):          # só vale antes da 1ª linha
+            ws.column_dimensions[get_column_letter(ci)].width = w
+        return ws
+
+    def styled(ws, vals, style):
+        out = []
+        for v in vals:
+            c = WriteOnlyCell(ws, value=v); c.style = style; out.append(c)
+        return out
+
+    def write_row(ws, r, i, vals):
+        vals = [_cell_text(v) for v in vals]
+        if i is None: vals = styled(ws, vals, "ifc_hdr")
+        elif cols and i % 2 == 0: vals = styled(ws, vals, "ifc_alt")
+        ws.append(vals)
+
+    _stream_sheets(rows, cols, XLSX_MAX_ROWS, new_sheet, write_row)
     wb.save(path)
 
 def _export_xls(path, cols, rows, text_content):
@@ -229,32 +632,95 @@ def _export_xls(path, cols, rows, text_content):
     except ImportError:
         raise ImportError("xlwt não instalado. Execute: pip install xlwt")
 
-    wb = xlwt.Workbook(encoding="utf-8")
-    ws = wb.add_sheet("IFControll")
+    if text_content:
+        cols, rows = [], [(line,) for line in text_content.split("\n")]
 
+    wb = xlwt.Workbook(encoding="utf-8")
     hdr_style = xlwt.easyxf(
         "font: bold true, colour white; "
         "pattern: pattern solid, fore_colour dark_blue_ega; "
         "align: horiz left"
     )
     data_style = xlwt.easyxf("align: horiz left")
+    sample, rows = _peek(rows, WIDTH_SAMPLE)
+    widths = _col_widths(cols, sample)
 
-    if text_content:
-        for ri, line in enumerate(text_content.split("\n")):
-            ws.write(ri, 0, line, data_style)
-    else:
-        for ci, col in enumerate(cols):
-            ws.write(0, ci, col, hdr_style)
-        for ri, row in enumerate(rows, 1):
-            for ci, val in enumerate(row):
-                ws.write(ri, ci, str(val) if val is not None else "", data_style)
+    def new_sheet(n):
+        ws = wb.add_sheet(_sheet_name("IFControll", n))
+        for ci, w in enumerate(widths): ws.col(ci).width = 256 * w
+        return ws
+
+    def write_row(ws, r, i, vals):
+        st = hdr_style if i is None else data_style
+        for ci, v in enumerate(vals):
+            ws.write(r, ci, _cell_text(v), st)
+        if r % XLS_FLUSH == 0: ws.flush_row_data()
 
+    _stream_sheets(rows, cols, XLS_MAX_ROWS, new_sheet, write_row)
     wb.save(path)
 
+# PDF: em vez de uma Table gigante, uma tabela por página (cabeçalho em cada
+# uma, altura de linha fixa), geradas sob demanda enquanto o reportlab monta
+# o documento — só algumas páginas de linhas ficam em memória.
+PDF_FONT_SIZE = 7
+PDF_ROW_H     = 11          # pt por linha (fonte + padding)
+PDF_CELL_PAD  = 8           # padding horizontal da célula (pt)
+PDF_MIN_COL   = 28          # largura mínima de coluna (pt)
+PDF_STORY_AHEAD = 3         # flowables prontos à frente do reportlab
+
+class _StoryFeed(list):
+    """Story alimentada por um gerador: o build() do reportlab consome e apaga
+    flowables[0]; a cada remoção a lista é completada com os próximos."""
+    def __init__(self, flowables):
+        super().__init__()
+        self._gen = iter(flowables); self._fill()
+
+    def _fill(self):
+        while len(self) < PDF_STORY_AHEAD:
+            try: self.append(next(self._gen))
+            except StopIteration: return
+
+    def __delitem__(self, i):
+        super().__delitem__(i); self._fill()
+
+def _pdf_col_widths(cols, sample, pw):
+    """Larguras (pt) medidas no cabeçalho + amostra e ajustadas à página."""
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+    w = [stringWidth(str(c), "Helvetica-Bold", PDF_FONT_SIZE + 1) + PDF_CELL_PAD for c in cols]
+    for row in sample:
+        for i, v in enumerate(row[:len(w)]):
+            n = stringWidth(_cell_text(v), "Helvetica", PDF_FONT_SIZE) + PDF_CELL_PAD
+            if n > w[i]: w[i] = n
+    w = [max(PDF_MIN_COL, x) for x in w]
+    k = pw / sum(w)
+    return [x * k for x in w]
+
+def _clip(s, n):
+    return s if len(s) <= n else s[:max(1, n - 1)] + "…"
+
+def _pdf_tables(cols, rows, widths, first, per_page, style):
+    """Gera Tables de até `per_page` linhas (a 1ª com `first`), cabeçalho
+    repetido; o texto é cortado na largura da coluna (estimativa por caractere)."""
+    from reportlab.platypus import Table
+    nc = len(cols); hdr = [str(c) for c in cols]
+    limit = [max(2, int((w - PDF_CELL_PAD) / (PDF_FONT_SIZE * 0.5))) for w in widths]
+    def table(chunk):
+        t = Table([hdr] + chunk, colWidths=widths, rowHeights=PDF_ROW_H, repeatRows=1)
+        t.setStyle(style)
+        return t
+    chunk = []; cap = first
+    for row in rows:
+        vals = [_clip(_cell_text(v), limit[i]) for i, v in enumerate(row[:nc])]
+        vals += [""] * (nc - len(vals))
+        chunk.append(vals)
+        if len(chunk) >= cap:
+            yield table(chunk); chunk = []; cap = per_page
+    if chunk: yield table(chunk)
+
 def _export_pdf(path, cols, rows, text_content, title="Relatório"):
     try:
         from reportlab.lib.pagesizes import A4, landscape
-        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Preformatted
+        from reportlab.platypus import SimpleDocTemplate, TableStyle, Paragraph, Spacer, Preformatted
         from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
         from reportlab.lib import colors
         from reportlab.lib.units import cm
@@ -275,53 +741,55 @@ def _export_pdf(path, cols, rows, text_content, title="Relatório"):
                                textColor=colors.HexColor("#8B93B5"),
                                fontSize=8, spaceAfter=12)
 
-    story = []
-    story.append(Paragraph(title or "IFControll — Relatório", title_style))
-    story.append(Paragraph(
-        f"Gerado em: {now_br().strftime('%d/%m/%Y %H:%M:%S')} (Brasília UTC-3)",
-        sub_style))
-    story.append(Spacer(1, 0.3*cm))
+    head = [
+        Paragraph(title or "IFControll — Relatório", title_style),
+        Paragraph(f"Gerado em: {now_br().strftime('%d/%m/%Y %H:%M:%S')} (Brasília UTC-3)",
+                  sub_style),
+        Spacer(1, 0.3*cm),
+    ]
+    footer_style = ParagraphStyle("foot", parent=styles["Normal"],
+                                  fontSize=7, textColor=colors.HexColor("#58607A"))
+    tail = [Spacer(1, 0.5*cm),
+            Paragraph("IFControll v3.0 · Powered by Fulltrack2 REST API", footer_style)]
 
     if text_content:
         mono = ParagraphStyle("mono", parent=styles["Code"],
                               fontSize=7, leading=10,
                               textColor=colors.HexColor("#DDE1F0"),
                               backColor=colors.HexColor("#12151E"))
-        story.append(Preformatted(text_content, mono))
-    else:
-        # Tabela
-        data = [cols] + [[str(v) if v is not None else "" for v in row] for row in rows]
-        col_count = len(cols)
-        pw = (landscape(A4)[0] if is_landscape else A4[0]) - 2*cm
-
-        # Largura das colunas distribuída
-        col_w = [pw / col_count] * col_count
-
-        tbl = Table(data, colWidths=col_w, repeatRows=1)
-        tbl.setStyle(TableStyle([
-            ("BACKGROUND", (0,0), (-1,0), colors.HexColor("#1E2335")),
-            ("TEXTCOLOR",  (0,0), (-1,0), colors.HexColor("#00C8F8")),
-            ("FONTNAME",   (0,0), (-1,0), "Helvetica-Bold"),
-            ("FONTSIZE",   (0,0), (-1,0), 8),
-            ("FONTSIZE",   (0,1), (-1,-1), 7),
-            ("BACKGROUND", (0,1), (-1,-1), colors.HexColor("#181C29")),
-            ("TEXTCOLOR",  (0,1), (-1,-1), colors.HexColor("#DDE1F0")),
-            ("ROWBACKGROUNDS", (0,1), (-1,-1),
-             [colors.HexColor("#181C29"), colors.HexColor("#12151E")]),
-            ("GRID", (0,0), (-1,-1), 0.25, colors.HexColor("#232840")),
-            ("ALIGN", (0,0), (-1,-1), "LEFT"),
-            ("VALIGN", (0,0), (-1,-1), "MIDDLE"),
-            ("TOPPADDING", (0,0), (-1,-1), 3),
-            ("BOTTOMPADDING", (0,0), (-1,-1), 3),
-        ]))
-        story.append(tbl)
-
-    story.append(Spacer(1, 0.5*cm))
-    footer_style = ParagraphStyle("foot", parent=styles["Normal"],
-                                  fontSize=7, textColor=colors.HexColor("#58607A"))
-    story.append(Paragraph("IFControll v3.0 · Powered by Fulltrack2 REST API", footer_style))
+        doc.build(head + [Preformatted(text_content, mono)] + tail)
+        return
 
-    doc.build(story)
+    style = TableStyle([
+        ("BACKGROUND", (0,0), (-1,0), colors.HexColor("#1E2335")),
+        ("TEXTCOLOR",  (0,0), (-1,0), colors.HexColor("#00C8F8")),
+        ("FONTNAME",   (0,0), (-1,0), "Helvetica-Bold"),
+        ("FONTSIZE",   (0,0), (-1,0), PDF_FONT_SIZE + 1),
+        ("FONTSIZE",   (0,1), (-1,-1), PDF_FONT_SIZE),
+        ("BACKGROUND", (0,1), (-1,-1), colors.HexColor("#181C29")),
+        ("TEXTCOLOR",  (0,1), (-1,-1), colors.HexColor("#DDE1F0")),
+        ("ROWBACKGROUNDS", (0,1), (-1,-1),
+         [colors.HexColor("#181C29"), colors.HexColor("#12151E")]),
+        ("GRID", (0,0), (-1,-1), 0.25, colors.HexColor("#232840")),
+        ("ALIGN", (0,0), (-1,-1), "LEFT"),
+        ("VALIGN", (0,0), (-1,-1), "MIDDLE"),
+        ("TOPPADDING", (0,0), (-1,-1), 2),
+        ("BOTTOMPADDING", (0,0), (-1,-1), 2),
+    ])
+    pw = doc.width
+    fh = doc.height - 12                     # moldura menos o padding do Frame
+    used = sum(f.wrap(pw, fh)[1] + f.getSpaceBefore() + f.getSpaceAfter() for f in head)
+    # uma linha de folga: a sobra no pé da página nunca cabe cabeçalho + linha
+    per_page = max(1, int(fh / PDF_ROW_H) - 2)
+    first    = max(1, int((fh - used) / PDF_ROW_H) - 2)
+
+    sample, rows = _peek(rows, WIDTH_SAMPLE)
+    widths = _pdf_col_widths(cols, sample, pw)
+    def story():
+        yield from head
+        yield from _pdf_tables(cols, rows, widths, first, per_page, style)
+        yield from tail
+    doc.build(_StoryFeed(story()))
 
 
 # ─── BOTÃO DE EXPORTAÇÃO UNIVERSAL ────────────────────────────────────────────
@@ -397,8 +865,8 @@ def bind_global_copy(root):
 # ─── WIDGET DE CONTROLE DE AUTO-REFRESH ───────────────────────────────────────
 def mk_refresh_controls(parent, root):
     """
-    Cria um mini-painel com: checkbox auto-refresh, label de intervalo,
-    e botão 'Atualizar Tudo Agora'.
+    Cria um mini-painel com: checkbox auto-refresh, agenda das views
+    (próximo refresh de cada uma) e botão 'Atualizar Tudo Agora'.
     Cole no header ou footer da janela principal.
     """
     f = tk.Frame(parent, bg="#12151E")
@@ -408,7 +876,7 @@ def mk_refresh_controls(parent, root):
     def toggle_auto():
         auto_refresh_set_enabled(auto_var.get())
 
-    chk = tk.Checkbutton(f, text="Auto 60s", variable=auto_var,
+    chk = tk.Checkbutton(f, text="Auto", variable=auto_var,
                          command=toggle_auto,
                          bg="#12151E", fg="#8B93B5",
                          activebackground="#12151E",
@@ -420,16 +888,89 @@ def mk_refresh_controls(parent, root):
                           font=("Helvetica Neue", 7))
     status_lbl.pack(side="left")
 
+    def _fmt(left):
+        if left is None: return "ao abrir"
+        left = max(0, int(left))
+        return f"{left}s" if left < 120 else f"{left // 60}min"
+
+    def _show_schedule():
+        parts = []
+        for name, left, vis, running in auto_refresh_schedule():
+            mark = "⟳" if running else ("" if vis else "◌")
+            parts.append(f"{mark}{name} {_fmt(left) if _auto_enabled else '—'}")
+        b = auto_refresh_backoff()
+        if b > 1: parts.append(f"API lenta ×{b:.1f}")
+        try:
+            status_lbl.config(text="  ·  ".join(parts))
+            f.after(TICK_MS, _show_schedule)
+        except tk.TclError: pass
+
     def _update_now():
-        status_lbl.config(text="⟳ atualizando...")
-        auto_refresh_run_all()
-        status_lbl.config(text=f"✔ {now_str()}")
+        auto_refresh_run_all()       # o próximo tick da agenda mostra quem está rodando
 
     btn_now = tk.Label(f, text="⟳ Tudo agora",
                        bg="#1E2335", fg="#00C8F8",
                        font=("Helvetica Neue", 8, "bold"),
                        padx=8, pady=3, cursor="hand2")
-    btn_now.bind("<Button-1>", lambda e: threading.Thread(target=_update_now, daemon=True).start())
+    btn_now.bind("<Button-1>", lambda e: _update_now())
     btn_now.pack(side="left", padx=4)
 
+    f.after(TICK_MS, _show_schedule)
     return f
+
+
+# ─── PAINEL DE TAREFAS EM SEGUNDO PLANO ──────────────────────────────────────
+def mk_tasks_panel(parent, root):
+    """
+    Indicador "⚙ N tarefas" para o header; o clique abre uma janela com as
+    tarefas vivas do TaskManager (view, estado, tempo) e botões de cancelar.
+    """
+    tm = task_manager()
+    ind = tk.Label(parent, text="⚙ 0", bg="#1E2335", fg="#58607A",
+                   font=("Helvetica Neue", 8, "bold"), padx=6, pady=3, cursor="hand2")
+    win = {"top": None, "tree": None, "tasks": {}}
+
+    def _rows():
+        tasks = tm.tasks()
+        win["tasks"] = {f"k{id(t)}": t for t in tasks}       # iid do reconcile → Task
+        return [(id(t), (t.name, t.state, f"{t.elapsed:.1f}s"), ()) for t in tasks]
+
+    def _tick():
+        n = len(tm.tasks())
+        try: ind.config(text=f"⚙ {n}", fg="#00C8F8" if n else "#58607A")
+        except tk.TclError: return
+        if win["tree"] is not None:
+            try: reconcile(win["tree"], _rows())
+            except tk.TclError: win["top"] = win["tree"] = None
+        ind.after(500, _tick)
+
+    def _cancel(sel_only):
+        if not sel_only: tm.cancel_all(); return
+        for iid in win["tree"].selection():
+            t = win["tasks"].get(iid)
+            if t is not None: t.cancel()
+
+    def _open(e=None):
+        if win["top"] is not None:
+            try: win["top"].lift(); return
+            except tk.TclError: pass
+        top = tk.Toplevel(root); top.title("Tarefas em segundo plano")
+        top.configure(bg="#12151E"); top.geometry("460x260")
+        tree = ttk.Treeview(top, columns=("Tarefa", "Estado", "Tempo"), show="headings", height=8)
+        for c, w in (("Tarefa", 240), ("Estado", 100), ("Tempo", 80)):
+            tree.heading(c, text=c); tree.column(c, width=w, anchor="w")
+        tree.pack(fill="both", expand=True, padx=6, pady=6)
+        bar = tk.Frame(top, bg="#12151E"); bar.pack(fill="x", padx=6, pady=(0, 6))
+        for txt, sel in (("⏹ Cancelar selecionadas", True), ("⏹ Cancelar todas", False)):
+            b = tk.Label(bar, text=txt, bg="#1E2335", fg="#00C8F8",
+                         font=("Helvetica Neue", 8, "bold"), padx=8, pady=3, cursor="hand2")
+            b.bind("<Button-1>", lambda e, s=sel: _cancel(s)); b.pack(side="left", padx=(0, 6))
+        def _close():
+            win["top"] = win["tree"] = None; top.destroy()
+        top.protocol("WM_DELETE_WINDOW", _close)
+        win["top"], win["tree"] = top, tree
+        reconcile(tree, _rows())
+
+    ind.bind("<Button-1>", _open)
+    ind.after(500, _tick)
+    return ind
@@ -0,0 +1,219 @@
+"""
+charts.py — IFControll v3.0
+• Gráficos em modo retido sobre tk.Canvas: cada elemento (barra, célula,
+  fatia, rótulo) ganha um id fixo na primeira vez e depois só muda por
+  coords()/itemconfigure() — nada de delete("all") a cada redesenho
+• Redimensionar o canvas reposiciona os itens existentes
+• Itens que sobram (ex.: menos barras que antes) ficam ocultos, não são apagados
+• Cores dadas por nome do tema ("accent") são relidas de C a cada desenho,
+  então a troca de tema repinta os gráficos
+
+INTEGRAÇÃO:
+  1. No _build: ch = BarChart(cv, "accent")  (ou HourBars, HeatMap, PieChart).
+  2. Com os dados: ch.set(...) na thread do Tk — de uma task, post(ch.set, ...).
+"""
+
+import tkinter as tk
+from abc import ABC, abstractmethod
+
+from theme_manager import C, register_theme_listener, unregister_theme_listener
+
+
+def theme_color(c):
+    """Nome de cor do tema ("accent") → valor atual em C; "#rrggbb" passa direto."""
+    return C.get(c, c)
+
+
+class RetainedChart(ABC):
+    """Base: guarda os ids dos itens por chave e só envia ao Tk o que mudou.
+    Subclasses implementam _draw(W, H, *dados) com chamadas a _put()."""
+    def __init__(self, cv, width=None, height=None):
+        self.cv      = cv
+        self.width   = width          # fixo (None = largura atual do canvas)
+        self.height  = height
+        self._ids    = {}             # chave → id do item
+        self._opts   = {}             # id → opções atuais
+        self._coords = {}             # id → coords atuais
+        self._hidden = set()
+        self._seen   = set()
+        self._data   = None
+        self._size   = None
+        self._pending = False
+        cv.bind("<Configure>", self._on_resize, add="+")
+        cv.bind("<Destroy>", self._on_destroy, add="+")
+        register_theme_listener(self.layout)
+
+    # ── API ──────────────────────────────────────────────────────────
+    def set(self, *data):
+        self._data = data
+        self.layout()
+
+    def layout(self):
+        """Reposiciona/atualiza todos os itens com os dados atuais."""
+        self._pending = False
+        if self._data is None: return
+        try:
+            W, H = self.size()
+            self._seen = set()
+            self._draw(W, H, *self._data)
+            for key, iid in self._ids.items():       # o que não foi desenhado agora some
+                if key not in self._seen and key not in self._hidden:
+                    self.cv.itemconfigure(iid, state="hidden"); self._hidden.add(key)
+            self._size = (W, H)
+        except tk.TclError:
+            pass                                      # canvas destruído
+
+    def size(self):
+        cv = self.cv
+        W = self.width or (cv.winfo_width() if cv.winfo_width() > 1 else cv.winfo_reqwidth())
+        H = self.height or (cv.winfo_height() if cv.winfo_height() > 1 else cv.winfo_reqheight())
+        return W, H
+
+    # ── internos ─────────────────────────────────────────────────────
+    def _on_resize(self, e):
+        if self._pending or self._data is None or (self.width and self.height): return
+        if self._size == (self.width or e.width, self.height or e.height): return
+        self._pending = True
+        self.cv.after_idle(self.layout)
+
+    def _on_destroy(self, e):
+        if e.widget is self.cv:
+            unregister_theme_listener(self.layout); self._data = None
+
+    def _put(self, key, kind, coords, **opts):
+        """Cria o item na primeira vez; depois só coords()/itemconfigure()
+        com as opções que mudaram."""
+        self._seen.add(key)
+        iid = self._ids.get(key)
+        if iid is None:
+            iid = self._ids[key] = getattr(self.cv, "create_" + kind)(*coords, **opts)
+            self._opts[iid] = dict(opts); self._coords[iid] = coords
+            return iid
+        if self._coords[iid] != coords:
+            self.cv.coords(iid, *coords); self._coords[iid] = coords
+        cur = self._opts[iid]
+        diff = {k: v for k, v in opts.items() if cur.get(k) != v}
+        if key in self._hidden:
+            diff["state"] = "normal"; self._hidden.discard(key)
+        if diff:
+            self.cv.itemconfigure(iid, **diff); cur.update(diff); cur.pop("state", None)
+        return iid
+
+    @abstractmethod
+    def _draw(self, W, H, *data):
+        """Cria/atualiza os itens do gráfico para o tamanho W×H."""
+
+
+# ─── BARRAS SIMPLES ──────────────────────────────────────────────────────────
+class BarChart(RetainedChart):
+    """set(pares): pares = [(rótulo, valor), ...]. col: nome no tema ou "#rrggbb"."""
+    def __init__(self, cv, col, width=None, height=None):
+        super().__init__(cv, width, height)
+        self.col = col
+
+    def _draw(self, W, H, pairs):
+        n = len(pairs)
+        if not n: return
+        col = theme_color(self.col)
+        max_v = max(v for _, v in pairs) or 1
+        bar_w = max(8, (W - 40) // n)
+        y1 = H - 22
+        for i, (lab, val) in enumerate(pairs):
+            x0 = 20 + i * bar_w
+            y0 = y1 - int((val / max_v) * (H - 35))
+            self._put(("bar", i), "rectangle", (x0+2, y0, x0+bar_w-4, y1), fill=col, outline="")
+            # label abreviado
+            self._put(("lab", i), "text", (x0 + bar_w//2, y1+2), text=lab[:6] if len(lab) > 6 else lab,
+                      fill=C["text_dim"], font=("Consolas", 6), anchor="n")
+            self._put(("val", i), "text", (x0 + bar_w//2, y0-2), text=str(int(val)),
+                      fill=col, font=("Consolas", 7), anchor="s")
+
+
+# ─── MÁXIMA × MÉDIA POR HORA ─────────────────────────────────────────────────
+class HourBars(RetainedChart):
+    """set(media, maxima): duas listas de 24 valores (km/h por hora do dia)."""
+    def _draw(self, W, H, avg_h, max_h):
+        pad = 40; bar_w = max(4, (W - pad*2) // 24)
+        max_v = max(max_h) or 1
+        for h in range(24):
+            x = pad + h*bar_w
+            # Barra max (fundo)
+            bh = int(max_h[h] / max_v * (H-pad-20))
+            self._put(("max", h), "rectangle", (x+1, H-pad-bh, x+bar_w-2, H-pad),
+                      fill=C["surface3"], outline="")
+            # Barra média
+            bh2 = int(avg_h[h] / max_v * (H-pad-20))
+            self._put(("avg", h), "rectangle", (x+3, H-pad-bh2, x+bar_w-4, H-pad),
+                      fill=C["accent"], outline="")
+            # Hora label
+            self._put(("hora", h), "text", (x + bar_w//2, H-pad+12), text=str(h),
+                      fill=C["text_dim"], font=("Consolas", 6), anchor="n")
+        # Legenda
+        self._put("lg_max", "rectangle", (W-180, 8, W-170, 18), fill=C["surface3"], outline="")
+        self._put("lg_max_t", "text", (W-168, 13), text="Vel.Máx", fill=C["text_dim"],
+                  font=("Consolas", 8), anchor="w")
+        self._put("lg_avg", "rectangle", (W-180, 22, W-170, 32), fill=C["accent"], outline="")
+        self._put("lg_avg_t", "text", (W-168, 27), text="Vel.Média", fill=C["text_dim"],
+                  font=("Consolas", 8), anchor="w")
+        self._put("unid", "text", (pad//2, H//2), text="km/h", fill=C["text_dim"],
+                  font=("Consolas", 7), angle=90)
+
+
+# ─── MAPA DE CALOR ───────────────────────────────────────────────────────────
+def heat_color(v, mx):
+    intensity = int(255 * v / mx) if mx > 0 else 0
+    r2 = min(255, intensity + 50); g2 = max(0, 50 - intensity // 3); b2 = 10
+    return f"#{r2:02x}{g2:02x}{b2:02x}"
+
+class HeatMap(RetainedChart):
+    """set(matriz): len(rows) linhas × len(cols) colunas de contagens."""
+    def __init__(self, cv, rows, cols, width=None, height=None):
+        super().__init__(cv, width, height)
+        self.rows = list(rows); self.cols = list(cols)
+
+    def _draw(self, W, H, mat):
+        nr, nc = len(self.rows), len(self.cols)
+        mx = max((max(r) for r in mat), default=0) or 1
+        cell_w = (W - 50) // nc; cell_h = (H - 20) // nr
+        # Cabeçalhos
+        for h, lab in enumerate(self.cols):
+            self._put(("col", h), "text", (50 + h*cell_w + cell_w//2, 8), text=str(lab),
+                      fill=C["text_dim"], font=("Consolas", 6))
+        for r, lab in enumerate(self.rows):
+            self._put(("row", r), "text", (24, 22 + r*cell_h + cell_h//2), text=lab,
+                      fill=C["text_dim"], font=("Consolas", 7))
+            for h in range(nc):
+                v = mat[r][h]
+                x = 50 + h*cell_w; y = 16 + r*cell_h
+                self._put(("cell", r, h), "rectangle", (x+1, y+1, x+cell_w-1, y+cell_h-1),
+                          fill=heat_color(v, mx), outline=C["bg"])
+                if v > 0 and cell_w > 16:
+                    self._put(("num", r, h), "text", (x + cell_w//2, y + cell_h//2), text=str(v),
+                              fill="white", font=("Consolas", 6))
+
+
+# ─── PIZZA ───────────────────────────────────────────────────────────────────
+class PieChart(RetainedChart):
+    """set(valores): um valor por rótulo; fatias mudam só start/extent.
+    colors: nomes no tema ou "#rrggbb"."""
+    def __init__(self, cv, labels, colors, cx=65, cy=65, r=55):
+        super().__init__(cv, cv.winfo_reqwidth(), cv.winfo_reqheight())
+        self.labels = list(labels); self.colors = list(colors)
+        self.cx, self.cy, self.r = cx, cy, r
+
+    def _draw(self, W, H, values):
+        total = sum(values) or 1
+        start = 0
+        cx, cy, r = self.cx, self.cy, self.r
+        for i, (lab, val) in enumerate(zip(self.labels, values)):
+            extent = 360 * val / total
+            c_col = theme_color(self.colors[i % len(self.colors)])
+            self._put(("arc", i), "arc", (cx-r, cy-r, cx+r, cy+r), start=start, extent=extent,
+                      fill=c_col, outline=C["bg"])
+            # Legend
+            self._put(("lg", i), "rectangle", (135, 10+i*18, 148, 22+i*18), fill=c_col, outline="")
+            self._put(("pct", i), "text", (150, 16+i*18), text=f"{100*val//total}%",
+                      fill=C["text_mid"], font=("Consolas", 7), anchor="w")
+            self._put(("lab", i), "text", (133, 16+i*18), text=f"{lab[:7]}",
+                      fill=C["text_dim"], font=("Consolas", 6), anchor="e")
+            start += extent
@@ -0,0 +1,167 @@
+"""
+columnar_export.py — IFControll v3.0
+• Exportação colunar (Parquet / Arrow IPC) dos eventos tipados
+  (records.Event) para o BI: inteiros, floats, timestamps e booleanos de
+  verdade — nada de "🟢 ON" ou "12.3V" como texto
+• Gravação em lotes (RecordBatch): a memória fica limitada a um lote
+• Históricos de vários veículos: um arquivo por veículo na mesma pasta,
+  baixados e gravados um de cada vez
+• pyarrow é opcional: sem ele, só estas exportações avisam
+
+INTEGRAÇÃO:
+  1. export_events(path, eventos) — snapshot (get_all_events()) ou histórico
+     (get_interval_events()); o formato sai da extensão (.parquet / .arrow).
+  2. export_partitioned(pasta, vids, lambda vid: get_interval_events(vid, ini, fim))
+     dentro de uma task (run_bg) — respeita checkpoint().
+"""
+
+import os
+
+from auto_refresh_export import ts
+from workers import checkpoint
+
+BATCH_ROWS  = 50_000       # eventos por RecordBatch
+COMPRESSION = "zstd"
+TZ_NAME     = "-03:00"     # Event.dt é UTC-3 sem tzinfo; gravamos com fuso
+
+FORMATS = {".parquet": "parquet", ".pq": "parquet",
+           ".arrow": "arrow", ".feather": "arrow", ".ipc": "arrow"}
+EXT     = {"parquet": ".parquet", "arrow": ".arrow"}
+
+
+def _pa():
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ImportError("pyarrow não instalado. Execute: pip install pyarrow")
+    return pa
+
+def format_of(path):
+    return FORMATS.get(os.path.splitext(path)[1].lower(), "parquet")
+
+
+# ─── ESQUEMA ─────────────────────────────────────────────────────────────────
+# (coluna, tipo, valor a partir do Event). Timestamps vão como epoch-segundos.
+# Campo ausente na API vira nulo — não o default do Event (bat=100, volt=0.0…).
+def _opt(key, get):
+    """Valor tipado do Event, ou None se o campo `key` veio vazio da API."""
+    return lambda e: None if e.get(key) is None else get(e)
+
+COLUMNS = (
+    ("vid",       "int64",  lambda e: e.vid),
+    ("placa",     "string", lambda e: e.placa or None),
+    ("veiculo",   "string", lambda e: e.veiculo or None),
+    ("cliente",   "string", lambda e: e.cliente or None),
+    ("motorista", "string", lambda e: e.motorista or None),
+    ("dt",        "ts",     lambda e: e.ts),
+    ("dt_env",    "ts",     lambda e: ts(e.dt_env) if e.dt_env else None),
+    ("ign",       "bool",   _opt("ras_eve_ignicao",         lambda e: bool(e.ign))),
+    ("gps",       "bool",   _opt("ras_eve_gps_status",      lambda e: bool(e.gps))),
+    ("vel",       "int32",  _opt("ras_eve_velocidade",      lambda e: e.vel)),
+    ("sat",       "int32",  _opt("ras_eve_satelites",       lambda e: e.sat)),
+    ("bat",       "int32",  _opt("ras_eve_porc_bat_backup", lambda e: e.bat)),
+    ("volt",      "float64", _opt("ras_eve_voltagem",       lambda e: e.volt)),
+    ("lat",       "float64", lambda e: e.lat),
+    ("lon",       "float64", lambda e: e.lon),
+)
+
+def schema():
+    pa = _pa()
+    types = {"int64": pa.int64(), "int32": pa.int32(), "float64": pa.float64(),
+             "bool": pa.bool_(), "string": pa.string(), "ts": pa.timestamp("s", tz=TZ_NAME)}
+    return pa.schema([(name, types[kind]) for name, kind, _ in COLUMNS])
+
+def to_batch(events, sch=None):
+    """Lista de Event → pyarrow.RecordBatch (uma passada por coluna)."""
+    pa = _pa(); sch = sch or schema()
+    arrays = [pa.array([get(e) for e in events], type=field.type)
+              for (_, _, get), field in zip(COLUMNS, sch)]
+    return pa.RecordBatch.from_arrays(arrays, schema=sch)
+
+
+# ─── GRAVAÇÃO ────────────────────────────────────────────────────────────────
+class ColumnarWriter:
+    """Grava eventos num arquivo Parquet ou Arrow IPC, um lote por vez.
+    Use com `with`; .rows = eventos gravados."""
+    def __init__(self, path, fmt=None, batch_rows=BATCH_ROWS):
+        pa = _pa()
+        self.fmt        = fmt or format_of(path)
+        self.schema     = schema()
+        self.batch_rows = batch_rows
+        self.rows       = 0
+        self._buf       = []
+        self._sink      = None
+        if self.fmt == "parquet":
+            try: import pyarrow.parquet as pq
+            except ImportError:
+                raise ImportError("pyarrow sem suporte a Parquet. Execute: pip install pyarrow")
+            self._w = pq.ParquetWriter(path, self.schema, compression=COMPRESSION)
+        else:
+            self._sink = pa.OSFile(path, "wb")
+            self._w = pa.ipc.new_file(self._sink, self.schema,
+                                      options=pa.ipc.IpcWriteOptions(compression=COMPRESSION))
+
+    def write(self, events):
+        for ev in events:
+            self._buf.append(ev)
+            if len(self._buf) >= self.batch_rows: self._flush()
+
+    def _flush(self):
+        if not self._buf: return
+        batch = to_batch(self._buf, self.schema)
+        if self.fmt == "parquet":
+            self._w.write_table(_pa().Table.from_batches([batch]))
+        else:
+            self._w.write_batch(batch)
+        self.rows += len(self._buf); self._buf = []
+        checkpoint()
+
+    def close(self, flush=True):
+        try:
+            if flush: self._flush()
+        finally:
+            self._w.close()
+            if self._sink is not None: self._sink.close()
+
+    def __enter__(self): return self
+    def __exit__(self, exc_type, *exc): self.close(flush=exc_type is None)
+
+
+def _discard(path):
+    try: os.remove(path)
+    except OSError: pass
+
+def export_events(path, events, fmt=None):
+    """Grava uma lista/iterável de Event num único arquivo. Retorna o nº de
+    eventos. Cancelado ou com erro, o arquivo parcial é apagado."""
+    try:
+        with ColumnarWriter(path, fmt) as w:
+            w.write(events)
+    except BaseException:
+        _discard(path); raise
+    return w.rows
+
+def export_partitioned(folder, vids, fetch, fmt="parquet", on_progress=None):
+    """
+    Um arquivo por veículo: pasta/vid_<id>.parquet (todos com o mesmo
+    esquema — o BI lê a pasta como uma tabela). fetch(vid) → eventos; só um
+    veículo fica em memória por vez. on_progress(feitos, total, eventos).
+    Retorna (arquivos, eventos). Cancelado ou com erro, os arquivos já
+    gravados são apagados (um conjunto pela metade engana o BI).
+    """
+    os.makedirs(folder, exist_ok=True)
+    vids = list(vids); written = []; rows = 0
+    try:
+        for i, vid in enumerate(vids, 1):
+            checkpoint()
+            evs = fetch(vid) or []
+            if evs:
+                path = os.path.join(folder, f"vid_{vid}{EXT[fmt]}")
+                rows += export_events(path, evs, fmt); written.append(path)
+            if on_progress: on_progress(i, len(vids), rows)
+    except BaseException:
+        for path in written: _discard(path)
+        try: os.rmdir(folder)          # só se ficou vazia
+        except OSError: pass
+        raise
+    return len(written), rows
@@ -0,0 +1,225 @@
+"""
+event_store.py — IFControll v3.0
+• Armazenamento local (SQLite) do histórico de eventos por veículo
+• Sobrevive ao reinício do app: relatórios de vários dias leem do disco
+  e só pedem à API os trechos que ainda não foram baixados
+• Política de retenção, limite de tamanho e compactação
+
+INTEGRAÇÃO:
+  1. Crie um EventStore() (caminho padrão: ~/.ifcontroll/events.db).
+  2. Envolva a função que baixa /events/interval com store.backed_fetch().
+  3. Compactação manual:  python event_store.py compact
+"""
+
+import os, json, sqlite3, threading, time
+
+from fleet_cache import merge_ranges, missing_ranges
+
+DEFAULT_PATH      = os.environ.get("IFCONTROLL_EVENT_DB",
+                        os.path.join(os.path.expanduser("~"), ".ifcontroll", "events.db"))
+RETENTION_DAYS    = 90     # eventos mais antigos são descartados na compactação
+MAX_DB_MB         = 512    # limite de tamanho do arquivo
+_CAP_CHECK_EVERY  = 50     # verifica o tamanho a cada N gravações
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events(
+    vid     INTEGER NOT NULL,
+    ts      INTEGER NOT NULL,
+    ekey    TEXT    NOT NULL,
+    vel     INTEGER,
+    ign     INTEGER,
+    gps     INTEGER,
+    sat     INTEGER,
+    lat     REAL,
+    lon     REAL,
+    volt    REAL,
+    bat     INTEGER,
+    raw     TEXT    NOT NULL,
+    PRIMARY KEY (vid, ts, ekey)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS coverage(
+    vid INTEGER NOT NULL,
+    ini INTEGER NOT NULL,
+    fim INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS coverage_vid ON coverage(vid, ini);
+CREATE INDEX IF NOT EXISTS events_ts ON events(ts);
+"""
+
+def _i(v):
+    try: return int(float(str(v).replace(",", ".")))
+    except: return None
+
+def _f(v):
+    try: return float(str(v).replace(",", "."))
+    except: return None
+
+
+class EventStore:
+    def __init__(self, path=DEFAULT_PATH, retention_days=RETENTION_DAYS, max_mb=MAX_DB_MB):
+        self.path           = path
+        self.retention_days = retention_days
+        self.max_mb         = max_mb
+        self._lock          = threading.Lock()
+        self._writes        = 0
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    # ── Leitura ──────────────────────────────────────────────────────
+    def covered(self, vid):
+        with self._lock:
+            rows = self._db.execute("SELECT ini,fim FROM coverage WHERE vid=? ORDER BY ini",
+                                    (vid,)).fetchall()
+        return merge_ranges([list(r) for r in rows])
+
+    def load(self, vid, begin, end):
+        """Eventos brutos (dict) de vid com begin ≤ ts ≤ end, em ordem cronológica."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT raw FROM events WHERE vid=? AND ts BETWEEN ? AND ? ORDER BY ts",
+                (vid, begin, end)).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    # ── Gravação ─────────────────────────────────────────────────────
+    def put(self, vid, events, covered=None, ts_of=None, key_of=None):
+        """Grava eventos (upsert) e, opcionalmente, marca [ini,fim] como coberto."""
+        rows = []
+        for ev in events:
+            t = ts_of(ev) if ts_of else _i(ev.get("ts"))
+            if t is None: continue
+            k = key_of(ev, t) if key_of else ev.get("ras_eve_id")
+            rows.append((vid, t, "|".join(map(str, k)) if isinstance(k, tuple) else str(k),
+                         _i(ev.get("ras_eve_velocidade")), _i(ev.get("ras_eve_ignicao")),
+                         _i(ev.get("ras_eve_gps_status")), _i(ev.get("ras_eve_satelites")),
+                         _f(ev.get("ras_eve_latitude")), _f(ev.get("ras_eve_longitude")),
+                         _f(ev.get("ras_eve_voltagem")), _i(ev.get("ras_eve_porc_bat_backup")),
+                         json.dumps(ev, ensure_ascii=False, separators=(",", ":"))))
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.executemany("INSERT OR REPLACE INTO events VALUES (?,?,?,?,?,?,?,?,?,?,?,?)", rows)
+                if covered is not None:
+                    self._add_coverage(vid, *covered)
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK"); raise
+            self._writes += 1
+            check = self._writes % _CAP_CHECK_EVERY == 0
+        if check and self.size_mb() > self.max_mb:
+            self.enforce_cap()
+
+    def _add_coverage(self, vid, ini, fim):
+        cur = [list(r) for r in self._db.execute(
+            "SELECT ini,fim FROM coverage WHERE vid=?", (vid,)).fetchall()]
+        merged = merge_ranges(cur + [[int(ini), int(fim)]])
+        self._db.execute("DELETE FROM coverage WHERE vid=?", (vid,))
+        self._db.executemany("INSERT INTO coverage VALUES (?,?,?)", [(vid, a, b) for a, b in merged])
+
+    # ── Integração com IntervalCache ─────────────────────────────────
+    def backed_fetch(self, fetch, ts_of, key_of, open_margin=120, clock=time.time):
+        """
+        Envolve fetch(vid, ini, fim) → eventos|None: lê do disco o que já foi
+        coberto, busca na API só os buracos e grava o resultado.
+        Retorna None se algum trecho falhar (para o chamador não cachear).
+        """
+        def _fetch(vid, begin, end):
+            closed_until = int(clock()) - open_margin
+            failed = False
+            for a, b in missing_ranges(self.covered(vid), begin, end):
+                evs = fetch(vid, a, b)
+                if evs is None:
+                    failed = True; continue
+                cov = (a, min(b, closed_until)) if min(b, closed_until) >= a else None
+                self.put(vid, evs, cov, ts_of, key_of)
+            return None if failed else self.load(vid, begin, end)
+        return _fetch
+
+    # ── Manutenção ───────────────────────────────────────────────────
+    def size_mb(self):
+        with self._lock:
+            pages = self._db.execute("PRAGMA page_count").fetchone()[0]
+            psize = self._db.execute("PRAGMA page_size").fetchone()[0]
+        return pages * psize / 1_048_576
+
+    def _trim_before(self, cutoff):
+        """Remove eventos e cobertura anteriores a cutoff (epoch)."""
+        with self._lock:
+            self._db.execute("BEGIN")
+            n = self._db.execute("DELETE FROM events WHERE ts<?", (cutoff,)).rowcount
+            self._db.execute("DELETE FROM coverage WHERE fim<?", (cutoff,))
+            self._db.execute("UPDATE coverage SET ini=? WHERE ini<?", (cutoff, cutoff))
+            self._db.execute("COMMIT")
+        return n
+
+    def apply_retention(self):
+        return self._trim_before(int(time.time()) - self.retention_days * 86400)
+
+    def enforce_cap(self, target_ratio=0.8):
+        """Descarta os eventos mais antigos até o volume ficar abaixo de
+        target_ratio × max_mb (as páginas livres são reaproveitadas)."""
+        removed = 0
+        while self.size_mb() > self.max_mb * target_ratio:
+            with self._lock:
+                total = self._db.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+                if not total: break
+                row = self._db.execute("SELECT ts FROM events ORDER BY ts LIMIT 1 OFFSET ?",
+                                       (max(1, total // 10),)).fetchone()
+            if not row: break
+            n = self._trim_before(row[0] + 1)
+            removed += n
+            if not n: break
+            with self._lock:
+                free = self._db.execute("PRAGMA freelist_count").fetchone()[0]
+            if free:   # páginas liberadas não reduzem page_count sem VACUUM
+                self.vacuum()
+        return removed
+
+    def vacuum(self):
+        with self._lock:
+            self._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self._db.execute("VACUUM")
+
+    def compact(self):
+        """Retenção + limite de tamanho + VACUUM. Retorna resumo."""
+        before = self.size_mb()
+        r1 = self.apply_retention()
+        r2 = self.enforce_cap() if self.size_mb() > self.max_mb else 0
+        self.vacuum()
+        return {"removed_retention": r1, "removed_cap": r2,
+                "size_before_mb": round(before, 2), "size_after_mb": round(self.size_mb(), 2)}
+
+    def stats(self):
+        with self._lock:
+            n, vids, lo, hi = self._db.execute(
+                "SELECT COUNT(*),COUNT(DISTINCT vid),MIN(ts),MAX(ts) FROM events").fetchone()
+        return {"path": self.path, "events": n, "vehicles": vids,
+                "oldest": lo, "newest": hi, "size_mb": round(self.size_mb(), 2),
+                "retention_days": self.retention_days, "max_mb": self.max_mb}
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM events"); self._db.execute("DELETE FROM coverage")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+# ─── LINHA DE COMANDO ────────────────────────────────────────────────────────
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Manutenção do histórico local do IFControll")
+    ap.add_argument("cmd", choices=["stats", "compact", "clear"])
+    ap.add_argument("--db", default=DEFAULT_PATH)
+    ap.add_argument("--retention-days", type=int, default=RETENTION_DAYS)
+    ap.add_argument("--max-mb", type=float, default=MAX_DB_MB)
+    a = ap.parse_args()
+    st = EventStore(a.db, a.retention_days, a.max_mb)
+    if a.cmd == "stats":     print(json.dumps(st.stats(), indent=2))
+    elif a.cmd == "compact": print(json.dumps(st.compact(), indent=2))
+    else:                    st.clear(); st.vacuum(); print("Histórico local apagado.")
+    st.close()
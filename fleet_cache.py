@@ -0,0 +1,301 @@
+"""
+fleet_cache.py — IFControll v3.0
+• Cache com TTL do snapshot da frota (/events/all)
+• Coalescência de requisições: chamadas simultâneas esperam um único download
+• Contadores de acerto/erro para diagnóstico
+• Índice de veículos (placa normalizada + n-gramas da descrição)
+• Cache de histórico por veículo ciente de intervalos (/events/interval)
+
+INTEGRAÇÃO:
+  1. Crie um SnapshotCache com a função que baixa o snapshot.
+  2. Troque as chamadas diretas pela cache.get().
+"""
+
+import re, threading, time
+from collections import OrderedDict
+
+
+# ─── SNAPSHOT COM TTL + SINGLE-FLIGHT ────────────────────────────────────────
+class SnapshotCache:
+    """
+    Guarda o último resultado de `loader()` por `ttl` segundos.
+    Se várias threads pedirem o snapshot enquanto um download está em
+    andamento, todas aguardam esse mesmo download e recebem o mesmo objeto.
+    O resultado é compartilhado — quem chama NÃO deve modificá-lo.
+    """
+    def __init__(self, loader, ttl=15.0, keep_empty=False):
+        self._loader     = loader
+        self.ttl         = float(ttl)
+        self._keep_empty = keep_empty   # False = resultado vazio (falha de API) não é cacheado
+        self._lock       = threading.Lock()
+        self._data       = None
+        self._stamp      = 0.0
+        self._inflight   = None         # threading.Event do download em andamento
+        self._error      = None
+        self.version     = 0            # incrementa a cada snapshot novo
+        self.hits = self.misses = self.coalesced = 0
+
+    def _fresh(self, now):
+        return self._data is not None and (now - self._stamp) < self.ttl
+
+    def get(self, force=False):
+        """Retorna o snapshot em cache ou baixa um novo (uma única vez)."""
+        with self._lock:
+            if not force and self._fresh(time.monotonic()):
+                self.hits += 1
+                return self._data
+            ev = self._inflight
+            if ev is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                self.misses += 1
+                ev = self._inflight = threading.Event()
+                leader = True
+
+        if not leader:
+            ev.wait()
+            with self._lock:
+                if self._error is not None and self._data is None:
+                    raise self._error
+                return self._data if self._data is not None else []
+
+        data = None; error = None
+        try:
+            data = self._loader()
+        except Exception as e:
+            error = e
+        with self._lock:
+            self._error = error
+            if error is None and (data or self._keep_empty):
+                self._data  = data
+                self._stamp = time.monotonic()
+                self.version += 1
+            elif error is None and self._data is None:
+                self._data = data   # entrega o vazio, mas sem carimbo — próxima chamada tenta de novo
+            result = self._data     # falha de API: todos recebem o último snapshot bom
+            self._inflight = None
+        ev.set()
+        if error is not None and result is None:
+            raise error
+        return result
+
+    def peek(self):
+        """Snapshot atual sem disparar download (pode ser None)."""
+        return self._data
+
+    def invalidate(self):
+        with self._lock:
+            self._stamp = 0.0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses + self.coalesced
+            age = time.monotonic() - self._stamp if self._stamp else None
+            return {"hits": self.hits, "misses": self.misses,
+                    "coalesced": self.coalesced, "version": self.version,
+                    "hit_rate": (self.hits + self.coalesced) / total if total else 0.0,
+                    "age_s": age, "ttl_s": self.ttl}
+
+
+# ─── ÍNDICE DE VEÍCULOS ──────────────────────────────────────────────────────
+_NORM_RE = re.compile(r"[^A-Z0-9]")
+
+def norm_key(v):
+    """Normaliza placa/descrição: maiúsculas, só A-Z e 0-9."""
+    return _NORM_RE.sub("", str(v if v is not None else "").upper())
+
+class VehicleIndex:
+    """
+    Índice imutável sobre um snapshot:
+      • placa normalizada → posição do primeiro veículo
+      • n-gramas (1..3) da descrição normalizada → posições em ordem crescente
+    find() devolve o mesmo veículo que a varredura linear original
+    (primeiro do snapshot cuja placa é igual OU cuja descrição contém a busca).
+    """
+    NGRAM = 3
+
+    def __init__(self, events):
+        self.events = events
+        self._plate = {}
+        self._desc  = []
+        self._grams = {}
+        self._memo  = {}
+        n = self.NGRAM
+        for i, ev in enumerate(events):
+            self._plate.setdefault(norm_key(ev.get("ras_vei_placa", "")), i)
+            d = norm_key(ev.get("ras_vei_veiculo", ""))
+            self._desc.append(d)
+            seen = set()
+            for k in range(1, n + 1):
+                for j in range(len(d) - k + 1):
+                    seen.add(d[j:j+k])
+            for g in seen:
+                self._grams.setdefault(g, []).append(i)
+
+    def _desc_match(self, nq):
+        """Menor posição cuja descrição contém nq (ou None)."""
+        n = self.NGRAM
+        grams = {nq[j:j+n] for j in range(max(1, len(nq) - n + 1))} if len(nq) >= n else {nq}
+        best = None
+        for g in grams:
+            lst = self._grams.get(g)
+            if lst is None: return None          # n-grama ausente ⇒ nenhuma descrição contém nq
+            if best is None or len(lst) < len(best): best = lst
+        for i in best:                           # postings em ordem crescente ⇒ primeiro válido é o menor
+            if nq in self._desc[i]: return i
+        return None
+
+    def find(self, q):
+        nq = norm_key(q)
+        if nq in self._memo: return self._memo[nq]
+        if not nq:
+            hit = self.events[0] if self.events else None
+        else:
+            cand = [i for i in (self._plate.get(nq), self._desc_match(nq)) if i is not None]
+            hit = self.events[min(cand)] if cand else None
+        self._memo[nq] = hit
+        return hit
+
+    def __len__(self): return len(self.events)
+
+
+class VehicleResolver:
+    """Mantém um VehicleIndex sincronizado com o snapshot do SnapshotCache;
+    o índice só é reconstruído quando o snapshot muda."""
+    def __init__(self, snapshot):
+        self._snapshot = snapshot
+        self._lock  = threading.Lock()
+        self._src   = None
+        self._index = None
+        self.rebuilds = 0
+
+    def index(self):
+        data = self._snapshot.get() or []
+        idx = self._index
+        if idx is not None and self._src is data:
+            return idx
+        with self._lock:
+            if self._index is None or self._src is not data:
+                self._index = VehicleIndex(data)
+                self._src   = data
+                self.rebuilds += 1
+            return self._index
+
+    def find(self, q):
+        return self.index().find(q)
+
+
+# ─── CACHE DE HISTÓRICO POR INTERVALO ────────────────────────────────────────
+def merge_ranges(ranges):
+    """Une intervalos fechados [a,b] (inteiros) sobrepostos ou adjacentes."""
+    out = []
+    for a, b in sorted(ranges):
+        if out and a <= out[-1][1] + 1:
+            if b > out[-1][1]: out[-1][1] = b
+        else:
+            out.append([a, b])
+    return out
+
+def missing_ranges(covered, begin, end):
+    """Sub-intervalos de [begin,end] que não estão em `covered` (já mesclado)."""
+    gaps = []; cur = begin
+    for a, b in covered:
+        if b < cur: continue
+        if a > end: break
+        if a > cur: gaps.append((cur, a - 1))
+        cur = max(cur, b + 1)
+        if cur > end: break
+    if cur <= end: gaps.append((cur, end))
+    return gaps
+
+
+class _VehicleHistory:
+    __slots__ = ("lock", "covered", "events", "seq")
+    def __init__(self):
+        self.lock    = threading.Lock()
+        self.covered = []      # [[ini,fim], ...] mesclados, em epoch-segundos
+        self.events  = {}      # chave → (ts, seq, evento)
+        self.seq     = 0
+
+
+class IntervalCache:
+    """
+    Histórico por veículo montado a partir de janelas já baixadas.
+    Uma consulta [ini,fim] só busca na API os trechos que faltam; trechos
+    passados são imutáveis e ficam cobertos para sempre, exceto a borda
+    "agora" (últimos `open_margin` segundos), que é sempre rebuscada.
+
+      fetch(vid, ini, fim) → lista de eventos, ou None em caso de falha
+      ts_of(evento)        → epoch-segundos do evento (ou None)
+    """
+    def __init__(self, fetch, ts_of, max_vehicles=64, open_margin=120, clock=time.time):
+        self._fetch       = fetch
+        self._ts_of       = ts_of
+        self.max_vehicles = max_vehicles
+        self.open_margin  = open_margin
+        self._clock       = clock
+        self._lock        = threading.Lock()
+        self._vehicles    = OrderedDict()
+        self.hits = self.partial = self.misses = self.fetches = 0
+
+    @staticmethod
+    def event_key(ev, t):
+        eid = ev.get("ras_eve_id")
+        if eid not in (None, ""): return ("id", str(eid))
+        return (t, ev.get("ras_eve_latitude"), ev.get("ras_eve_longitude"),
+                ev.get("ras_eve_velocidade"), ev.get("ras_eve_ignicao"),
+                ev.get("ras_eve_data_enviado"))
+
+    def _history(self, vid):
+        with self._lock:
+            h = self._vehicles.get(vid)
+            if h is None:
+                h = self._vehicles[vid] = _VehicleHistory()
+                while len(self._vehicles) > self.max_vehicles:
+                    self._vehicles.popitem(last=False)
+            else:
+                self._vehicles.move_to_end(vid)
+            return h
+
+    def _store(self, h, evs):
+        for ev in evs:
+            t = self._ts_of(ev)
+            if t is None: continue
+            k = self.event_key(ev, t)
+            if k in h.events:
+                h.events[k] = (t, h.events[k][1], ev)
+            else:
+                h.seq += 1
+                h.events[k] = (t, h.seq, ev)
+
+    def get(self, vid, begin, end):
+        """Eventos de `vid` com begin ≤ ts ≤ end, em ordem cronológica."""
+        begin, end = int(begin), int(end)
+        if end < begin: return []
+        h = self._history(vid)
+        with h.lock:                       # consultas ao mesmo veículo são serializadas
+            gaps = missing_ranges(h.covered, begin, end)
+            if not gaps: self.hits += 1
+            elif gaps == [(begin, end)]: self.misses += 1
+            else: self.partial += 1
+            closed_until = int(self._clock()) - self.open_margin
+            for a, b in gaps:
+                evs = self._fetch(vid, a, b)
+                self.fetches += 1
+                if evs is None: continue   # falha: não marca como coberto
+                self._store(h, evs)
+                if min(b, closed_until) >= a:
+                    h.covered = merge_ranges(h.covered + [[a, min(b, closed_until)]])
+            rows = [v for v in h.events.values() if begin <= v[0] <= end]
+        rows.sort(key=lambda v: (v[0], v[1]))
+        return [ev for _, _, ev in rows]
+
+    def invalidate(self, vid=None):
+        with self._lock:
+            if vid is None: self._vehicles.clear()
+            else: self._vehicles.pop(vid, None)
+
+    def stats(self):
+        return {"hits": self.hits, "partial": self.partial, "misses": self.misses,
+                "fetches": self.fetches, "vehicles": len(self._vehicles)}
@@ -0,0 +1,145 @@
+"""
+geo.py — IFControll v3.0
+• Geodésia vetorizada para trajetórias (NumPy): distância por trecho,
+  hodômetro acumulado, rumo e velocidade implícita em lote
+• Mesma API em Python puro quando o NumPy não está instalado
+  (retorna listas no lugar de arrays)
+
+INTEGRAÇÃO:
+  1. lat, lon, t = track_arrays(evs)          # records.Event em ordem
+  2. km = segment_km(lat, lon)                # trecho até o ponto válido anterior
+     odo = odometer(lat, lon); rumo = bearings(lat, lon)
+     vel = implied_speeds(lat, lon, t)
+"""
+
+import math
+
+try:
+    import numpy as np
+except ImportError:   # pip install numpy
+    np = None
+
+R_KM = 6371.0
+NAN  = float("nan")
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Distância em km entre dois pontos (graus decimais)."""
+    la1, lo1, la2, lo2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((la2 - la1) / 2) ** 2 + math.cos(la1) * math.cos(la2) * math.sin((lo2 - lo1) / 2) ** 2
+    return R_KM * 2 * math.asin(math.sqrt(max(0.0, min(1.0, a))))
+
+def _ok(la, lo):
+    return la == la and lo == lo and (la or lo)     # não-NaN e diferente de (0,0)
+
+
+# ─── CONVERSÃO ───────────────────────────────────────────────────────────────
+def track_arrays(events):
+    """(lat, lon, epoch) de uma lista de records.Event; ausentes viram NaN."""
+    lat = [NAN if e.lat is None else e.lat for e in events]
+    lon = [NAN if e.lon is None else e.lon for e in events]
+    t   = [NAN if e.ts is None else float(e.ts) for e in events]
+    if np is None: return lat, lon, t
+    return (np.asarray(lat, dtype=np.float64), np.asarray(lon, dtype=np.float64),
+            np.asarray(t, dtype=np.float64))
+
+
+# ─── NÚCLEO VETORIZADO ───────────────────────────────────────────────────────
+def _hav_np(la1, lo1, la2, lo2):
+    la1, lo1, la2, lo2 = (np.radians(x) for x in (la1, lo1, la2, lo2))
+    a = np.sin((la2 - la1) / 2) ** 2 + np.cos(la1) * np.cos(la2) * np.sin((lo2 - lo1) / 2) ** 2
+    return R_KM * 2 * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+def _valid_np(lat, lon):
+    return ~(np.isnan(lat) | np.isnan(lon)) & ((lat != 0) | (lon != 0))
+
+
+# ─── API EM LOTE ─────────────────────────────────────────────────────────────
+def pairwise_km(lat, lon):
+    """km entre cada ponto e o IMEDIATAMENTE anterior (NaN se algum for inválido;
+    o primeiro elemento é sempre NaN)."""
+    if np is None:
+        out = [NAN]
+        for i in range(1, len(lat)):
+            ok = _ok(lat[i-1], lon[i-1]) and _ok(lat[i], lon[i])
+            out.append(haversine(lat[i-1], lon[i-1], lat[i], lon[i]) if ok else NAN)
+        return out[:len(lat)]
+    lat = np.asarray(lat, dtype=np.float64); lon = np.asarray(lon, dtype=np.float64)
+    out = np.full(lat.shape, np.nan)
+    if lat.size < 2: return out
+    d = _hav_np(lat[:-1], lon[:-1], lat[1:], lon[1:])
+    v = _valid_np(lat, lon)
+    out[1:] = np.where(v[:-1] & v[1:], d, np.nan)
+    return out
+
+def segment_km(lat, lon):
+    """km de cada ponto válido até o ponto válido ANTERIOR (pula inválidos);
+    0 para o primeiro válido e para pontos inválidos."""
+    if np is None:
+        out = [0.0] * len(lat); last = None
+        for i in range(len(lat)):
+            if not _ok(lat[i], lon[i]): continue
+            if last is not None: out[i] = haversine(lat[last], lon[last], lat[i], lon[i])
+            last = i
+        return out
+    lat = np.asarray(lat, dtype=np.float64); lon = np.asarray(lon, dtype=np.float64)
+    out = np.zeros(lat.shape)
+    idx = np.flatnonzero(_valid_np(lat, lon))
+    if idx.size > 1:
+        out[idx[1:]] = _hav_np(lat[idx[:-1]], lon[idx[:-1]], lat[idx[1:]], lon[idx[1:]])
+    return out
+
+def odometer(lat, lon):
+    """Hodômetro acumulado (km) em cada ponto."""
+    seg = segment_km(lat, lon)
+    if np is None:
+        acc = 0.0; out = []
+        for d in seg: acc += d; out.append(acc)
+        return out
+    return np.cumsum(seg)
+
+def bearings(lat, lon):
+    """Rumo inicial (0–360°, 0 = norte) de cada ponto a partir do anterior; NaN no 1º."""
+    if np is None:
+        out = [NAN]
+        for i in range(1, len(lat)):
+            if not (_ok(lat[i-1], lon[i-1]) and _ok(lat[i], lon[i])): out.append(NAN); continue
+            p1, p2 = math.radians(lat[i-1]), math.radians(lat[i])
+            dl = math.radians(lon[i] - lon[i-1])
+            y = math.sin(dl) * math.cos(p2)
+            x = math.cos(p1) * math.sin(p2) - math.sin(p1) * math.cos(p2) * math.cos(dl)
+            out.append((math.degrees(math.atan2(y, x)) + 360) % 360)
+        return out[:len(lat)]
+    lat = np.asarray(lat, dtype=np.float64); lon = np.asarray(lon, dtype=np.float64)
+    out = np.full(lat.shape, np.nan)
+    if lat.size < 2: return out
+    p1, p2 = np.radians(lat[:-1]), np.radians(lat[1:])
+    dl = np.radians(lon[1:] - lon[:-1])
+    y = np.sin(dl) * np.cos(p2)
+    x = np.cos(p1) * np.sin(p2) - np.sin(p1) * np.cos(p2) * np.cos(dl)
+    b = (np.degrees(np.arctan2(y, x)) + 360) % 360
+    v = _valid_np(lat, lon)
+    out[1:] = np.where(v[:-1] & v[1:], b, np.nan)
+    return out
+
+def implied_speeds(lat, lon, t):
+    """Velocidade (km/h) implícita entre cada ponto e o anterior, pela distância
+    e pela diferença de epoch; NaN quando o intervalo é ≤ 0 ou desconhecido."""
+    d = pairwise_km(lat, lon)
+    if np is None:
+        out = [NAN]
+        for i in range(1, len(t)):
+            dt = t[i] - t[i-1]
+            out.append(d[i] / dt * 3600 if dt == dt and dt > 0 and d[i] == d[i] else NAN)
+        return out[:len(t)]
+    t = np.asarray(t, dtype=np.float64)
+    out = np.full(t.shape, np.nan)
+    if t.size < 2: return out
+    dt = np.diff(t)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out[1:] = np.where(dt > 0, d[1:] / dt * 3600, np.nan)
+    return out
+
+def total_km(lat, lon):
+    """Distância total percorrida pelos pontos válidos."""
+    return float(sum(segment_km(lat, lon))) if np is None else float(segment_km(lat, lon).sum())
@@ -0,0 +1,150 @@
+"""
+kpi_engine.py — IFControll v3.0
+• Motor único de KPIs da frota (Dashboard, aba KPIs e relatório TXT)
+• Carrega o snapshot em colunas NumPy uma vez e calcula cards,
+  faixas de velocidade/satélites, top-N e contagem por cliente
+  com operações vetorizadas
+• Sem NumPy instalado, cai para uma única passada em Python puro
+
+INTEGRAÇÃO:
+  1. k = fleet_kpis(get_all_events())
+  2. Leia k["on"], k["speed_bands"], k["top"] ... no lugar dos sum() por aba.
+"""
+
+import threading
+from collections import Counter
+
+try:
+    import numpy as np
+except ImportError:   # pip install numpy
+    np = None
+
+SPEED_LIMIT  = 80     # km/h — "excesso"
+LOW_BAT      = 30     # % — bateria backup crítica
+TOP_N        = 10
+TOP_CLIENTS  = 15
+
+# (rótulo, mínimo, máximo|None) — faixas fechadas, como nos gráficos originais
+SPEED_BANDS = [("0", 0, 0), ("1-30", 1, 30), ("31-60", 31, 60),
+               ("61-80", 61, 80), ("81-100", 81, 100), (">100", 101, None)]
+SAT_BANDS   = [("0 sat", 0, 0), ("1-3", 1, 3), ("4-6", 4, 6),
+               ("7-9", 7, 9), ("10+", 10, None)]
+
+
+def _band_edges(bands):
+    return [lo for _, lo, _ in bands[1:]]
+
+def _empty():
+    return {"total": 0, "on": 0, "off": 0, "moving": 0, "no_gps": 0, "gps_ok": 0,
+            "speeding": 0, "above_60": 0, "above_100": 0, "vmax": 0, "vmed": 0.0,
+            "avg_bat": 0.0, "low_bat": 0, "avg_volt": 0.0, "avg_sat": 0.0,
+            "speed_bands": [(l, 0) for l, _, _ in SPEED_BANDS],
+            "sat_bands":   [(l, 0) for l, _, _ in SAT_BANDS],
+            "top": [], "clients": []}
+
+
+# ─── CAMINHO VETORIZADO ──────────────────────────────────────────────────────
+def _kpis_numpy(data):
+    n = len(data)
+    ign  = np.fromiter((e.ign for e in data), dtype=np.int64, count=n)
+    gps  = np.fromiter((e.gps for e in data), dtype=np.int64, count=n)
+    vraw = np.fromiter((e.vel for e in data), dtype=np.int64, count=n)
+    bat  = np.fromiter((e.bat for e in data), dtype=np.int64, count=n)
+    volt = np.fromiter((e.volt for e in data), dtype=np.float64, count=n)
+    sat  = np.fromiter((e.sat for e in data), dtype=np.int64, count=n)
+    cli  = np.array([e.cliente or "Desconhecido" for e in data], dtype=object)
+    vel  = np.abs(vraw)
+
+    on = int(np.count_nonzero(ign)); no_gps = int(n - np.count_nonzero(gps))
+    vpos = volt[volt > 0]
+    sband = np.bincount(np.searchsorted(_band_edges(SPEED_BANDS), vel, side="right"),
+                        minlength=len(SPEED_BANDS))
+    sv = sat[sat >= 0]
+    gband = np.bincount(np.searchsorted(_band_edges(SAT_BANDS), sv, side="right"),
+                        minlength=len(SAT_BANDS))
+
+    # top-N: ordenação estável ⇒ empates mantêm a ordem do snapshot (igual ao sorted())
+    top_idx = np.argsort(-vel, kind="stable")[:TOP_N]
+
+    # por cliente: empates desempatados pela 1ª aparição (igual ao Counter.most_common)
+    names, first, counts = np.unique(cli, return_index=True, return_counts=True)
+    order = np.lexsort((first, -counts))[:TOP_CLIENTS]
+
+    return {"total": n, "on": on, "off": n - on,
+            "moving": int(np.count_nonzero(vraw > 0)),
+            "no_gps": no_gps, "gps_ok": n - no_gps,
+            "speeding": int(np.count_nonzero(vel > SPEED_LIMIT)),
+            "above_60": int(np.count_nonzero(vel > 60)),
+            "above_100": int(np.count_nonzero(vel > 100)),
+            "vmax": int(vel.max()), "vmed": float(vel.mean()),
+            "avg_bat": float(bat.mean()), "low_bat": int(np.count_nonzero(bat < LOW_BAT)),
+            "avg_volt": float(vpos.mean()) if vpos.size else 0.0,
+            "avg_sat": float(sat.mean()),
+            "speed_bands": [(b[0], int(c)) for b, c in zip(SPEED_BANDS, sband)],
+            "sat_bands":   [(b[0], int(c)) for b, c in zip(SAT_BANDS, gband)],
+            "top": [data[i] for i in top_idx.tolist()],
+            "clients": [(names[i], int(counts[i])) for i in order.tolist()]}
+
+
+# ─── FALLBACK PYTHON PURO (uma passada) ──────────────────────────────────────
+def _band_of(v, bands):
+    for i in range(len(bands) - 1, -1, -1):
+        if v >= bands[i][1]: return i
+    return None
+
+def _kpis_python(data):
+    n = len(data)
+    on = no_gps = moving = speeding = a60 = a100 = low = 0
+    vmax = vsum = bsum = ssum = 0; vtot = 0.0; vcnt = 0
+    sband = [0] * len(SPEED_BANDS); gband = [0] * len(SAT_BANDS)
+    cli = Counter()
+    for e in data:
+        v = abs(e.vel)
+        if e.ign: on += 1
+        if not e.gps: no_gps += 1
+        if e.vel > 0: moving += 1
+        if v > SPEED_LIMIT: speeding += 1
+        if v > 60: a60 += 1
+        if v > 100: a100 += 1
+        if v > vmax: vmax = v
+        vsum += v
+        bsum += e.bat
+        if e.bat < LOW_BAT: low += 1
+        if e.volt > 0: vtot += e.volt; vcnt += 1
+        ssum += e.sat
+        sband[_band_of(v, SPEED_BANDS)] += 1
+        b = _band_of(e.sat, SAT_BANDS)
+        if b is not None: gband[b] += 1
+        cli[e.cliente or "Desconhecido"] += 1
+    return {"total": n, "on": on, "off": n - on, "moving": moving,
+            "no_gps": no_gps, "gps_ok": n - no_gps,
+            "speeding": speeding, "above_60": a60, "above_100": a100,
+            "vmax": vmax, "vmed": vsum / n, "avg_bat": bsum / n, "low_bat": low,
+            "avg_volt": vtot / vcnt if vcnt else 0.0, "avg_sat": ssum / n,
+            "speed_bands": [(b[0], c) for b, c in zip(SPEED_BANDS, sband)],
+            "sat_bands":   [(b[0], c) for b, c in zip(SAT_BANDS, gband)],
+            "top": sorted(data, key=lambda e: abs(e.vel), reverse=True)[:TOP_N],
+            "clients": cli.most_common(TOP_CLIENTS)}
+
+
+# ─── API ─────────────────────────────────────────────────────────────────────
+_memo_lock = threading.Lock()
+_memo = (None, None)     # (snapshot, resultado) — o snapshot é imutável e compartilhado
+
+def compute_kpis(data):
+    """Calcula todos os KPIs da lista de records.Event (sem cache)."""
+    if not data: return _empty()
+    return _kpis_numpy(data) if np is not None else _kpis_python(data)
+
+def fleet_kpis(data):
+    """KPIs do snapshot, calculados uma única vez por snapshot."""
+    global _memo
+    src, res = _memo
+    if src is data and res is not None: return res
+    res = compute_kpis(data)
+    with _memo_lock:
+        _memo = (data, res)
+    return res
+
+def backend():
+    return "numpy" if np is not None else "python"
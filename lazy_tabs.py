@@ -0,0 +1,118 @@
+"""
+lazy_tabs.py — IFControll v3.0
+• Abas construídas sob demanda: o Notebook principal recebe só um
+  placeholder e a classe da aba é instanciada na primeira seleção
+• Cargas iniciais (on_first_show) rodam quando a página aparece pela
+  primeira vez — sub-abas nunca abertas não chamam a API no startup
+• Fila de aquecimento opcional: as abas mais usadas são montadas uma a
+  uma depois do startup, com a interface já respondendo
+
+INTEGRAÇÃO:
+  1. lazy = LazyNotebook(nb); lazy.add(TabX, "  Nome  ")
+     no lugar de nb.add(TabX(nb), text="  Nome  ").
+  2. Nas abas: on_first_show(frame, load) no lugar de self.after(300, load).
+  3. Opcional: lazy.warm_up([TabY, TabZ]) depois de montar a janela.
+"""
+
+import time
+import tkinter as tk
+from collections import deque
+
+from ui_dispatch import post
+
+SHOW_DELAY_MS   = 50     # deixa a página desenhar antes de disparar a carga
+WARMUP_DELAY_MS = 4000   # espera após o startup antes de aquecer abas
+WARMUP_GAP_MS   = 500    # intervalo entre duas abas aquecidas
+
+
+# ─── CARGA NA PRIMEIRA EXIBIÇÃO ──────────────────────────────────────────────
+_pending  = {}       # widget → [(fn, args)] aguardando ficar visível
+_flush_id = None
+_hooked   = False
+
+def on_first_show(widget, fn, *a):
+    """Agenda fn(*a) para quando widget ficar visível pela primeira vez
+    (página selecionada e todos os Notebooks acima dela também)."""
+    global _hooked
+    jobs = _pending.get(widget)
+    if jobs is None:
+        jobs = _pending[widget] = []
+        widget.bind("<Map>", lambda e: _schedule(widget), add="+")
+    jobs.append((fn, a))
+    if not _hooked:      # troca de aba em qualquer Notebook pode revelar páginas
+        widget.bind_all("<<NotebookTabChanged>>", lambda e: _schedule(e.widget), add="+")
+        _hooked = True
+    _schedule(widget)
+
+def _schedule(widget):
+    global _flush_id
+    if _flush_id is None and _pending:
+        try: _flush_id = widget.after(SHOW_DELAY_MS, _flush)
+        except (tk.TclError, AttributeError): pass
+
+def _flush():
+    global _flush_id
+    _flush_id = None
+    for w in list(_pending):
+        try: vis = w.winfo_viewable()
+        except tk.TclError: _pending.pop(w, None); continue     # destruído
+        if vis:
+            for fn, a in _pending.pop(w): post(fn, *a)
+
+def pending_count():
+    return sum(len(v) for v in _pending.values())
+
+
+# ─── NOTEBOOK PREGUIÇOSO ─────────────────────────────────────────────────────
+class LazyNotebook:
+    """Envolve um ttk.Notebook: cada aba nasce como placeholder e a classe
+    é instanciada (cls(holder)) ao ser selecionada ou aquecida."""
+    def __init__(self, nb, bg=None, fg=None, text="Carregando…"):
+        self.nb    = nb
+        self.bg    = bg
+        self.fg    = fg
+        self.text  = text
+        self._slots = {}        # caminho do holder → (holder, placeholder, cls)
+        self.tabs   = {}        # cls → instância já construída
+        self.build_ms = {}      # cls → tempo de construção (diagnóstico)
+        nb.bind("<<NotebookTabChanged>>", lambda e: self.build(nb.select()), add="+")
+
+    def add(self, cls, text):
+        holder = tk.Frame(self.nb, bg=self.bg)
+        ph = tk.Label(holder, text=self.text, bg=self.bg, fg=self.fg,
+                      font=("Helvetica Neue", 10))
+        ph.place(relx=.5, rely=.5, anchor="center")
+        self.nb.add(holder, text=text)
+        self._slots[str(holder)] = (holder, ph, cls)
+        return holder
+
+    def build(self, which):
+        """Constrói a aba (caminho do holder ou classe); devolve a instância."""
+        if isinstance(which, type):
+            if which in self.tabs: return self.tabs[which]
+            which = next((k for k, s in self._slots.items() if s[2] is which), None)
+        slot = self._slots.pop(str(which), None) if which else None
+        if slot is None: return None
+        holder, ph, cls = slot
+        t0 = time.perf_counter()
+        tab = cls(holder); tab.pack(fill="both", expand=True)
+        ph.destroy()
+        self.tabs[cls] = tab
+        self.build_ms[cls] = (time.perf_counter() - t0) * 1000
+        return tab
+
+    def warm_up(self, classes, delay_ms=WARMUP_DELAY_MS, gap_ms=WARMUP_GAP_MS):
+        """Monta as abas indicadas em segundo plano, uma por vez. As cargas
+        delas continuam esperando on_first_show()."""
+        queue = deque(classes)
+        def step():
+            while queue:
+                cls = queue.popleft()
+                if cls not in self.tabs:
+                    self.build(cls); break
+            if queue: self.nb.after(gap_ms, step)
+        self.nb.after(delay_ms, step)
+
+    @property
+    def built(self):
+        return len(self.tabs)
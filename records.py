@@ -0,0 +1,130 @@
+"""
+records.py — IFControll v3.0
+• Registros tipados e compactos (__slots__) para os eventos da Fulltrack2
+• Cada campo numérico/data é convertido UMA vez, quando o snapshot
+  (/events/all) ou a janela (/events/interval) chega da API
+• O dict da API NÃO é guardado: só os campos tipados e os poucos textos
+  que o código ainda lê por .get("ras_...") (datas originais, id do evento,
+  entradas, sensores, aparelho)
+
+INTEGRAÇÃO:
+  1. Passe a lista bruta por parse_events() logo após o download.
+  2. Nas abas, use ev.vel / ev.ign / ev.gps / ev.dt no lugar de
+     safe_int(ev.get(...)) e parse_dt(ev.get(...)).
+"""
+
+from auto_refresh_export import parse_dt, parse_dt_many, ts
+
+_UNSET = object()
+
+
+def _int(v, default=0):
+    if v.__class__ is int: return v
+    if v is None or v == "": return default
+    try: return int(v)
+    except (TypeError, ValueError): pass
+    try: return int(float(str(v).replace(",", ".")))
+    except (TypeError, ValueError): return default
+
+def _float(v, default=0.0):
+    if v.__class__ is float: return v
+    if v is None or v == "": return default
+    try: return float(v)
+    except (TypeError, ValueError): pass
+    try: return float(str(v).replace(",", "."))
+    except (TypeError, ValueError): return default
+
+def _str(v):
+    s = str(v).strip() if v is not None else ""
+    return "" if s in ("None", "null") else s
+
+def _missing(v):
+    return v is None or str(v).strip() in ("", "None", "null")
+
+
+# Campo tipado ← chave da API. .get() dessas chaves devolve o valor tipado.
+FIELDS = (("vid", "ras_vei_id"), ("placa", "ras_vei_placa"), ("veiculo", "ras_vei_veiculo"),
+          ("cliente", "ras_cli_desc"), ("motorista", "ras_mot_nome"),
+          ("ign", "ras_eve_ignicao"), ("vel", "ras_eve_velocidade"), ("gps", "ras_eve_gps_status"),
+          ("sat", "ras_eve_satelites"), ("bat", "ras_eve_porc_bat_backup"),
+          ("volt", "ras_eve_voltagem"), ("lat", "ras_eve_latitude"), ("lon", "ras_eve_longitude"))
+_BIT = {key: (attr, 1 << i) for i, (attr, key) in enumerate(FIELDS)}
+
+# Textos brutos ainda lidos pelas abas/caches; o resto do dict é descartado.
+EXTRA_KEYS = ("ras_eve_id", "ras_eve_data_gps", "ras_eve_data_enviado", "ras_eve_input",
+              "ras_eve_temperatura", "sensor_temperatura", "ras_ras_id_aparelho")
+
+
+class Event:
+    """
+    Um evento (última posição ou ponto de histórico) já convertido.
+      vid, ign, vel, gps, sat, bat  → int   (bat ausente = 100)
+      volt                          → float (ausente = 0.0)
+      lat, lon                      → float ou None
+      dt, dt_env                    → datetime (UTC-3, sem tzinfo) ou None
+      ts                            → epoch-segundos de dt ou None
+      placa, veiculo, cliente, motorista → str ("" se ausente)
+    .get()/[] respondem às chaves de FIELDS (valor tipado; ausente na API →
+    default) e de EXTRA_KEYS (texto original). Outras chaves não existem.
+    """
+    __slots__ = ("extra", "absent", "vid", "placa", "veiculo", "cliente", "motorista",
+                 "ign", "vel", "gps", "sat", "bat", "volt", "lat", "lon",
+                 "dt", "dt_env", "ts")
+
+    def __init__(self, raw, dt=_UNSET, dt_env=_UNSET):
+        g = raw.get
+        self.extra     = {k: raw[k] for k in EXTRA_KEYS if k in raw} or None
+        self.absent    = sum(bit for key, (_, bit) in _BIT.items() if _missing(g(key)))
+        self.vid       = _int(g("ras_vei_id"))
+        self.placa     = _str(g("ras_vei_placa"))
+        self.veiculo   = _str(g("ras_vei_veiculo"))
+        self.cliente   = _str(g("ras_cli_desc"))
+        self.motorista = _str(g("ras_mot_nome"))
+        self.ign       = _int(g("ras_eve_ignicao"))
+        self.vel       = _int(g("ras_eve_velocidade"))
+        self.gps       = _int(g("ras_eve_gps_status"))
+        self.sat       = _int(g("ras_eve_satelites"))
+        self.bat       = _int(g("ras_eve_porc_bat_backup"), 100)
+        self.volt      = _float(g("ras_eve_voltagem"))
+        self.lat       = _float(g("ras_eve_latitude"), None)
+        self.lon       = _float(g("ras_eve_longitude"), None)
+        self.dt        = parse_dt(g("ras_eve_data_gps")) if dt is _UNSET else dt
+        self.dt_env    = parse_dt(g("ras_eve_data_enviado")) if dt_env is _UNSET else dt_env
+        self.ts        = ts(self.dt) if self.dt else None
+
+    # ── compatibilidade com o dict bruto ─────────────────────────────
+    def get(self, key, default=None):
+        f = _BIT.get(key)
+        if f is not None:
+            return default if self.absent & f[1] else getattr(self, f[0])
+        return self.extra.get(key, default) if self.extra else default
+
+    def __getitem__(self, key):
+        v = self.get(key, _UNSET)
+        if v is _UNSET: raise KeyError(key)
+        return v
+
+    def __contains__(self, key): return self.get(key, _UNSET) is not _UNSET
+    def __repr__(self):
+        return f"Event(vid={self.vid}, placa={self.placa!r}, dt={self.dt})"
+
+    @property
+    def dt_com(self):
+        """Data de comunicação: envio se houver, senão a do GPS."""
+        return self.dt_env or self.dt
+
+
+def parse_events(items):
+    """Converte uma lista de dicts da API em Event (já convertidos passam direto).
+    As datas do lote são decodificadas juntas (formato detectado uma vez)."""
+    items = [it for it in items or () if isinstance(it, (dict, Event))]
+    raws  = [it for it in items if it.__class__ is not Event]
+    dts   = iter(parse_dt_many([r.get("ras_eve_data_gps") for r in raws]))
+    envs  = iter(parse_dt_many([r.get("ras_eve_data_enviado") for r in raws]))
+    return [it if it.__class__ is Event else Event(it, next(dts), next(envs)) for it in items]
+
+def event_ts(ev):
+    """ts_of para IntervalCache/EventStore: aceita Event ou dict bruto."""
+    if ev.__class__ is Event: return ev.ts
+    dt = parse_dt(ev.get("ras_eve_data_gps"))
+    return ts(dt) if dt else None
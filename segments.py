@@ -0,0 +1,182 @@
+"""
+segments.py — IFControll v3.0
+• Segmentação de histórico em UMA passada sobre os records.Event:
+  viagens, paradas, marcha lenta (ign. ON parado), intervalos de ignição,
+  janelas de silêncio de comunicação e distância percorrida
+• Regras únicas para todos os relatórios (Utilização, Paradas, Motor Ocioso,
+  Custos, Comparativo, Silêncio e Uptime)
+• Cache por (veículo, janela): os relatórios viram projeções baratas
+
+INTEGRAÇÃO:
+  1. seg = segment(evs)  ou  SegmentCache(get_interval_events).get(vid, ini, fim)
+  2. seg.stops_over(5), seg.idles_over(5), seg.gaps_over(600) ...
+"""
+
+import threading
+from collections import OrderedDict
+
+from geo import track_arrays, segment_km
+
+SPEED_LIMIT   = 80     # km/h — contagem de excessos
+TRIP_STOP_MIN = 3      # parada ≥ N min encerra uma viagem
+
+# ─── REGRAS ──────────────────────────────────────────────────────────────────
+# • Eventos sem data GPS não contam tempo nem quebram sequências.
+# • O tempo entre dois pontos é atribuído ao estado do ponto ANTERIOR.
+# • Distância só entre pontos com lat/lon válidos (não nulos e ≠ 0).
+# • Parada = sequência com vel==0; termina no primeiro ponto em movimento.
+#   Uma parada ainda aberta no fim da janela não é contada.
+# • Marcha lenta = mesma regra, com ignição ON e vel==0.
+# • Silêncio = intervalo entre comunicações (envio, ou GPS se não houver).
+#   Todos os intervalos são guardados; o limiar fica com gaps_over().
+#   Por padrão com as datas em ordem crescente (Uptime); sequential=True usa
+#   a ordem dos eventos, como o relatório de Silêncio sempre fez.
+
+
+class Segmentation:
+    """Resultado imutável da segmentação de uma lista de eventos."""
+    __slots__ = ("events", "km", "vmax", "vmed", "vmed_all", "excessos",
+                 "t_on", "t_off", "t_idle", "first", "last",
+                 "stops", "idles", "ign", "gaps", "trips", "_gaps_seq")
+
+    # ── projeções ────────────────────────────────────────────────────
+    def stops_over(self, minutes):
+        """Paradas (ini, fim, min) com duração ≥ minutes."""
+        return [s for s in self.stops if s[2] >= minutes]
+
+    def idles_over(self, minutes):
+        """Períodos em marcha lenta (ini, fim, min) com duração ≥ minutes."""
+        return [s for s in self.idles if s[2] >= minutes]
+
+    def gaps_over(self, seconds, strict=False, sequential=False):
+        """Silêncios (ini, fim, seg) ≥ seconds (> se strict). sequential=True:
+        entre comunicações consecutivas na ordem dos eventos (sem ordenar)."""
+        gaps = self.gaps_seq if sequential else self.gaps
+        if strict: return [g for g in gaps if g[2] > seconds]
+        return [g for g in gaps if g[2] >= seconds]
+
+    @property
+    def gaps_seq(self):
+        if self._gaps_seq is None:
+            dts = [d for d in (ev.dt_com for ev in self.events) if d is not None]
+            self._gaps_seq = _gaps(dts)
+        return self._gaps_seq
+
+    @property
+    def count(self): return len(self.events)
+
+
+def _gaps(dts):
+    return [(dts[i-1], dts[i], (dts[i] - dts[i-1]).total_seconds()) for i in range(1, len(dts))]
+
+def segment(events, speed_limit=SPEED_LIMIT, trip_stop_min=TRIP_STOP_MIN):
+    """Uma passada sobre eventos em ordem cronológica → Segmentation."""
+    sg = Segmentation()
+    sg.events = events
+    km = t_on = t_off = t_idle = 0.0
+    vmax = vsum_mov = vsum_all = 0; nmov = exc = 0
+    stops = []; idles = []; ign_iv = []; trips = []
+    prev = None                          # (dt, ign, vel) do último ponto com data
+    stop_i = idle_i = None
+    ign_start = None
+    trip_start = None; trip_km = 0.0; trip_vmax = 0
+    lat, lon, _ = track_arrays(events)
+    seg = segment_km(lat, lon)                   # distâncias calculadas em lote (geo)
+    seg = seg.tolist() if hasattr(seg, "tolist") else seg
+
+    for i, ev in enumerate(events):
+        vel = ev.vel; v = abs(vel)
+        vsum_all += v
+        if v > vmax: vmax = v
+        if vel > 0: vsum_mov += vel; nmov += 1
+        if v > speed_limit: exc += 1
+        seg_km = seg[i]
+        km += seg_km
+        dt = ev.dt
+        if dt is None:
+            if trip_start is not None: trip_km += seg_km
+            continue
+        ign = ev.ign
+        if prev is not None:
+            s = (dt - prev[0]).total_seconds()
+            if s < 0: s = 0
+            if prev[1]:
+                t_on += s
+                if prev[2] == 0: t_idle += s
+            else:
+                t_off += s
+        # ignição ON/OFF
+        if ign_start is None: ign_start = (dt, bool(ign))
+        elif bool(ign) != ign_start[1]:
+            ign_iv.append((ign_start[0], dt, ign_start[1])); ign_start = (dt, bool(ign))
+        # paradas / marcha lenta
+        if vel == 0:
+            if stop_i is None: stop_i = dt
+        else:
+            if stop_i is not None:
+                d = (dt - stop_i).total_seconds() / 60
+                stops.append((stop_i, dt, d))
+                if d >= trip_stop_min and trip_start is not None:
+                    trips.append((trip_start, stop_i, trip_km, trip_vmax)); trip_start = None
+            stop_i = None
+        if ign == 1 and vel == 0:
+            if idle_i is None: idle_i = dt
+        else:
+            if idle_i is not None:
+                idles.append((idle_i, dt, (dt - idle_i).total_seconds() / 60))
+            idle_i = None
+        # viagens: do 1º ponto em movimento até uma parada ≥ trip_stop_min
+        if vel > 0 and trip_start is None:
+            trip_start = dt; trip_km = 0.0; trip_vmax = 0
+        elif trip_start is not None:
+            trip_km += seg_km
+        if trip_start is not None and v > trip_vmax: trip_vmax = v
+        prev = (dt, ign, vel)
+
+    if trip_start is not None and prev is not None:
+        trips.append((trip_start, stop_i or prev[0], trip_km, trip_vmax))
+    if ign_start is not None and prev is not None and prev[0] > ign_start[0]:
+        ign_iv.append((ign_start[0], prev[0], ign_start[1]))
+
+    dts = sorted(filter(None, [ev.dt_com for ev in events]))
+    gaps = _gaps(dts)
+
+    n = len(events)
+    sg.km = km; sg.vmax = vmax; sg.excessos = exc
+    sg.vmed = vsum_mov / nmov if nmov else 0
+    sg.vmed_all = vsum_all / n if n else 0
+    sg.t_on = t_on; sg.t_off = t_off; sg.t_idle = t_idle
+    sg.first = dts[0] if dts else None; sg.last = dts[-1] if dts else None
+    sg.stops = stops; sg.idles = idles; sg.ign = ign_iv; sg.gaps = gaps; sg.trips = trips
+    sg._gaps_seq = None
+    return sg
+
+
+class SegmentCache:
+    """
+    Segmentação por (veículo, início, fim), reaproveitada entre relatórios.
+    Se o histórico da janela mudou (ex.: borda "agora"), recalcula.
+      history(vid, ini, fim) → lista de records.Event
+    """
+    def __init__(self, history, maxsize=32):
+        self._history = history
+        self.maxsize  = maxsize
+        self._lock    = threading.Lock()
+        self._items   = OrderedDict()
+        self.hits = self.misses = 0
+
+    def get(self, vid, ini, fim):
+        evs = self._history(vid, ini, fim)
+        key = (vid, ini, fim)
+        sig = (len(evs), evs[-1].ts if evs else None)
+        with self._lock:
+            hit = self._items.get(key)
+            if hit is not None and hit[0] == sig:
+                self._items.move_to_end(key); self.hits += 1
+                return hit[1]
+        seg = segment(evs)
+        with self._lock:
+            self.misses += 1
+            self._items[key] = (sig, seg); self._items.move_to_end(key)
+            while len(self._items) > self.maxsize: self._items.popitem(last=False)
+        return seg
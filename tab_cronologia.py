@@ -7,10 +7,11 @@ Correções:
 
 import tkinter as tk
 from tkinter import ttk, messagebox
-import threading
-import requests
 from datetime import datetime
 
+from api_client import http_session
+from ui_dispatch import post, ui, fill_tree, run_bg, Rows
+
 from credencials import CRON_API_URL, CRON_API_KEY, _CRON_TOKEN_HEADER_NAME
 
 # ─── API CLIENT ──────────────────────────────────────────────────────────
@@ -22,7 +23,7 @@ def _cron_req(method, path, params=None, body=None, timeout=15):
         q = {"path": path}
         if params:
             q.update(params)
-        r = requests.request(
+        r = http_session().request(
             method=method.upper(), url=CRON_API_URL,
             headers=_cron_headers(), params=q, json=body, timeout=timeout
         )
@@ -115,6 +116,9 @@ def _txtbox(p, h=5):
     return fr, t
 
 def _write(t, text, col=None):
+    post(_write_now, t, text, col)      # seguro a partir das tasks
+
+def _write_now(t, text, col):
     C = _get_C()
     t.config(state="normal")
     t.delete("1.0", "end")
@@ -515,17 +519,18 @@ class TabCronologia(tk.Frame):
 
         def testar():
             _write(self.res_cfg, "⏳ Testando conexão (ping)...", C["accent"])
+            url = self.e_api_url.get().strip().rstrip("/")
+            key = self.e_api_key.get().strip()
             def task():
                 global CRON_API_URL, CRON_API_KEY
-                CRON_API_URL = self.e_api_url.get().strip().rstrip("/")
-                CRON_API_KEY = self.e_api_key.get().strip()
+                CRON_API_URL, CRON_API_KEY = url, key
                 resp = _cron_get("ping")
                 if resp.get("status"):
                     d = resp.get("data", {})
                     _write(self.res_cfg, f"✔ OK!\n{_safe_str(d.get('mensagem'))}\n{_safe_str(d.get('timestamp'))}\nPHP: {_safe_str(d.get('php'))}", C["success"])
                 else:
                     _write(self.res_cfg, f"✖ Falha:\n{resp.get('error','Erro desconhecido')}", C["danger"])
-            threading.Thread(target=task, daemon=True).start()
+            run_bg(task, key="cronologia/testar")
 
         row = tk.Frame(b, bg=C["bg"]); row.pack(pady=12)
         _btn(row, "💾 SALVAR", salvar_config, C["accent"]).pack(side="left", padx=6)
@@ -588,17 +593,17 @@ class TabCronologia(tk.Frame):
             if concluido is not None:
                 params["concluido"] = concluido
             resp = _cron_get("listar", params)
-            for r in self.tree.get_children():
-                self.tree.delete(r)
             if not resp.get("status"):
-                self.lb_busca.config(text="✖ Erro")
-                messagebox.showerror("Erro", resp.get("error") or "Erro ao listar")
+                fill_tree(self.tree, [])
+                ui(self.lb_busca).config(text="✖ Erro")
+                post(messagebox.showerror, "Erro", resp.get("error") or "Erro ao listar")
                 return
             data = resp.get("data", {}) or {}
             rows = data.get("registros", []) or []
             total = int(data.get("total", len(rows)) or len(rows))
             self._last_total = total
             self._last_rows  = rows
+            out = Rows()
             for m in rows:
                 conc = int(m.get("concluido", 0) or 0)
                 tag  = "concluido" if conc else "aberto"
@@ -611,7 +616,7 @@ class TabCronologia(tk.Frame):
                 if len(sa) > 60: sa = sa[:60] + "..."
                 try:   custo_fmt = f"{float(m.get('custo',0)):.2f}"
                 except: custo_fmt = _safe_str(m.get("custo"))
-                self.tree.insert("", "end", tags=(tag,), values=(
+                out.add((
                     _safe_str(m.get("id")),
                     _safe_str(m.get("placa")),
                     _safe_str(m.get("situacao")),
@@ -625,12 +630,13 @@ class TabCronologia(tk.Frame):
                     _fmt_date_from_api(m.get("previsao")),
                     _fmt_date_from_api(m.get("data_conclusao")),
                     "✔" if conc else "✗",
-                ))
+                ), (tag,))
+            fill_tree(self.tree, out)
             page  = (self._offset // max(1, self._limit)) + 1
             pages = max(1, (total + self._limit - 1) // self._limit)
-            self.lb_page.config(text=f"Página: {page}/{pages}  |  Total: {total}")
-            self.lb_busca.config(text=f"{len(rows)} na página")
-        threading.Thread(target=task, daemon=True).start()
+            ui(self.lb_page).config(text=f"Página: {page}/{pages}  |  Total: {total}")
+            ui(self.lb_busca).config(text=f"{len(rows)} na página")
+        run_bg(task, key="cronologia/buscar")
 
     def _pag_first(self):
         if not self._last_query_placa: return
@@ -654,20 +660,22 @@ class TabCronologia(tk.Frame):
         self.e_placa.delete(0, "end"); self._last_query_placa = ""
         def task():
             resp = _cron_get("placas")
-            for r in self.tree.get_children(): self.tree.delete(r)
             if not resp.get("status"):
-                self.lb_busca.config(text="✖ Erro")
-                messagebox.showerror("Erro", resp.get("error") or "Erro ao listar placas")
+                fill_tree(self.tree, [])
+                ui(self.lb_busca).config(text="✖ Erro")
+                post(messagebox.showerror, "Erro", resp.get("error") or "Erro ao listar placas")
                 return
             rows = resp.get("data") or []
+            out = Rows()
             for p in rows:
-                self.tree.insert("", "end", tags=("normal",), values=(
+                out.add((
                     "—", _safe_str(p.get("placa")), f"{p.get('registros',0)} registros",
                     "—","—","—","—","—","—","—","—","—","—"
-                ))
-            self.lb_busca.config(text=f"{len(rows)} placas")
-            self.lb_page.config(text="Página: —")
-        threading.Thread(target=task, daemon=True).start()
+                ), ("normal",))
+            fill_tree(self.tree, out)
+            ui(self.lb_busca).config(text=f"{len(rows)} placas")
+            ui(self.lb_page).config(text="Página: —")
+        run_bg(task, key="cronologia/listar_placas")
 
     # ══════════════════════════════════════════════════════════════
     # SELEÇÃO / DETALHE
@@ -705,6 +713,15 @@ class TabCronologia(tk.Frame):
             if not resp.get("status"):
                 _write(self.res_edit, f"✖ {resp.get('error','Erro ao buscar')}", C["danger"]); return
             m = resp.get("data", {}) or {}
+            resp_h = _cron_get(f"historico/{mid}")
+            hist = Rows()
+            if resp_h.get("status"):
+                for upd in (resp_h.get("data") or []):
+                    hist.add((
+                        _fmt_dt_from_api(upd.get("criado_em")),
+                        _safe_str(upd.get("autor")),
+                        _safe_str(upd.get("texto")),
+                    ))
 
             def set_e(key, val, readonly=False):
                 e = self._edit_fields.get(key)
@@ -713,33 +730,27 @@ class TabCronologia(tk.Frame):
                 e.delete(0, "end"); e.insert(0, val)
                 if readonly: e.config(state="readonly", fg=_get_C()["text_dim"])
 
-            set_e("id",    _safe_str(m.get("id"),""),     readonly=True)
-            set_e("placa", _safe_str(m.get("placa"),""),  readonly=True)
-            set_e("situacao",      _safe_str(m.get("situacao"),""))
-            set_e("quem_informou", _safe_str(m.get("quem_informou"),""))
-            set_e("onde_esta",     _safe_str(m.get("onde_esta"),""))
-            set_e("categoria",     _safe_str(m.get("categoria"),"Geral"))
-            set_e("prioridade",    _safe_str(m.get("prioridade"),"Normal"))
-            try:   set_e("custo", f"{float(m.get('custo',0)):.2f}")
-            except: set_e("custo", "0")
-            set_e("data_cadastro",  _fmt_dt_from_api(m.get("data_cadastro")).replace("—",""))
-            set_e("previsao",       _fmt_date_from_api(m.get("previsao")).replace("—",""))
-            set_e("data_conclusao", _fmt_date_from_api(m.get("data_conclusao")).replace("—",""))
-            self._conc_var.set(bool(int(m.get("concluido",0) or 0)))
-            self.t_edit_obs.delete("1.0","end")
-            self.t_edit_obs.insert("1.0", _safe_str(m.get("observacoes"),"").replace("—",""))
-            self.t_novo_status.delete("1.0","end")
-            for r in self.tree_status.get_children(): self.tree_status.delete(r)
-            resp_h = _cron_get(f"historico/{mid}")
-            if resp_h.get("status"):
-                for upd in (resp_h.get("data") or []):
-                    self.tree_status.insert("","end", values=(
-                        _fmt_dt_from_api(upd.get("criado_em")),
-                        _safe_str(upd.get("autor")),
-                        _safe_str(upd.get("texto")),
-                    ))
+            def render():
+                set_e("id",    _safe_str(m.get("id"),""),     readonly=True)
+                set_e("placa", _safe_str(m.get("placa"),""),  readonly=True)
+                set_e("situacao",      _safe_str(m.get("situacao"),""))
+                set_e("quem_informou", _safe_str(m.get("quem_informou"),""))
+                set_e("onde_esta",     _safe_str(m.get("onde_esta"),""))
+                set_e("categoria",     _safe_str(m.get("categoria"),"Geral"))
+                set_e("prioridade",    _safe_str(m.get("prioridade"),"Normal"))
+                try:   set_e("custo", f"{float(m.get('custo',0)):.2f}")
+                except: set_e("custo", "0")
+                set_e("data_cadastro",  _fmt_dt_from_api(m.get("data_cadastro")).replace("—",""))
+                set_e("previsao",       _fmt_date_from_api(m.get("previsao")).replace("—",""))
+                set_e("data_conclusao", _fmt_date_from_api(m.get("data_conclusao")).replace("—",""))
+                self._conc_var.set(bool(int(m.get("concluido",0) or 0)))
+                self.t_edit_obs.delete("1.0","end")
+                self.t_edit_obs.insert("1.0", _safe_str(m.get("observacoes"),"").replace("—",""))
+                self.t_novo_status.delete("1.0","end")
+            post(render)
+            fill_tree(self.tree_status, hist)
             _write(self.res_edit, f"✔ Manutenção #{mid} carregada.", C["success"])
-        threading.Thread(target=task, daemon=True).start()
+        run_bg(task, key="cronologia/carregar_detalhe")
 
     # ══════════════════════════════════════════════════════════════
     # AÇÕES DO EDITOR
@@ -775,10 +786,10 @@ class TabCronologia(tk.Frame):
             resp, code = _cron_put(f"atualizar/{mid}", body)
             if resp.get("status") or code in (200, 201):
                 _write(self.res_edit, f"✔ Atualizado! (#{mid})", C["success"])
-                self._carregar_detalhe(mid)
+                post(self._carregar_detalhe, mid)
             else:
                 _write(self.res_edit, f"✖ {resp.get('error', f'Falha {code}')}", C["danger"])
-        threading.Thread(target=task, daemon=True).start()
+        run_bg(task, name="cronologia/salvar_edicao")
 
     def _add_status_from_editor(self):
         C = _get_C()
@@ -794,24 +805,25 @@ class TabCronologia(tk.Frame):
             resp, code = _cron_post(f"add_status/{mid}", body={"texto": texto, "autor": autor})
             if resp.get("status") or code in (200, 201):
                 _write(self.res_edit, f"✔ Status adicionado! (#{mid})", C["success"])
-                self._carregar_detalhe(mid)
+                post(self._carregar_detalhe, mid)
             else:
                 _write(self.res_edit, f"✖ {resp.get('error', f'Falha {code}')}", C["danger"])
-        threading.Thread(target=task, daemon=True).start()
+        run_bg(task, name="cronologia/add_status_from_editor")
 
     def _concluir_do_editor(self):
         mid = self._selected_id
         if not mid: return
         if not messagebox.askyesno("Confirmar", f"Concluir manutenção #{mid}?"): return
+        tem_placa = bool(self.e_placa.get().strip())
         def task():
             body = {"data_conclusao": datetime.now().strftime("%Y-%m-%d"), "quem_informou": "Sistema"}
             resp, code = _cron_put(f"concluir/{mid}", body)
             if resp.get("status") or code in (200,):
-                self._carregar_detalhe(mid)
-                if self.e_placa.get().strip(): self._buscar(reset=False)
+                post(self._carregar_detalhe, mid)
+                if tem_placa: post(self._buscar, False)
             else:
-                messagebox.showerror("Erro", resp.get("error") or f"Falha {code}")
-        threading.Thread(target=task, daemon=True).start()
+                post(messagebox.showerror, "Erro", resp.get("error") or f"Falha {code}")
+        run_bg(task, name="cronologia/concluir_do_editor")
 
     def _deletar_atual(self):
         C = _get_C()
@@ -819,22 +831,25 @@ class TabCronologia(tk.Frame):
         if not mid:
             _write(self.res_edit, "⚠ Nenhuma manutenção carregada.", C["warn"]); return
         if not messagebox.askyesno("Confirmar", f"Deletar permanentemente #{mid}?"): return
+        tem_placa = bool(self.e_placa.get().strip())
         def task():
             resp, code = _cron_delete(f"deletar/{mid}")
             if resp.get("status") or code in (200, 204):
                 _write(self.res_edit, f"✔ Deletada (#{mid}).", C["success"])
                 self._selected_id = None
-                for k, e in self._edit_fields.items():
-                    if str(e.cget("state")) == "readonly": e.config(state="normal")
-                    e.delete(0,"end")
-                    if k in ("id","placa"): e.config(state="readonly", fg=_get_C()["text_dim"])
-                self.t_edit_obs.delete("1.0","end")
-                self.t_novo_status.delete("1.0","end")
-                for r in self.tree_status.get_children(): self.tree_status.delete(r)
-                if self.e_placa.get().strip(): self._buscar(reset=False)
+                def limpar():
+                    for k, e in self._edit_fields.items():
+                        if str(e.cget("state")) == "readonly": e.config(state="normal")
+                        e.delete(0,"end")
+                        if k in ("id","placa"): e.config(state="readonly", fg=_get_C()["text_dim"])
+                    self.t_edit_obs.delete("1.0","end")
+                    self.t_novo_status.delete("1.0","end")
+                post(limpar)
+                fill_tree(self.tree_status, [])
+                if tem_placa: post(self._buscar, False)
             else:
                 _write(self.res_edit, f"✖ {resp.get('error', f'Falha {code}')}", C["danger"])
-        threading.Thread(target=task, daemon=True).start()
+        run_bg(task, name="cronologia/deletar_atual")
 
     # ══════════════════════════════════════════════════════════════
     # AÇÕES NA LISTA
@@ -845,9 +860,9 @@ class TabCronologia(tk.Frame):
         if not messagebox.askyesno("Confirmar", f"Marcar #{mid} como CONCLUÍDA?"): return
         def task():
             resp, code = _cron_put(f"concluir/{mid}", {"data_conclusao": datetime.now().strftime("%Y-%m-%d"), "quem_informou": "Sistema"})
-            if resp.get("status") or code in (200,): self._buscar(reset=False)
-            else: messagebox.showerror("Erro", resp.get("error") or f"Falha {code}")
-        threading.Thread(target=task, daemon=True).start()
+            if resp.get("status") or code in (200,): post(self._buscar, False)
+            else: post(messagebox.showerror, "Erro", resp.get("error") or f"Falha {code}")
+        run_bg(task, name="cronologia/concluir_selecionada")
 
     def _deletar_selecionada(self):
         mid = self._get_selected_id()
@@ -855,9 +870,9 @@ class TabCronologia(tk.Frame):
         if not messagebox.askyesno("Confirmar", f"Deletar permanentemente #{mid}?"): return
         def task():
             resp, code = _cron_delete(f"deletar/{mid}")
-            if resp.get("status") or code in (200, 204): self._buscar(reset=False)
-            else: messagebox.showerror("Erro", resp.get("error") or f"Falha {code}")
-        threading.Thread(target=task, daemon=True).start()
+            if resp.get("status") or code in (200, 204): post(self._buscar, False)
+            else: post(messagebox.showerror, "Erro", resp.get("error") or f"Falha {code}")
+        run_bg(task, name="cronologia/deletar_selecionada")
 
     def _add_status_popup(self):
         mid = self._get_selected_id()
@@ -882,14 +897,15 @@ class TabCronologia(tk.Frame):
             if not texto:
                 _write(res, "⚠ Escreva o texto.", C["warn"]); return
             _write(res, "⏳ Enviando...", C["accent"])
+            tem_placa = bool(self.e_placa.get().strip())
             def task():
                 resp, code = _cron_post(f"add_status/{mid}", body={"texto": texto, "autor": autor})
                 if resp.get("status") or code in (200,201):
                     _write(res, "✔ Status adicionado!", C["success"])
-                    if self.e_placa.get().strip(): self._buscar(reset=False)
+                    if tem_placa: post(self._buscar, False)
                 else:
                     _write(res, f"✖ {resp.get('error', f'Falha {code}')}", C["danger"])
-            threading.Thread(target=task, daemon=True).start()
+            run_bg(task, name="cronologia/enviar")
         row = tk.Frame(win, bg=C["bg"]); row.pack(padx=12, pady=8, anchor="e")
         _btn(row, "➕ ADICIONAR", enviar, C["purple"]).pack(side="left", padx=6)
         _btn(row, "FECHAR", win.destroy, C["surface2"], C["text_mid"]).pack(side="left")
@@ -933,17 +949,17 @@ class TabCronologia(tk.Frame):
             "status_atual": self.t_status_ini.get("1.0","end").strip(),
         }
         _write(self.res_nova, "⏳ Cadastrando...", C["accent"])
+        mesma_placa = self.e_placa.get().strip().upper() == placa
         def task():
             resp, code = _cron_post("criar", body=body)
             if resp.get("status") or code in (200, 201):
                 mid = (resp.get("data") or {}).get("id", "?")
                 _write(self.res_nova, f"✔ Manutenção #{mid} cadastrada!", C["success"])
-                self._limpar_nova()
-                if self.e_placa.get().strip().upper() == placa:
-                    self._buscar(reset=True)
+                post(self._limpar_nova)
+                if mesma_placa: post(self._buscar, True)
             else:
                 _write(self.res_nova, f"✖ {resp.get('error', f'Falha {code}')}", C["danger"])
-        threading.Thread(target=task, daemon=True).start()
+        run_bg(task, name="cronologia/criar_manutencao")
 
     # ══════════════════════════════════════════════════════════════
     # EXPORT CSV
@@ -977,12 +993,12 @@ class TabCronologia(tk.Frame):
             except Exception as e:
                 messagebox.showerror("Exportar", str(e))
             return
+        situ = self.cb_situ.get().strip()
         def task():
             try:
                 with open(path, "w", newline="", encoding="utf-8-sig") as f:
                     csv_mod.writer(f, delimiter=";").writerow(cols)
                     limit = 200; offset = 0; total = None
-                    situ = self.cb_situ.get().strip()
                     concluido = None
                     if situ == "Abertos": concluido = 0
                     elif situ == "Concluídos": concluido = 1
@@ -991,7 +1007,7 @@ class TabCronologia(tk.Frame):
                         if concluido is not None: params["concluido"] = concluido
                         resp = _cron_get("listar", params)
                         if not resp.get("status"):
-                            messagebox.showerror("Exportar", resp.get("error","Erro ao exportar")); return
+                            post(messagebox.showerror, "Exportar", resp.get("error","Erro ao exportar")); return
                         data = resp.get("data",{}) or {}
                         regs = data.get("registros",[]) or []
                         total = int(data.get("total",0) or 0)
@@ -999,10 +1015,10 @@ class TabCronologia(tk.Frame):
                         wrow(f, regs)
                         offset += limit
                         if total and offset >= total: break
-                messagebox.showinfo("Exportar", f"CSV completo salvo:\n{path}")
+                post(messagebox.showinfo, "Exportar", f"CSV completo salvo:\n{path}")
             except Exception as e:
-                messagebox.showerror("Exportar", str(e))
-        threading.Thread(target=task, daemon=True).start()
+                post(messagebox.showerror, "Exportar", str(e))
+        run_bg(task, name="cronologia/exportar_csv", lane="long")
 
     # ══════════════════════════════════════════════════════════════
     # STATS
@@ -1026,19 +1042,18 @@ class TabCronologia(tk.Frame):
             if placa: params["placa"] = placa
             resp = _cron_get("stats", params)
             if not resp.get("status"):
-                self.lb_stats.config(text="✖ Erro")
+                ui(self.lb_stats).config(text="✖ Erro")
                 _write(self.res_stats, f"✖ {resp.get('error','Erro stats')}", C["danger"]); return
             d = resp.get("data",{}) or {}
             try:   custo_fmt = f"R$ {float(d.get('custo_total',0)):,.2f}".replace(",","X").replace(".",",").replace("X",".")
             except: custo_fmt = f"R$ {d.get('custo_total',0)}"
-            self._card_total.config(text=f"Total: {d.get('total',0)}")
-            self._card_conc.config(text=f"Concluídos: {d.get('concluidos',0)}")
-            self._card_pend.config(text=f"Pendentes: {d.get('pendentes',0)}")
-            self._card_urg.config(text=f"Urgentes: {d.get('urgentes',0)}")
-            self._card_custo.config(text=f"Custo Total: {custo_fmt}")
-            for r in self.tree_cat.get_children(): self.tree_cat.delete(r)
-            for c in (d.get("por_categoria") or []):
-                self.tree_cat.insert("","end", values=(_safe_str(c.get("categoria")), _safe_str(c.get("qtd"))))
-            self.lb_stats.config(text=f"✔ OK ({'placa '+placa if placa else 'geral'})")
+            ui(self._card_total).config(text=f"Total: {d.get('total',0)}")
+            ui(self._card_conc).config(text=f"Concluídos: {d.get('concluidos',0)}")
+            ui(self._card_pend).config(text=f"Pendentes: {d.get('pendentes',0)}")
+            ui(self._card_urg).config(text=f"Urgentes: {d.get('urgentes',0)}")
+            ui(self._card_custo).config(text=f"Custo Total: {custo_fmt}")
+            fill_tree(self.tree_cat, [((_safe_str(c.get("categoria")), _safe_str(c.get("qtd"))), ())
+                                      for c in (d.get("por_categoria") or [])])
+            ui(self.lb_stats).config(text=f"✔ OK ({'placa '+placa if placa else 'geral'})")
             _write(self.res_stats, f"✔ Stats carregado.\nBase: {'placa '+placa if placa else 'geral'}", C["success"])
-        threading.Thread(target=task, daemon=True).start()
\ No newline at end of file
+        run_bg(task, key="cronologia/carregar_stats")
\ No newline at end of file
@@ -33,6 +33,11 @@ def register_theme_listener(callback):
     """Registra uma função que será chamada ao trocar de tema."""
     _theme_listeners.append(callback)
 
+def unregister_theme_listener(callback):
+    """Remove um listener (ex.: widget destruído)."""
+    try: _theme_listeners.remove(callback)
+    except ValueError: pass
+
 def toggle_theme():
     """Alterna entre claro e escuro, atualiza C e notifica todos os listeners."""
     global C
@@ -0,0 +1,99 @@
+"""
+tree_sync.py — IFControll v3.0
+• Reconciliação por chave (ras_vei_id) para tabelas ao vivo: a cada refresh
+  só entram as linhas novas, só mudam as células/tags alteradas e só saem
+  os veículos que sumiram — seleção e rolagem são preservadas
+• Reordenação mínima: as linhas que já estão na ordem relativa certa
+  (maior subsequência crescente) não são movidas
+
+INTEGRAÇÃO:
+  1. rows = KeyedRows(); rows.add(ev.vid, values, tags) na thread de trabalho.
+  2. sync_tree(tree, rows) — agenda reconcile() na fila da UI.
+     (na thread do Tk, chame reconcile(tree, rows) direto;
+      FilterableTree: ft.sync(rows))
+"""
+
+import weakref
+from bisect import bisect_left
+
+from ui_dispatch import post, set_tree_model
+
+_state = weakref.WeakKeyDictionary()   # Treeview → {iid: (values, tags)}
+
+
+def _iids(rows):
+    """(iid, values, tags) com iids únicos; chaves repetidas ganham sufixo."""
+    seen = {}; out = []
+    for key, vals, tags in rows:
+        iid = f"k{key}"
+        n = seen.get(iid, 0); seen[iid] = n + 1
+        if n: iid = f"{iid}#{n}"
+        if isinstance(tags, str): tags = (tags,)
+        out.append((iid, tuple(vals), tuple(tags)))
+    return out
+
+def _stable(positions):
+    """Índices de `positions` que formam a maior subsequência crescente."""
+    tails = []; tails_at = []; prev = [-1] * len(positions)
+    for i, p in enumerate(positions):
+        j = bisect_left(tails, p)
+        if j: prev[i] = tails_at[j - 1]
+        if j == len(tails): tails.append(p); tails_at.append(i)
+        else: tails[j] = p; tails_at[j] = i
+    keep = set(); i = tails_at[-1] if tails_at else -1
+    while i >= 0: keep.add(i); i = prev[i]
+    return keep
+
+
+class KeyedRows(list):
+    """Linhas (chave, values, tags) montadas na thread de trabalho."""
+    def add(self, key, values, tags=()):
+        self.append((key, tuple(values), (tags,) if isinstance(tags, str) else tuple(tags)))
+
+
+def reconcile(tree, rows):
+    """Aplica rows = [(chave, values, tags), ...] (na ordem desejada) ao
+    Treeview com o mínimo de chamadas Tcl. Retorna (novas, alteradas, removidas)."""
+    rows = _iids(rows)
+    known = _state.get(tree)
+    if known is None: known = _state[tree] = {}
+    current = tree.get_children()
+    wanted = {iid for iid, _, _ in rows}
+    # a tabela pode ter sido repovoada por fora (load/fill_tree) com outros
+    # iids, até com a mesma contagem: só vale o que ainda existe no Treeview
+    alive = set(current)
+    for iid in [k for k in known if k not in alive]: del known[iid]
+
+    gone = [iid for iid in current if iid not in wanted or iid not in known]
+    if gone: tree.delete(*gone)
+    for iid in gone: known.pop(iid, None)
+    pos = {iid: i for i, iid in enumerate(c for c in current if c in known)}
+
+    # quem já está na ordem relativa certa não se mexe
+    present = [i for i, (iid, _, _) in enumerate(rows) if iid in pos]
+    keep = {present[j] for j in _stable([pos[rows[i][0]] for i in present])}
+
+    added = changed = 0; after = None
+    for i, (iid, vals, tags) in enumerate(rows):
+        old = known.get(iid)
+        if old is None:
+            idx = tree.index(after) + 1 if after else 0
+            tree.insert("", idx, iid=iid, values=vals, tags=tags); added += 1
+        else:
+            if old != (vals, tags):
+                tree.item(iid, values=vals, tags=tags); changed += 1
+            if i not in keep:
+                tree.detach(iid)      # fora da lista, o índice de destino não é ambíguo
+                tree.move(iid, "", tree.index(after) + 1 if after else 0)
+        known[iid] = (vals, tags)
+        after = iid
+    set_tree_model(tree, [vals for _, vals, _ in rows])
+    return added, changed, len(gone)
+
+def forget(tree):
+    """Descarta o estado de reconciliação (após limpar a tabela por fora)."""
+    _state.pop(tree, None)
+
+def sync_tree(tree, rows):
+    """reconcile() agendado na fila da UI (seguro a partir das tasks)."""
+    post(reconcile, tree, list(rows))
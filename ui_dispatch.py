@@ -0,0 +1,145 @@
+"""
+ui_dispatch.py — IFControll v3.0
+• Fila central de atualizações de interface: as threads de trabalho nunca
+  tocam widgets, só enfileiram jobs
+• A thread do Tk esvazia a fila via after() em fatias de tempo
+  (BUDGET_MS por rodada), então lotes grandes não congelam a janela
+• Jobs geradores (fill_tree) inserem linhas em blocos, cedendo entre eles
+• Tarefas rodam no pool limitado do workers.TaskManager; os post() de uma
+  tarefa já substituída por outra da mesma view são descartados
+
+INTEGRAÇÃO:
+  1. install(root) uma vez, antes do mainloop().
+  2. Nas abas: run_bg(task, key="aba/view") no lugar de threading.Thread(...).start().
+  3. Dentro de task(): ui(lb).config(text=...), fill_tree(t, rows),
+     post(ft.load, rows) — nada de chamar o widget direto.
+"""
+
+import threading, time, traceback, weakref
+from collections import deque
+
+from workers import task_manager, stale
+
+BUDGET_MS = 12     # tempo máximo de trabalho por rodada do loop do Tk
+IDLE_MS   = 25     # intervalo de verificação com a fila vazia
+BUSY_MS   = 1      # intervalo entre rodadas quando ainda há jobs
+CHUNK     = 200    # linhas por passo em fill_tree()
+
+
+class UIDispatcher:
+    """Fila FIFO de jobs executados na thread principal do Tk."""
+    def __init__(self, budget_ms=BUDGET_MS):
+        self.budget_ms = budget_ms
+        self._jobs     = deque()          # deque.append/popleft são thread-safe
+        self._current  = None             # job gerador em andamento
+        self._root     = None
+        self._main     = threading.main_thread()
+
+    def install(self, root):
+        self._root = root; self._main = threading.current_thread()
+        root.after(IDLE_MS, self._drain)
+
+    def on_ui_thread(self):
+        return threading.current_thread() is self._main
+
+    @property
+    def pending(self):
+        return len(self._jobs) + (self._current is not None)
+
+    def post(self, fn, *a, **kw):
+        """Enfileira fn(*a, **kw). Se fn retornar um gerador, ele é avançado
+        aos poucos nas próximas rodadas, bloqueando os jobs seguintes até
+        terminar (a ordem dos jobs é sempre preservada). Chamado de uma
+        tarefa cancelada/substituída, não faz nada."""
+        if stale(): return
+        self._jobs.append((fn, a, kw))
+
+    def call(self, fn, *a, timeout=None, **kw):
+        """Executa fn na thread do Tk e espera o resultado (para leituras)."""
+        if self.on_ui_thread() or self._root is None: return fn(*a, **kw)
+        box = {}; done = threading.Event()
+        def job():
+            try: box["r"] = fn(*a, **kw)
+            except Exception as e: box["e"] = e
+            finally: done.set()
+        self._jobs.append((job, (), {}))
+        done.wait(timeout)
+        if "e" in box: raise box["e"]
+        return box.get("r")
+
+    def _drain(self):
+        end = time.perf_counter() + self.budget_ms / 1000
+        while time.perf_counter() < end:
+            if self._current is not None:
+                try: next(self._current)
+                except StopIteration: self._current = None
+                except Exception: traceback.print_exc(); self._current = None
+                continue
+            try: fn, a, kw = self._jobs.popleft()
+            except IndexError: break
+            try:
+                r = fn(*a, **kw)
+                if hasattr(r, "__next__") and hasattr(r, "send"): self._current = r
+            except Exception:   # widget destruído, etc. — não derruba o loop
+                traceback.print_exc()
+        try: self._root.after(BUSY_MS if self.pending else IDLE_MS, self._drain)
+        except Exception: pass     # janela fechada
+
+
+class _Proxy:
+    """ui(widget).metodo(...) → post(widget.metodo, ...)."""
+    __slots__ = ("_w",)
+    def __init__(self, w): self._w = w
+    def __getattr__(self, name):
+        fn = getattr(self._w, name)
+        return lambda *a, **kw: _dispatcher.post(fn, *a, **kw)
+
+
+# ─── API DO MÓDULO ───────────────────────────────────────────────────────────
+_dispatcher = UIDispatcher()
+
+def install(root, budget_ms=None):
+    if budget_ms is not None: _dispatcher.budget_ms = budget_ms
+    _dispatcher.install(root)
+
+def post(fn, *a, **kw):  _dispatcher.post(fn, *a, **kw)
+def call(fn, *a, **kw):  return _dispatcher.call(fn, *a, **kw)
+def on_ui_thread():      return _dispatcher.on_ui_thread()
+def ui(widget):          return _Proxy(widget)
+def dispatcher():        return _dispatcher
+
+class Rows(list):
+    """Linhas (values, tags) montadas na thread de trabalho para fill_tree()."""
+    def add(self, values, tags=()):
+        self.append((tuple(values), (tags,) if isinstance(tags, str) else tuple(tags)))
+
+_models = weakref.WeakKeyDictionary()   # Treeview → valores das linhas, na ordem exibida
+
+def tree_model(tree):
+    """Valores das linhas que fill_tree()/reconcile() puseram no Treeview
+    (para exportar sem ler o Tk linha a linha); None se desconhecido."""
+    return _models.get(tree)
+
+def set_tree_model(tree, values, append=False):
+    if append and tree in _models: _models[tree].extend(values)
+    else: _models[tree] = list(values)
+
+def _fill(tree, rows, clear, chunk):
+    set_tree_model(tree, [vals for vals, _ in rows], append=not clear)
+    if clear: tree.delete(*tree.get_children())
+    for i in range(0, len(rows), chunk):
+        for vals, tags in rows[i:i + chunk]:
+            tree.insert("", "end", values=vals, tags=tags)
+        yield
+
+def fill_tree(tree, rows, clear=True, chunk=CHUNK):
+    """Substitui (ou acrescenta, clear=False) as linhas de um Treeview em
+    blocos de `chunk`. rows: Rows ou lista de (values, tags)."""
+    post(_fill, tree, list(rows), clear, chunk)
+
+def run_bg(task, name=None, key=None, token=None, lane="ui"):
+    """Executa task() no pool limitado de tarefas (a task só fala com a UI via
+    post/ui). key identifica a view: um novo run_bg com a mesma key cancela
+    o anterior. lane="long" para trabalhos demorados (exportações, fan-outs),
+    que têm threads próprias. Devolve o workers.Task (is_alive(), cancel(), elapsed)."""
+    return task_manager().submit(task, key=key, name=name, token=token, lane=lane)
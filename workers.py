@@ -0,0 +1,231 @@
+"""
+workers.py — IFControll v3.0
+• Tokens de cancelamento cooperativo para loops longos
+• Fan-out com concorrência limitada para análises frota-inteira
+  (um /events/interval por veículo) com progresso ao vivo
+• Gerenciador de tarefas: pool limitado de threads, uma tarefa viva por
+  view (key) — um novo pedido cancela o anterior
+
+INTEGRAÇÃO:
+  1. Crie um CancelToken por execução e passe-o ao FanOut.
+  2. Use on_result para enviar as linhas à tabela assim que cada item termina.
+  3. Tarefas das abas: ui_dispatch.run_bg(task, key="aba/view"); em loops
+     longos chame checkpoint() para parar assim que forem substituídas.
+     Exportações e fan-outs: run_bg(..., lane="long").
+"""
+
+import queue, threading, time, traceback
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+# ─── CANCELAMENTO COOPERATIVO ────────────────────────────────────────────────
+class Cancelled(Exception):
+    """Levantada por CancelToken.check() quando a execução foi cancelada."""
+
+class CancelToken:
+    def __init__(self):
+        self._ev = threading.Event()
+
+    def cancel(self):       self._ev.set()
+    @property
+    def cancelled(self):    return self._ev.is_set()
+    def check(self):
+        if self._ev.is_set(): raise Cancelled()
+    def wait(self, timeout): return self._ev.wait(timeout)
+
+
+# ─── FAN-OUT COM CONCORRÊNCIA LIMITADA ───────────────────────────────────────
+class FanOut:
+    """
+    Executa fn(item) para cada item com no máximo `workers` em paralelo.
+    Os itens são submetidos aos poucos (nunca mais que `workers` pendentes),
+    então cancelar interrompe a execução quase imediatamente.
+
+      limiter     — objeto com .acquire() chamado antes de cada item (rate limit)
+      on_result   — on_result(item, resultado) quando fn retorna algo não-None
+      on_progress — on_progress(feitos, total, falhas) após cada item
+    """
+    def __init__(self, items, fn, workers=8, limiter=None,
+                 on_result=None, on_progress=None, token=None):
+        self.items       = list(items)
+        self.fn          = fn
+        self.workers     = max(1, int(workers))
+        self.limiter     = limiter
+        self.on_result   = on_result
+        self.on_progress = on_progress
+        self.token       = token or CancelToken()
+        self.done = self.failed = 0
+        self.results = []
+
+    def _call(self, item):
+        self.token.check()
+        if self.limiter is not None:
+            self.limiter.acquire(self.token)
+        self.token.check()
+        return self.fn(item)
+
+    def run(self):
+        """Bloqueia até terminar ou ser cancelado. Retorna a lista de resultados."""
+        total = len(self.items); it = iter(self.items); pending = {}
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="fanout") as ex:
+            def _fill():
+                while len(pending) < self.workers and not self.token.cancelled:
+                    try: item = next(it)
+                    except StopIteration: return
+                    pending[ex.submit(self._call, item)] = item
+            _fill()
+            while pending:
+                finished, _ = wait(list(pending), timeout=0.5, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    item = pending.pop(fut)
+                    try:
+                        res = fut.result()
+                    except Cancelled:
+                        continue
+                    except Exception:
+                        self.failed += 1; res = None
+                    self.done += 1
+                    if res is not None:
+                        self.results.append(res)
+                        if self.on_result: self.on_result(item, res)
+                    if self.on_progress: self.on_progress(self.done, total, self.failed)
+                _fill()
+        return self.results
+
+    def start(self, on_done=None):
+        """Executa em thread daemon; on_done(resultados, cancelado) ao final."""
+        def _bg():
+            res = self.run()
+            if on_done: on_done(res, self.token.cancelled)
+        th = threading.Thread(target=_bg, daemon=True, name="fanout-main")
+        th.start()
+        return th
+
+
+# ─── GERENCIADOR DE TAREFAS ──────────────────────────────────────────────────
+MAX_TASKS      = 6   # tarefas da interface rodando ao mesmo tempo
+MAX_LONG_TASKS = 2   # faixa "long": exportações e fan-outs frota-inteira
+
+_local = threading.local()
+
+def current_task():
+    """Task que roda nesta thread (None fora do TaskManager)."""
+    return getattr(_local, "task", None)
+
+def current_token():
+    t = getattr(_local, "task", None)
+    return t.token if t is not None else None
+
+def checkpoint():
+    """Levanta Cancelled se a tarefa desta thread foi cancelada ou substituída."""
+    t = getattr(_local, "task", None)
+    if t is not None and t.token.cancelled: raise Cancelled()
+
+def stale():
+    """True se a tarefa desta thread foi substituída por outra da mesma view
+    (o resultado dela não deve mais chegar à tela)."""
+    t = getattr(_local, "task", None)
+    return t is not None and t.superseded
+
+
+class Task:
+    """Uma tarefa submetida ao TaskManager (handle devolvido por submit)."""
+    __slots__ = ("key", "name", "token", "lane", "superseded", "submitted", "started", "finished")
+
+    def __init__(self, key, name, token, lane="ui"):
+        self.key       = key
+        self.name      = name
+        self.token     = token
+        self.lane      = lane
+        self.superseded = False
+        self.submitted = time.monotonic()
+        self.started   = self.finished = None
+
+    def cancel(self):    self.token.cancel()
+    def is_alive(self):  return self.finished is None
+
+    @property
+    def state(self):
+        if self.finished is not None: return "fim"
+        if self.superseded:           return "substituída"
+        if self.token.cancelled:      return "cancelando"
+        return "rodando" if self.started is not None else "na fila"
+
+    @property
+    def elapsed(self):
+        t0 = self.started or self.submitted
+        return (self.finished or time.monotonic()) - t0
+
+
+class TaskManager:
+    """
+    Pool limitado de threads daemon para as tarefas da interface.
+      submit(fn, key=...) — se já houver tarefa viva com a mesma key, ela é
+      substituída: o token dela é cancelado (se ainda estava na fila, nem
+      começa) e os post() que ela fizer dali em diante são descartados.
+      Dentro de fn, checkpoint() interrompe loops longos de tarefas canceladas.
+    Cada faixa (lane) tem fila e threads próprias: lane="long" (exportações,
+    fan-outs) nunca ocupa as threads dos refreshes da faixa "ui".
+    """
+    def __init__(self, workers=MAX_TASKS, long_workers=MAX_LONG_TASKS):
+        self._lanes   = {"ui":   (max(1, int(workers)), queue.SimpleQueue(), []),
+                         "long": (max(1, int(long_workers)), queue.SimpleQueue(), [])}
+        self._lock    = threading.Lock()
+        self._by_key  = {}          # key → Task mais recente
+        self._live    = []          # tarefas na fila ou rodando, em ordem
+        self.superseded = 0
+
+    def submit(self, fn, key=None, name=None, token=None, lane="ui"):
+        limit, q, threads = self._lanes[lane]
+        t = Task(key, name or key or getattr(fn, "__qualname__", "tarefa"),
+                 token or CancelToken(), lane)
+        with self._lock:
+            if key is not None:
+                old = self._by_key.get(key)
+                if old is not None and old.is_alive():
+                    old.superseded = True; old.cancel(); self.superseded += 1
+                self._by_key[key] = t
+            self._live.append(t)
+            if len(threads) < limit:
+                th = threading.Thread(target=self._worker, args=(q,), daemon=True,
+                                      name=f"task-{lane}-{len(threads) + 1}")
+                threads.append(th); th.start()
+        q.put((t, fn))
+        return t
+
+    def _worker(self, q):
+        while True:
+            t, fn = q.get()
+            if not t.token.cancelled:           # substituída ainda na fila: pula
+                t.started = time.monotonic(); _local.task = t
+                try: fn()
+                except Cancelled: pass
+                except Exception: traceback.print_exc()
+                finally: _local.task = None
+            self._finish(t)
+
+    def _finish(self, t):
+        t.finished = time.monotonic()
+        with self._lock:
+            try: self._live.remove(t)
+            except ValueError: pass
+            if t.key is not None and self._by_key.get(t.key) is t:
+                del self._by_key[t.key]
+
+    def tasks(self):
+        """Cópia das tarefas vivas (na fila ou rodando)."""
+        with self._lock: return list(self._live)
+
+    def cancel(self, key):
+        with self._lock: t = self._by_key.get(key)
+        if t is not None: t.cancel()
+
+    def cancel_all(self):
+        for t in self.tasks(): t.cancel()
+
+
+_manager = TaskManager()     # as threads só nascem no primeiro submit()
+
+def task_manager():
+    """TaskManager compartilhado pela interface."""
+    return _manager